@@ -1,4 +1,15 @@
 class Column:
     def __init__(self, datatype, **kwargs):
         self.datatype = datatype
-        self.primary_key = kwargs.get('primary_key', False)
\ No newline at end of file
+        self.primary_key = kwargs.get('primary_key', False)
+        # Referenced "table.column", e.g. foreign_key="departments.id"
+        self.foreign_key = kwargs.get('foreign_key')
+        # Attribute the related object is loaded in (`department` for a
+        # `department_id` column) and, on the related model, the attribute
+        # listing the objects that reference it
+        self.relation = kwargs.get('relation')
+        self.related_name = kwargs.get('related_name')
+        # Single column index, unique=True makes it a unique index. Composite
+        # and partial indexes are declared with `Modules.Index.Index`.
+        self.index = kwargs.get('index', False)
+        self.unique = kwargs.get('unique', False)
\ No newline at end of file
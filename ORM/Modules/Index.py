@@ -0,0 +1,15 @@
+class Index:
+    # Model level index, e.g. in the model class:
+    #   __indexes__ = [
+    #       Index('manager', 'date'),
+    #       Index('emp_name', unique=True, where="manager IS NOT NULL"),
+    #   ]
+    def __init__(self, *columns, **kwargs):
+        if not columns:
+            raise ValueError('An index needs at least one column')
+        self.columns = columns
+        self.unique = kwargs.get('unique', False)
+        # Partial index condition, raw SQL
+        self.where = kwargs.get('where')
+        # Defaults to "<table>_<columns>_idx" ("_key" for unique indexes)
+        self.name = kwargs.get('name')
\ No newline at end of file
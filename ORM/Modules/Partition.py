@@ -0,0 +1,22 @@
+class PartitionBy:
+    # Table partitioning declared on a model, e.g. in the model class:
+    #   __partition_by__ = PartitionBy('range', 'date', interval='month', premake=3, retention=12)
+    #   __partition_by__ = PartitionBy('list', 'region', values={'eu': ['de', 'fr'], 'us': ['us']})
+    #   __partition_by__ = PartitionBy('hash', 'id', partitions=8)
+    def __init__(self, method, column, **kwargs):
+        if method not in ('range', 'list', 'hash'):
+            raise ValueError(f'Unsupported partitioning method: {method}')
+        self.method = method
+        self.column = column
+        # Range: one partition per 'day', 'week', 'month' or 'year', created
+        # `premake` periods ahead, detached once older than `retention`
+        # periods (kept forever when None)
+        self.interval = kwargs.get('interval', 'month')
+        self.premake = kwargs.get('premake', 3)
+        self.retention = kwargs.get('retention')
+        # List: partition name -> values
+        self.values = kwargs.get('values', {})
+        # Hash: number of partitions
+        self.partitions = kwargs.get('partitions', 8)
+        # Partition for the rows no other partition accepts (range and list)
+        self.default = kwargs.get('default', False)
\ No newline at end of file
@@ -0,0 +1,23 @@
+class Summary:
+    # Aggregates of a model's rows kept per group, e.g. in the model class:
+    #   __summaries__ = [
+    #       Summary('employees_by_manager', group_by=['manager'], fields=['id']),
+    #       Summary('employees_by_date', group_by=['date'], fields=['id'], refresh='concurrently'),
+    #   ]
+    # COUNT, SUM and AVG aggregates on the groups (and their rollups) are then
+    # read from the summary instead of the table, from the materialized views
+    # only with Employee.objects.allow_stale().
+    def __init__(self, name, group_by, fields=(), refresh='incremental'):
+        if not group_by:
+            raise ValueError('A summary needs at least one group_by column')
+        if refresh not in ('incremental', 'concurrently'):
+            raise ValueError(f'Unsupported summary refresh: {refresh}')
+        self.name = name
+        self.group_by = list(group_by)
+        # Columns summed, counted and averaged (and for materialized views,
+        # their minimum and maximum)
+        self.fields = list(fields)
+        # 'incremental': a table the manager's writes update in the same
+        # statement. 'concurrently': a materialized view, refreshed with
+        # REFRESH MATERIALIZED VIEW CONCURRENTLY (python app.py --summaries)
+        self.refresh = refresh
\ No newline at end of file
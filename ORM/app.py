@@ -1,10 +1,62 @@
-import psycopg2
-from itertools import zip_longest
-import click
-import pyfiglet
-from src.utils.db import db_settings
-from src.utils.create_migration import create_migration_file
-from src.utils.apply_migrations import apply_migration
+import io
+import keyword
+import threading
+import time
+import uuid
+from contextlib import (
+    AsyncExitStack,
+    ExitStack,
+    asynccontextmanager,
+    contextmanager,
+)
+from itertools import chain, islice, zip_longest
+from Modules.Column import Column
+from Modules.DataType import Integer, String
+from src.utils.db import (
+    db_settings,
+    pool_settings,
+    replica_settings,
+    routing_settings,
+)
+from src.utils.batch import (
+    AsyncBatch,
+    Batch,
+    fail_statements,
+    get_round_trips,
+    resolve_statement,
+    split_columns,
+)
+from src.utils.cache import QueryCache
+from src.utils.export import EXPORT_FORMATS, copy_to_arrow, copy_to_csv
+from src.utils.instrumentation import QueryInstrumentation
+from src.utils.query import (
+    AsyncQuerySet,
+    Avg,
+    Count,
+    Max,
+    Min,
+    QuerySet,
+    Sum,
+    check_identifier,
+)
+from src.utils.relations import attach_related, get_related_values, get_relation
+from src.utils.routing import ReplicaRouter, record_write, use_primary
+from src.utils.summaries import (
+    compile_fed_bulk_update,
+    compile_fed_update,
+    compile_fed_upsert,
+    compile_fed_write,
+    get_fed_summaries,
+    get_refresh_summary_queries,
+    get_summary_states,
+    returns_count,
+)
+from src.utils.copy_format import (
+    encode_binary_batch,
+    encode_text_batch,
+    get_binary_encoders,
+    get_column_types,
+)
 
 
 # Migration class
@@ -17,82 +69,306 @@ class Migration:
         pass
 
 
-# Click command for migrations
-@click.command()
-@click.option("--migrations", is_flag=True, type=str)
-@click.option("--add", type=str, is_flag=True, required=False)
-@click.option("--apply", type=str, is_flag=True, required=False)
-@click.argument("description", type=str, required=False)
-def migrations(migrations, add, apply, description):
-    click.echo(
-        "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
-    )
-    font = pyfiglet.Figlet(font="slant")
-    pydbmap_text = font.renderText("PyDBmap")
-    click.echo(pydbmap_text)
+# ------------ Manager (Model objects handler) ------------ #
+class BaseManager:
+    pool = None
+    router = None
+    cache = None
+    instrumentation = None
+    _pool_lock = threading.Lock()
 
-    click.echo(
-        "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
-    )
+    @classmethod
+    def set_connection(cls, database_settings, **pool_options):
+        # The pool is shared by every model manager; each query borrows a
+        # connection for its duration, see `ConnectionPool.checkout`.
+        from src.utils.pool import ConnectionPool
 
-    if migrations:
-        if add:
-            if not description:
-                click.echo("Please provide a description for the migration.")
-            else:
-                create_migration_file(description)
-                click.echo(f"Migration '{description}' added.")
-        elif apply:
-            try:
-                apply_migration()
-                click.echo("Migrations done!")
-            except:
-                click.echo("Migrations couldn't apply successfully.")
-        else:
-            click.echo("Invalid command")
-    else:
-        click.echo("Invalid command")
-
-    click.echo(
-        "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
-    )
+        if cls.pool is not None:
+            cls.pool.closeall()
+        cls.pool = ConnectionPool(database_settings, **pool_options)
 
+    @classmethod
+    def _get_pool(cls):
+        # Opened on first query from `db_settings`, so importing the models
+        # (or running the CLI) doesn't connect to the database
+        if cls.pool is None:
+            with cls._pool_lock:
+                if cls.pool is None:
+                    cls.set_connection(db_settings, **pool_settings)
+        return cls.pool
 
-if __name__ == "__main__":
-    migrations()
+    @classmethod
+    def set_replicas(
+        cls,
+        replica_settings,
+        read_your_writes_seconds=2,
+        retry_seconds=30,
+        **pool_options,
+    ):
+        # Reads (select, join, aggregates, ...) are spread over the replicas,
+        # writes and migrations always go to the primary
+        from src.utils.pool import ConnectionPool
+
+        if cls.router is not None:
+            cls.router.closeall()
+        replica_pools = [
+            ConnectionPool(settings, **{"min_size": 0, **pool_options})
+            for settings in replica_settings
+        ]
+        cls.router = ReplicaRouter(
+            replica_pools, read_your_writes_seconds, retry_seconds
+        )
 
+    @classmethod
+    def _get_router(cls):
+        # From DB_REPLICAS on first read, without replicas every read goes
+        # to the primary
+        if cls.router is None:
+            with cls._pool_lock:
+                if cls.router is None:
+                    # Replicas connect on first use, a replica down at
+                    # startup is then skipped instead of failing every read
+                    cls.set_replicas(
+                        replica_settings,
+                        **routing_settings,
+                        **{**pool_settings, "min_size": 0},
+                    )
+        return cls.router
 
-# ------------ Manager (Model objects handler) ------------ #
-class BaseManager:
-    connection = None
+    @classmethod
+    def use_primary(cls):
+        # with Employee.objects.use_primary(): read the primary in the block
+        return use_primary()
 
     @classmethod
-    def set_connection(cls, database_settings):
-        connection = psycopg2.connect(**database_settings)
-        connection.autocommit = (
-            True  # https://www.psycopg.org/docs/connection.html#connection.commit
+    def session(cls):
+        # Pin a single connection to the current thread inside the block, the
+        # block reads from the primary too
+        return cls._get_pool().pinned()
+
+    @contextmanager
+    def _read_checkout(self, exclusive=False):
+        # Connection of a replica, unless reads must see the primary (see
+        # `ReplicaRouter`) or a primary connection is pinned. A replica that
+        # can't be reached is skipped and the primary serves the read.
+        from src.utils.pool import CONNECTION_ERRORS
+
+        pool = self._get_pool()
+        replica_pool = (
+            None if pool.is_pinned() else self._get_router().get_replica_pool()
         )
-        cls.connection = connection
+        with ExitStack() as stack:
+            if replica_pool is not None:
+                try:
+                    connection = stack.enter_context(replica_pool.checkout(exclusive))
+                except CONNECTION_ERRORS:
+                    self._get_router().mark_down(replica_pool)
+                    replica_pool = None
+            if replica_pool is None:
+                connection = stack.enter_context(pool.checkout(exclusive))
+            yield connection
+
+    def _after_write(self, tables=()):
+        if self.cache is not None:
+            self.cache.invalidate(*tables)
+        record_write()
+
+    @classmethod
+    def enable_cache(cls, max_entries=1024, ttl=60, max_rows=10000):
+        # Opt-in cache of read results, dropped on writes through a manager
+        cls.cache = QueryCache(max_entries=max_entries, ttl=ttl, max_rows=max_rows)
 
     @classmethod
-    def _get_cursor(cls):
-        return cls.connection.cursor()
+    def disable_cache(cls):
+        cls.cache = None
 
     @classmethod
-    def _execute_query(cls, query, params=None):
-        cursor = cls._get_cursor()
-        cursor.execute(query, params)
+    def enable_instrumentation(cls, **options):
+        # Time every statement, log slow ones and keep per-shape stats, see
+        # `QueryInstrumentation` for the options and hooks
+        cls.instrumentation = QueryInstrumentation(**options)
+        return cls.instrumentation
+
+    @classmethod
+    def disable_instrumentation(cls):
+        cls.instrumentation = None
+
+    def _start_event(self, query, params=None):
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.start(query, params, self.model_class)
+
+    def _finish_event(self, event):
+        if event is not None and self.instrumentation.finish(event):
+            plan = self._explain(event.query, event.params)
+            self.instrumentation.record_plan(event, plan)
+
+    @contextmanager
+    def _record_event(self, query, params=None):
+        # The event of a statement, finished when it completes or fails (the
+        # error attached), or when the consumer of a stream stops early
+        event = self._start_event(query, params)
+        try:
+            yield event
+        except Exception as e:
+            if event is not None:
+                event.error = e
+            raise
+        finally:
+            self._finish_event(event)
+
+    def _explain(self, query, params=None):
+        with self._read_checkout() as connection, connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+            return "\n".join(line for (line,) in cursor.fetchall())
+
+    def _execute_query(self, query, params=None, tables=()):
+        with self._record_event(query, params) as event:
+            with self._get_pool().checkout() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params)
+                    rowcount = cursor.rowcount
+                    if returns_count(query):
+                        # Writes feeding summaries select their row count
+                        rowcount = cursor.fetchone()[0]
+            if event is not None:
+                event.rows = max(rowcount, 0)
+        self._after_write(tables)
+        return rowcount
+
+    def _fetch_chunks(self, query, params=None, chunk_size=2000, tables=()):
+        # Results of queries on `tables` are served from the cache if enabled
+        cache_key = None
+        if self.cache is not None and tables:
+            cache_key = self.cache.make_key(tables, query, params)
+        if cache_key is not None:
+            is_cached, rows = self.cache.get(cache_key)
+            if is_cached:
+                yield rows
+                return
+            generation = self.cache.get_generation(cache_key[0])
+            rows = list()
+
+        # Fetch data obtained with the query execution by batches of
+        # `chunk_size` to avoid to run out of memory.
+        with self._record_event(query, params) as event:
+            with self._read_checkout() as connection, connection.cursor() as cursor:
+                cursor.execute(query, params)
+                is_fetching_completed = False
+                while not is_fetching_completed:
+                    result = cursor.fetchmany(size=chunk_size)
+                    if event is not None:
+                        event.add_rows(result)
+                    if cache_key is not None and len(rows) <= self.cache.max_rows:
+                        rows.extend(result)
+                    yield result
+                    is_fetching_completed = len(result) < chunk_size
+
+        if cache_key is not None:
+            self.cache.set(cache_key, rows, generation)
+
+    def _fetch_one(self, query, params=None, tables=()):
+        rows = [
+            row
+            for result in self._fetch_chunks(query, params, tables=tables)
+            for row in result
+        ]
+        return rows[0] if rows else None
+
+    def _stream_query(self, query, params=None, chunk_size=2000):
+        # Named cursors are server-side: PostgreSQL keeps the result set and
+        # only `chunk_size` rows travel to the client per `fetchmany`.
+        # psycopg2 refuses them in autocommit mode, so the stream runs in its
+        # own transaction which is closed (and autocommit restored) once the
+        # generator is exhausted or discarded.
+        # The event is also finished when the consumer stops early
+        with self._record_event(query, params) as event:
+            with self._read_checkout(exclusive=True) as connection:
+                connection.autocommit = False
+                try:
+                    with connection.cursor(
+                        name=f"pydbmap_{uuid.uuid4().hex}"
+                    ) as cursor:
+                        cursor.itersize = chunk_size
+                        cursor.execute(query, params)
+                        is_fetching_completed = False
+                        while not is_fetching_completed:
+                            result = cursor.fetchmany(size=chunk_size)
+                            if event is not None:
+                                event.add_rows(result)
+                            if result:
+                                column_names = [
+                                    column.name for column in cursor.description
+                                ]
+                                yield column_names, result
+                            is_fetching_completed = len(result) < chunk_size
+                finally:
+                    if not connection.closed:
+                        connection.rollback()
+                        connection.autocommit = True
 
     def __init__(self, model_class):
         self.model_class = model_class
 
-    def select(
-        self,
-        *field_names,
-        group_by=None,
-        order_by=None,
-        order_direction="ASC",
-        chunk_size=2000,
+    def _get_tables(self):
+        return (self.model_class.table_name,)
+
+    def all(self):
+        return QuerySet(self)
+
+    def filter(self, **lookups):
+        # Employee.objects.filter(salary__gt=1000).order_by("-salary").limit(10)
+        return QuerySet(self).filter(**lookups)
+
+    def exclude(self, **lookups):
+        return QuerySet(self).exclude(**lookups)
+
+    def order_by(self, *field_names):
+        return QuerySet(self).order_by(*field_names)
+
+    def in_partition(self, value):
+        # Employee.objects.in_partition("2026-10-18").filter(...), see
+        # `QuerySet.in_partition`
+        return self.all().in_partition(value)
+
+    def skip_summaries(self):
+        # Aggregates computed from the table, see `QuerySet.skip_summaries`
+        return self.all().skip_summaries()
+
+    def allow_stale(self):
+        # Aggregates also read from materialized views, see `QuerySet.allow_stale`
+        return self.all().allow_stale()
+
+    def prefetch_related(self, *relation_names):
+        # Employee.objects.prefetch_related("department").filter(...).all()
+        return QuerySet(self).prefetch_related(*relation_names)
+
+    def _get_relation(self, relation_name):
+        return get_relation(self.model_class, relation_name, MetaModel.models)
+
+    def prefetch(self, model_objects, *relation_names):
+        # Load relations on already fetched objects with a single
+        # `WHERE field = ANY(%s)` query per relation for the whole list,
+        # instead of one query per object.
+        for relation_name in relation_names:
+            relation = self._get_relation(relation_name)
+            values = get_related_values(model_objects, relation)
+            related_objects = list()
+            if values:
+                related_objects = relation.model_class.objects.filter(
+                    **{f"{relation.related_field_name}__in": values}
+                ).all()
+            attach_related(model_objects, relation, related_objects)
+        return model_objects
+
+    def paginate(self, order_by=None, page_size=50, after=None):
+        # Keyset pagination, returns a `Page(items, next_token)`
+        return QuerySet(self).paginate(
+            page_size=page_size, after=after, order_by=order_by
+        )
+
+    def _build_select_query(
+        self, field_names, group_by=None, order_by=None, order_direction="ASC"
     ):
         # Build SELECT query
         fields_format = ", ".join(field_names)
@@ -109,26 +385,122 @@ class BaseManager:
             order_by_columns = ", ".join(order_by)
             query += f" ORDER BY {order_by_columns} {order_direction}"
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
-        # Fetch data obtained with the previous query execution
+        return query
+
+    def select(
+        self,
+        *field_names,
+        group_by=None,
+        order_by=None,
+        order_direction="ASC",
+        chunk_size=2000,
+    ):
+        query = self._build_select_query(
+            field_names, group_by, order_by, order_direction
+        )
+
+        # Execute query, fetch data obtained with the query execution
         # and transform it into `model_class` objects.
-        # The fetching is done by batches of `chunk_size` to
-        # avoid to run out of memory.
+        row_factory = self.model_class._get_row_factory(field_names)
         model_objects = list()
-        is_fetching_completed = False
-        while not is_fetching_completed:
-            result = cursor.fetchmany(size=chunk_size)
-            for row_values in result:
-                keys, values = field_names, row_values
-                row_data = dict(zip(keys, values))
-                model_objects.append(self.model_class(**row_data))
-            is_fetching_completed = len(result) < chunk_size
+        for result in self._fetch_chunks(
+            query, chunk_size=chunk_size, tables=self._get_tables()
+        ):
+            model_objects.extend(map(row_factory, result))
 
         return model_objects
 
-    def bulk_insert(self, rows: list):
+    def iterate(
+        self,
+        *field_names,
+        group_by=None,
+        order_by=None,
+        order_direction="ASC",
+        chunk_size=2000,
+        batches=False,
+    ):
+        # Same query as `select`, but the rows are read through a server-side
+        # cursor and the `model_class` objects are yielded lazily, so at most
+        # `chunk_size` rows are held in memory at any time.
+        query = self._build_select_query(
+            field_names, group_by, order_by, order_direction
+        )
+        row_factory = self.model_class._get_row_factory(field_names)
+        for _, result in self._stream_query(query, chunk_size=chunk_size):
+            model_objects = list(map(row_factory, result))
+            if batches:
+                yield model_objects
+            else:
+                yield from model_objects
+
+    stream = iterate
+
+    def parallel_scan(self, workers=4, key="id", **options):
+        # Whole table reads (exports, backfills) on several cores, see
+        # `QuerySet.parallel_scan`
+        return self.all().parallel_scan(workers=workers, key=key, **options)
+
+    def select_columns(
+        self,
+        *field_names,
+        order_by=None,
+        order_direction="ASC",
+        chunk_size=2000,
+        decimal="float",
+    ):
+        # Columnar counterpart of `select`: returns one NumPy array per field
+        # instead of one `model_class` object per row. Array dtypes come from
+        # the model's `Column` declarations (`decimal="object"` keeps numeric
+        # and money values as `Decimal`).
+        from src.utils.columnar import (
+            ColumnBuffer,
+            get_column_dtype,
+            get_column_expression,
+        )
+
+        columns = [self.model_class.__columns__.get(name) for name in field_names]
+        query = self._build_select_query(
+            [
+                get_column_expression(field_name, column)
+                for field_name, column in zip(field_names, columns)
+            ],
+            order_by=order_by,
+            order_direction=order_direction,
+        )
+
+        buffers = [
+            ColumnBuffer(get_column_dtype(column, decimal), capacity=chunk_size)
+            for column in columns
+        ]
+        for result in self._fetch_chunks(
+            query, chunk_size=chunk_size, tables=self._get_tables()
+        ):
+            if not result:
+                continue
+            for buffer, values in zip(buffers, zip(*result)):
+                buffer.extend(values)
+
+        return {
+            field_name: buffer.to_array()
+            for field_name, buffer in zip(field_names, buffers)
+        }
+
+    def _get_primary_keys(self):
+        return [
+            field_name
+            for field_name, column in self.model_class.__columns__.items()
+            if column.primary_key
+        ]
+
+    def _feed_summaries(self, query, sign):
+        # INSERT (sign 1) or DELETE (sign -1) `query`, also adding its rows
+        # to (or subtracting them from) the model's incremental summaries
+        summaries = get_fed_summaries(self.model_class._summaries)
+        if not summaries:
+            return query
+        return compile_fed_write(query, sign, summaries)
+
+    def _build_insert_query(self, rows):
         # Build INSERT query and params:
         field_names = rows[0].keys()
         assert all(
@@ -150,35 +522,444 @@ class BaseManager:
             row_values = [row[field_name] for field_name in field_names]
             params += row_values
 
+        return self._feed_summaries(query, sign=1), params
+
+    def bulk_insert(self, rows: list):
+        query, params = self._build_insert_query(rows)
+
         # Execute query
-        self._execute_query(query, params)
+        self._execute_query(query, params, tables=self._get_tables())
+
+    def copy_insert(self, rows, field_names=None, batch_size=10000, copy_format="text"):
+        # Stream `rows` (any iterable of dicts, or of tuples ordered like
+        # `field_names`) into the table with COPY ... FROM STDIN, flushing
+        # every `batch_size` rows so only one batch is ever held in memory.
+        if copy_format not in ("text", "binary"):
+            raise ValueError(f"Unsupported COPY format: {copy_format}")
+
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None:
+            return {"rows": 0, "seconds": 0.0, "rows_per_second": 0.0}
+        rows = chain([first_row], rows)
+        if isinstance(first_row, dict):
+            field_names = field_names or list(first_row.keys())
+            rows = ([row[field_name] for field_name in field_names] for row in rows)
+        elif not field_names:
+            raise ValueError("field_names is required when rows are not dicts")
 
-    def update(self, new_data: dict):
+        fields_format = ", ".join(field_names)
+        query = (
+            f"COPY {self.model_class.table_name} ({fields_format}) "
+            f"FROM STDIN WITH (FORMAT {copy_format})"
+        )  # https://www.psycopg.org/docs/cursor.html#cursor.copy_expert
+        summaries = get_fed_summaries(self.model_class._summaries)
+        if summaries:
+            # COPY returns no rows: each batch is copied into a temporary
+            # table, then inserted from it feeding the summaries, and
+            # committed like the batches copied into the table
+            stage_name, create_query, query = self._build_stage_queries(
+                field_names, copy_format
+            )
+            insert_query = self._feed_summaries(
+                f"INSERT INTO {self.model_class.table_name} ({fields_format}) "
+                f"SELECT {fields_format} FROM {stage_name}",
+                sign=1,
+            )
+
+        loaded_rows = 0
+        start = time.perf_counter()
+        with self._record_event(query) as event, ExitStack() as stack:
+            if summaries:
+                cursor = stack.enter_context(self._transaction())
+            else:
+                connection = stack.enter_context(self._get_pool().checkout())
+                cursor = stack.enter_context(connection.cursor())
+            if copy_format == "binary":
+                column_types = get_column_types(cursor, self.model_class.table_name)
+                encoders = get_binary_encoders(column_types, field_names)
+
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                if copy_format == "binary":
+                    data = io.BytesIO(encode_binary_batch(batch, encoders))
+                else:
+                    data = io.StringIO(encode_text_batch(batch))
+                if summaries:
+                    cursor.execute(create_query)
+                cursor.copy_expert(query, data)
+                if summaries:
+                    self._execute_in(cursor, insert_query)
+                    cursor.connection.commit()
+                loaded_rows += len(batch)
+            if event is not None:
+                event.rows = loaded_rows
+        seconds = time.perf_counter() - start
+        self._after_write(self._get_tables())
+
+        return {
+            "rows": loaded_rows,
+            "seconds": seconds,
+            "rows_per_second": loaded_rows / seconds if seconds else 0.0,
+        }
+
+    def export(self, path, format="csv", columns=None, where=None, **options):
+        # Employee.objects.export("employees.parquet", format="parquet",
+        #                         columns=["id", "salary"], where={"salary__gt": 1000})
+        # See `QuerySet.export`
+        queryset = self.filter(**(where or {}))
+        if columns:
+            queryset = queryset.only(*columns)
+        return queryset.export(path, format=format, **options)
+
+    def _export(
+        self, query, params, path, format="csv", chunk_size=1 << 20, header=True
+    ):
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+
+        start = time.perf_counter()
+        with self._record_event(query, params) as event:
+            with self._read_checkout() as connection, connection.cursor() as cursor:
+                query = self._bind_params(cursor, query, params)
+                if format == "csv":
+                    rows = copy_to_csv(cursor, query, path, chunk_size, header)
+                else:
+                    rows = copy_to_arrow(cursor, query, path, format, chunk_size)
+            if event is not None:
+                event.rows = rows
+        seconds = time.perf_counter() - start
+
+        return {
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds else 0.0,
+        }
+
+    def _build_update_query(self, new_data):
         # Build UPDATE query and params
+        if not new_data:
+            raise ValueError("update() needs at least one field to set")
         field_names = new_data.keys()
         placeholder_format = ", ".join(
             [f"{field_name} = %s" for field_name in field_names]
         )
         query = f"UPDATE {self.model_class.table_name} SET {placeholder_format}"
         params = list(new_data.values())
+        summaries = get_fed_summaries(self.model_class._summaries, field_names)
+        if summaries:
+            query = compile_fed_update(
+                self.model_class.table_name,
+                tuple(field_names),
+                "",
+                summaries,
+                self._get_primary_keys(),
+            )
+
+        return query, params
+
+    def update(self, new_data: dict):
+        query, params = self._build_update_query(new_data)
 
         # Execute query
-        self._execute_query(query, params)
+        self._execute_query(query, params, tables=self._get_tables())
+
+    @contextmanager
+    def _transaction(self):
+        # One connection and transaction for several statements, rolled back
+        # if any of them fails
+        with self._get_pool().checkout(exclusive=True) as connection:
+            connection.autocommit = False
+            try:
+                with connection.cursor() as cursor:
+                    yield cursor
+                connection.commit()
+            finally:
+                if not connection.closed:
+                    connection.rollback()
+                    connection.autocommit = True
+
+    def _execute_in(self, cursor, query, params=None):
+        with self._record_event(query, params) as event:
+            cursor.execute(query, params)
+            rowcount = max(cursor.rowcount, 0)
+            if returns_count(query):
+                # Writes feeding summaries select their row count
+                rowcount = cursor.fetchone()[0]
+            if event is not None:
+                event.rows = rowcount
+        return rowcount
+
+    def batch(self):
+        # Queue statements and send them together, see `Batch`
+        return Batch(self)
+
+    def _bind_params(self, cursor, query, params=None):
+        # The query with its params inlined, for statements taking no params
+        # (COPY) or sent along with others
+        from psycopg2.extensions import encodings
+
+        return cursor.mogrify(query, params).decode(
+            encodings[cursor.connection.encoding]
+        )
 
-    def delete(self):
+    def _build_round_trip(self, cursor, writes, reads):
+        # One query string: the writes, then the read (or the one row reads
+        # joined in a single row)
+        queries = [
+            self._bind_params(cursor, statement.query, statement.params)
+            for statement in writes
+        ]
+        if len(reads) > 1:
+            queries.append(
+                "SELECT * FROM "
+                + ", ".join(
+                    f"({self._bind_params(cursor, read.query, read.params)})"
+                    f" AS r{index}"
+                    for index, read in enumerate(reads)
+                )
+            )
+        elif reads:
+            queries.append(self._bind_params(cursor, reads[0].query, reads[0].params))
+        return "; ".join(queries)
+
+    def _execute_batch(self, statements):
+        # psycopg2 has no pipeline mode, the statements are sent as a few
+        # multi-statement query strings (see `get_round_trips`), all in one
+        # transaction. Such a string only reports the row count of its last
+        # statement: write futures resolve to None.
+        results = list()
+        try:
+            with self._transaction() as cursor:
+                for writes, reads in get_round_trips(statements):
+                    query = self._build_round_trip(cursor, writes, reads)
+                    with self._record_event(query) as event:
+                        # The result rows are the read's, none is consumed
+                        cursor.execute(query)
+                        results += [(write, None) for write in writes]
+                        if len(reads) > 1:
+                            row = cursor.fetchone()
+                            results += [
+                                (read, [columns])
+                                for read, columns in zip(
+                                    reads, split_columns(row, reads)
+                                )
+                            ]
+                        elif reads:
+                            rows = cursor.fetchall()
+                            results.append((reads[0], rows))
+                            if event is not None:
+                                event.add_rows(rows)
+        except Exception as e:
+            fail_statements(statements, e)
+            raise
+
+        tables = {
+            table
+            for statement in statements
+            if statement.build is None
+            for table in statement.tables
+        }
+        if tables:
+            self._after_write(tables)
+        # Once committed, so a result is never seen for a rolled back batch
+        for statement, rows in results:
+            resolve_statement(statement, rows)
+
+    def _prepare_bulk_rows(self, rows, key_fields):
+        # Rows as value lists ordered like `field_names`. Rows sharing a key
+        # are merged into the last one: a single statement can't update the
+        # same row twice.
+        rows_by_key = dict()
+        for row in rows:
+            missing_fields = [name for name in key_fields if name not in row]
+            if missing_fields:
+                raise ValueError(f"Rows are missing the key fields {missing_fields}")
+            rows_by_key[tuple(row[field_name] for field_name in key_fields)] = row
+        if not rows_by_key:
+            return (), []
+
+        rows = list(rows_by_key.values())
+        field_names = tuple(map(check_identifier, rows[0].keys()))
+        if any(tuple(row.keys()) != field_names for row in rows[1:]):
+            raise ValueError("All rows must have the same fields")
+        values = [[row[field_name] for field_name in field_names] for row in rows]
+        return field_names, values
+
+    def _get_bulk_batches(self, values, field_names, batch_size):
+        # psycopg2 interpolates the parameters client-side, a statement holds
+        # any number of them
+        return (values[i : i + batch_size] for i in range(0, len(values), batch_size))
+
+    def _build_values_source(self, field_names, column_types, row_count):
+        # Casts give the VALUES columns the table types, e.g. `%s::integer`
+        try:
+            row_format = ", ".join(
+                f"%s::{column_types[field_name]}" for field_name in field_names
+            )
+        except KeyError as e:
+            raise ValueError(
+                f"{self.model_class.table_name} has no column {e.args[0]!r}"
+            )
+        values_format = ", ".join([f"({row_format})"] * row_count)
+        return f"(VALUES {values_format}) AS v ({', '.join(field_names)})"
+
+    def _build_bulk_update_query(self, field_names, key_fields, source):
+        # UPDATE employees AS t SET salary = v.salary
+        #   FROM (VALUES (%s::integer, %s::character varying)) AS v (id, salary)
+        #   WHERE t.id = v.id
+        set_fields = [name for name in field_names if name not in key_fields]
+        if not set_fields:
+            raise ValueError("Rows have no field to update besides the key")
+        set_format = ", ".join(f"{name} = v.{name}" for name in set_fields)
+        where_format = " AND ".join(f"t.{name} = v.{name}" for name in key_fields)
+        return (
+            f"UPDATE {self.model_class.table_name} AS t SET {set_format} "
+            f"FROM {source} WHERE {where_format}"
+        )
+
+    def _build_upsert_query(self, field_names, conflict, source):
+        # INSERT INTO employees (id, salary) VALUES (%s, %s), (%s, %s)
+        #   ON CONFLICT (id) DO UPDATE SET salary = EXCLUDED.salary
+        set_fields = [name for name in field_names if name not in conflict]
+        action = "DO NOTHING"
+        if set_fields:
+            set_format = ", ".join(f"{name} = EXCLUDED.{name}" for name in set_fields)
+            action = f"DO UPDATE SET {set_format}"
+        return (
+            f"INSERT INTO {self.model_class.table_name} ({', '.join(field_names)}) "
+            f"{source} ON CONFLICT ({', '.join(conflict)}) {action}"
+        )
+
+    def _build_stage_queries(self, field_names, copy_format="text"):
+        # Temporary table with the types of the model table, dropped on commit
+        stage_name = f"pydbmap_stage_{uuid.uuid4().hex}"
+        fields_format = ", ".join(field_names)
+        create_query = (
+            f"CREATE TEMPORARY TABLE {stage_name} ON COMMIT DROP AS "
+            f"SELECT {fields_format} FROM {self.model_class.table_name} WITH NO DATA"
+        )
+        copy_query = (
+            f"COPY {stage_name} ({fields_format}) FROM STDIN "
+            f"WITH (FORMAT {copy_format})"
+        )
+        return stage_name, create_query, copy_query
+
+    def _copy_to_stage(self, cursor, field_names, values, batch_size):
+        stage_name, create_query, copy_query = self._build_stage_queries(field_names)
+        cursor.execute(create_query)
+        for i in range(0, len(values), batch_size):
+            data = io.StringIO(encode_text_batch(values[i : i + batch_size]))
+            cursor.copy_expert(copy_query, data)
+        return stage_name
+
+    def _get_bulk_summaries(self, field_names, key_fields, upsert):
+        # The incremental summaries a bulk write feeds: an upsert can insert
+        # rows, an update only changes the fields it sets
+        if upsert:
+            return get_fed_summaries(self.model_class._summaries)
+        set_fields = [name for name in field_names if name not in key_fields]
+        return get_fed_summaries(self.model_class._summaries, set_fields)
+
+    def _build_bulk_source(self, field_names, row_count, column_types, upsert):
+        if upsert and column_types is None:
+            # INSERT takes the column types, no cast or alias needed
+            row_format = f"({', '.join(['%s'] * len(field_names))})"
+            return f"VALUES {', '.join([row_format] * row_count)}"
+        source = self._build_values_source(field_names, column_types, row_count)
+        if upsert:
+            # Upserts feeding summaries read the rows in a CTE
+            return f"SELECT {', '.join(field_names)} FROM {source}"
+        return source
+
+    def _build_bulk_query(self, field_names, key_fields, source, upsert):
+        summaries = self._get_bulk_summaries(field_names, key_fields, upsert)
+        if upsert and summaries:
+            return compile_fed_upsert(
+                self.model_class.table_name, field_names, key_fields, source, summaries
+            )
+        if upsert:
+            return self._build_upsert_query(field_names, key_fields, source)
+        query = self._build_bulk_update_query(field_names, key_fields, source)
+        if summaries:
+            query = compile_fed_bulk_update(
+                self.model_class.table_name,
+                [name for name in field_names if name not in key_fields],
+                key_fields,
+                source,
+                summaries,
+                self._get_primary_keys(),
+            )
+        return query
+
+    def _get_stage_source(self, field_names, stage_name, upsert):
+        if upsert:
+            return f"SELECT {', '.join(field_names)} FROM {stage_name}"
+        return f"{stage_name} AS v"
+
+    def _bulk_write(self, rows, key_fields, batch_size, method, upsert):
+        if method not in ("values", "copy"):
+            raise ValueError(f"Unsupported bulk method: {method}")
+        key_fields = (key_fields,) if isinstance(key_fields, str) else tuple(key_fields)
+        field_names, values = self._prepare_bulk_rows(rows, key_fields)
+        if not values:
+            return 0
+
+        rowcount = 0
+        with self._transaction() as cursor:
+            if method == "copy":
+                # COPY every row into a temporary table, then a single join
+                stage_name = self._copy_to_stage(
+                    cursor, field_names, values, batch_size
+                )
+                source = self._get_stage_source(field_names, stage_name, upsert)
+                query = self._build_bulk_query(field_names, key_fields, source, upsert)
+                rowcount = self._execute_in(cursor, query)
+            else:
+                column_types = None
+                if not upsert or self._get_bulk_summaries(
+                    field_names, key_fields, upsert
+                ):
+                    column_types = get_column_types(cursor, self.model_class.table_name)
+                for batch in self._get_bulk_batches(values, field_names, batch_size):
+                    source = self._build_bulk_source(
+                        field_names, len(batch), column_types, upsert
+                    )
+                    query = self._build_bulk_query(
+                        field_names, key_fields, source, upsert
+                    )
+                    params = list(chain.from_iterable(batch))
+                    rowcount += self._execute_in(cursor, query, params)
+
+        self._after_write(self._get_tables())
+        return rowcount
+
+    def bulk_update(self, rows, key="id", batch_size=1000, method="values"):
+        # Set different values on each row, matched on `key` (a field name or
+        # a list of them), with one statement per `batch_size` rows, all in
+        # one transaction. method="copy" loads the rows with COPY into a
+        # temporary table and updates from it, faster for large syncs.
+        # Returns the number of updated rows.
+        return self._bulk_write(rows, key, batch_size, method, upsert=False)
+
+    def bulk_upsert(self, rows, conflict=("id",), batch_size=1000, method="values"):
+        # INSERT ... ON CONFLICT (`conflict`) DO UPDATE the other fields, see
+        # `bulk_update`. `conflict` must match a unique index of the table.
+        return self._bulk_write(rows, conflict, batch_size, method, upsert=True)
+
+    def _build_delete_query(self):
         # Build DELETE query
-        query = f"DELETE FROM {self.model_class.table_name} "
+        return self._feed_summaries(
+            f"DELETE FROM {self.model_class.table_name}", sign=-1
+        )
+
+    def delete(self):
+        query = self._build_delete_query()
 
         # Execute query
-        self._execute_query(query)
+        self._execute_query(query, tables=self._get_tables())
 
-    def join(
-        self,
-        *tables,
-        on_conditions=None,
-        where_conditions=None,
-        select_fields=None,
-        chunk_size=2000,
+    def _build_join_query(
+        self, tables, on_conditions=None, where_conditions=None, select_fields=None
     ):
         # Build JOIN query
         select_fields_format = ", ".join(select_fields) if select_fields else "*"
@@ -199,88 +980,685 @@ class BaseManager:
             if where_conditions_format:
                 query += f" WHERE {where_conditions_format}"
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+        return query
+
+    def join(
+        self,
+        *tables,
+        on_conditions=None,
+        where_conditions=None,
+        select_fields=None,
+        chunk_size=2000,
+    ):
+        if not select_fields:
+            # Rows are keyed on the result column names, only known from the
+            # cursor the streamed query reads them with
+            return list(
+                self.iterate_join(
+                    *tables,
+                    on_conditions=on_conditions,
+                    where_conditions=where_conditions,
+                    chunk_size=chunk_size,
+                )
+            )
+
+        query = self._build_join_query(
+            tables, on_conditions, where_conditions, select_fields
+        )
 
-        # Fetch data obtained with the query execution
-        # and transform it into dictionaries.
+        # Execute query, fetch data obtained with the query execution
+        # and transform it into `model_class` objects keyed on `select_fields`.
+        row_factory = self.model_class._get_row_factory(select_fields)
         model_objects = list()
-        is_fetching_completed = False
-        while not is_fetching_completed:
-            result = cursor.fetchmany(size=chunk_size)
-            for row_values in result:
-                keys, values = select_fields_format, row_values
-                row_data = dict(zip(keys, values))
-                model_objects.append(self.model_class(**row_data))
-            is_fetching_completed = len(result) < chunk_size
+        joined_tables = [table.split()[0] for table in tables]
+        for result in self._fetch_chunks(
+            query, chunk_size=chunk_size, tables=joined_tables
+        ):
+            model_objects.extend(map(row_factory, result))
 
         return model_objects
 
-    def aggregate_sum(self, field_name):
-        # Build SUM query
-        query = f"SELECT SUM({field_name}) FROM {self.model_class.table_name}"
+    def iterate_join(
+        self,
+        *tables,
+        on_conditions=None,
+        where_conditions=None,
+        select_fields=None,
+        chunk_size=2000,
+        batches=False,
+    ):
+        # Streaming counterpart of `join`, see `iterate`.
+        query = self._build_join_query(
+            tables, on_conditions, where_conditions, select_fields
+        )
+        for column_names, result in self._stream_query(query, chunk_size=chunk_size):
+            row_factory = self.model_class._get_row_factory(
+                select_fields or column_names
+            )
+            model_objects = list(map(row_factory, result))
+            if batches:
+                yield model_objects
+            else:
+                yield from model_objects
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+    stream_join = iterate_join
 
-        # Fetch the result
-        result = cursor.fetchone()
-        return result[0] if result else None
+    def aggregate(self, group_by=None, as_arrays=False, **aggregates):
+        # Employee.objects.aggregate(count=Count(), total=Sum("salary"), mean=Avg("salary"))
+        # See `QuerySet.aggregate`, use `filter(...).aggregate(...)` to filter rows.
+        return QuerySet(self).aggregate(
+            group_by=group_by, as_arrays=as_arrays, **aggregates
+        )
+
+    def aggregate_sum(self, field_name):
+        return self.aggregate(value=Sum(field_name))["value"]
 
     def aggregate_avg(self, field_name):
-        # Build AVG query
-        query = f"SELECT AVG({field_name}) FROM {self.model_class.table_name}"
+        return self.aggregate(value=Avg(field_name))["value"]
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+    def aggregate_count(self):
+        return self.aggregate(value=Count())["value"]
 
-        # Fetch the result
-        result = cursor.fetchone()
-        return result[0] if result else None
+    def aggregate_min(self, field_name):
+        return self.aggregate(value=Min(field_name))["value"]
 
-    def aggregate_count(self):
-        # Build COUNT query
-        query = f"SELECT COUNT(*) FROM {self.model_class.table_name}"
+    def aggregate_max(self, field_name):
+        return self.aggregate(value=Max(field_name))["value"]
+
+    def _get_refresh_queries(self, rebuild):
+        return [
+            query
+            for name, state in self.model_class._summaries.items()
+            for query in get_refresh_summary_queries(name, state, rebuild)
+        ]
+
+    def refresh_summaries(self, rebuild=False):
+        # Refresh the model's materialized view summaries and delete the
+        # emptied groups of the incremental ones (computed again from the
+        # table with `rebuild`, after writes that didn't go through the
+        # manager), e.g. on a schedule. See `get_refresh_summary_queries`.
+        queries = self._get_refresh_queries(rebuild)
+        if queries:
+            with self._transaction() as cursor:
+                for query in queries:
+                    self._execute_in(cursor, query)
+            self._after_write(self._get_tables())
+
+
+class AsyncBaseManager(BaseManager):
+    # asyncio counterpart of `BaseManager` on psycopg 3, used through
+    # `Model.aobjects`. Its query methods are coroutines (or async generators
+    # for streaming) sharing the query building, results cache and row
+    # factories of `BaseManager`.
+    async_pool = None
+    async_router = None
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+    @classmethod
+    async def _open_async_pool(
+        cls, database_settings, min_size=1, max_size=10, timeout=30
+    ):
+        from psycopg.conninfo import make_conninfo
+        from psycopg_pool import AsyncConnectionPool
+
+        # psycopg 3 takes libpq parameter names
+        conninfo = make_conninfo(
+            **{
+                "dbname" if key == "database" else key: value
+                for key, value in database_settings.items()
+                if value is not None
+            }
+        )
+        pool = AsyncConnectionPool(
+            conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            kwargs={"autocommit": True},
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        await pool.open()
+        return pool
 
-        # Fetch the result
-        result = cursor.fetchone()
-        return result[0] if result else 0
+    @classmethod
+    async def set_async_connection(cls, database_settings, **pool_options):
+        pool = await cls._open_async_pool(database_settings, **pool_options)
+        if cls.async_pool is not None:
+            await cls.async_pool.close()
+        cls.async_pool = pool
 
-    def aggregate_min(self, field_name):
-        # Build MIN query
-        query = f"SELECT MIN({field_name}) FROM {self.model_class.table_name}"
+    @classmethod
+    async def _get_async_pool(cls):
+        # Opened on first use from the same settings as the sync pool
+        if cls.async_pool is None:
+            pool = await cls._open_async_pool(
+                db_settings,
+                min_size=pool_settings["min_size"],
+                max_size=pool_settings["max_size"],
+                timeout=pool_settings["timeout"],
+            )
+            if cls.async_pool is None:
+                cls.async_pool = pool
+            else:  # opened concurrently by another task
+                await pool.close()
+        return cls.async_pool
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+    @classmethod
+    async def set_async_replicas(
+        cls,
+        replica_settings,
+        read_your_writes_seconds=2,
+        retry_seconds=30,
+        **pool_options,
+    ):
+        # psycopg 3 pools of the replicas, routed like `BaseManager.set_replicas`
+        router = ReplicaRouter(
+            [
+                await cls._open_async_pool(settings, **{**pool_options, "min_size": 0})
+                for settings in replica_settings
+            ],
+            read_your_writes_seconds,
+            retry_seconds,
+        )
+        if cls.async_router is not None:
+            for replica_pool in cls.async_router.replica_pools:
+                await replica_pool.close()
+        cls.async_router = router
 
-        # Fetch the result
-        result = cursor.fetchone()
-        return result[0] if result else None
+    @classmethod
+    async def _get_async_router(cls):
+        # From DB_REPLICAS on first read, like `BaseManager._get_router`
+        if cls.async_router is None:
+            await cls.set_async_replicas(
+                replica_settings,
+                **routing_settings,
+                max_size=pool_settings["max_size"],
+                timeout=pool_settings["timeout"],
+            )
+        return cls.async_router
+
+    @asynccontextmanager
+    async def _read_connection(self):
+        # Connection of a replica, unless reads must see the primary, see
+        # `BaseManager._read_checkout`
+        from psycopg import OperationalError
+        from psycopg_pool import PoolTimeout
+
+        router = await self._get_async_router()
+        replica_pool = router.get_replica_pool()
+        async with AsyncExitStack() as stack:
+            if replica_pool is not None:
+                try:
+                    connection = await stack.enter_async_context(
+                        replica_pool.connection()
+                    )
+                except (OperationalError, PoolTimeout):
+                    router.mark_down(replica_pool)
+                    replica_pool = None
+            if replica_pool is None:
+                pool = await self._get_async_pool()
+                connection = await stack.enter_async_context(pool.connection())
+            yield connection
+
+    async def _finish_event(self, event):
+        if event is not None and self.instrumentation.finish(event):
+            plan = await self._explain(event.query, event.params)
+            self.instrumentation.record_plan(event, plan)
+
+    @asynccontextmanager
+    async def _record_event(self, query, params=None):
+        # See `BaseManager._record_event`
+        event = self._start_event(query, params)
+        try:
+            yield event
+        except Exception as e:
+            if event is not None:
+                event.error = e
+            raise
+        finally:
+            await self._finish_event(event)
+
+    async def _explain(self, query, params=None):
+        pool = await self._get_async_pool()
+        async with pool.connection() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+                return "\n".join(line for (line,) in await cursor.fetchall())
+
+    async def _execute_query(self, query, params=None, tables=()):
+        async with self._record_event(query, params) as event:
+            pool = await self._get_async_pool()
+            async with pool.connection() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    rowcount = cursor.rowcount
+                    if returns_count(query):
+                        rowcount = (await cursor.fetchone())[0]
+            if event is not None:
+                event.rows = max(rowcount, 0)
+        self._after_write(tables)
+        return rowcount
+
+    async def _fetch_all(self, query, params=None, tables=()):
+        cache_key = None
+        if self.cache is not None and tables:
+            cache_key = self.cache.make_key(tables, query, params)
+        if cache_key is not None:
+            is_cached, rows = self.cache.get(cache_key)
+            if is_cached:
+                return rows
+            generation = self.cache.get_generation(cache_key[0])
+
+        async with self._record_event(query, params) as event:
+            async with self._read_connection() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    rows = await cursor.fetchall()
+            if event is not None:
+                event.add_rows(rows)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, rows, generation)
+        return rows
+
+    async def _stream_query(self, query, params=None, chunk_size=2000):
+        # Server-side cursor, see `BaseManager._stream_query`
+        async with self._record_event(query, params) as event:
+            async with self._read_connection() as connection:
+                async with connection.transaction(), connection.cursor(
+                    name=f"pydbmap_{uuid.uuid4().hex}"
+                ) as cursor:
+                    await cursor.execute(query, params)
+                    is_fetching_completed = False
+                    while not is_fetching_completed:
+                        result = await cursor.fetchmany(size=chunk_size)
+                        if event is not None:
+                            event.add_rows(result)
+                        if result:
+                            column_names = [
+                                column.name for column in cursor.description
+                            ]
+                            yield column_names, result
+                        is_fetching_completed = len(result) < chunk_size
+
+    # Inherited methods running on the psycopg2 pool would block the event
+    # loop, they're only available on `Model.objects`
+    def _fetch_chunks(self, *args, **kwargs):
+        raise TypeError("Blocking read on an async manager, use Model.objects")
 
-    def aggregate_max(self, field_name):
-        # Build MAX query
-        query = f"SELECT MAX({field_name}) FROM {self.model_class.table_name}"
+    @classmethod
+    def session(cls):
+        raise TypeError("session pins a blocking connection, use Model.objects")
 
-        # Execute query
-        cursor = self._get_cursor()
-        cursor.execute(query)
+    def select_columns(self, *args, **kwargs):
+        raise TypeError("select_columns is blocking, use Model.objects.select_columns")
+
+    def copy_insert(self, *args, **kwargs):
+        raise TypeError("copy_insert is blocking, use Model.objects.copy_insert")
+
+    def export(self, *args, **kwargs):
+        raise TypeError("export is blocking, use Model.objects.export")
+
+    def parallel_scan(self, *args, **kwargs):
+        raise TypeError("parallel_scan is blocking, use Model.objects.parallel_scan")
+
+    def all(self):
+        return AsyncQuerySet(self)
+
+    def filter(self, **lookups):
+        return AsyncQuerySet(self).filter(**lookups)
+
+    def exclude(self, **lookups):
+        return AsyncQuerySet(self).exclude(**lookups)
+
+    def order_by(self, *field_names):
+        return AsyncQuerySet(self).order_by(*field_names)
+
+    def prefetch_related(self, *relation_names):
+        return AsyncQuerySet(self).prefetch_related(*relation_names)
+
+    async def prefetch(self, model_objects, *relation_names):
+        for relation_name in relation_names:
+            relation = self._get_relation(relation_name)
+            values = get_related_values(model_objects, relation)
+            related_objects = list()
+            if values:
+                related_objects = await relation.model_class.aobjects.filter(
+                    **{f"{relation.related_field_name}__in": values}
+                ).all()
+            attach_related(model_objects, relation, related_objects)
+        return model_objects
+
+    async def paginate(self, order_by=None, page_size=50, after=None):
+        return await AsyncQuerySet(self).paginate(
+            page_size=page_size, after=after, order_by=order_by
+        )
+
+    async def select(
+        self,
+        *field_names,
+        group_by=None,
+        order_by=None,
+        order_direction="ASC",
+    ):
+        query = self._build_select_query(
+            field_names, group_by, order_by, order_direction
+        )
+        rows = await self._fetch_all(query, tables=self._get_tables())
+        return list(map(self.model_class._get_row_factory(field_names), rows))
+
+    async def iterate(
+        self,
+        *field_names,
+        group_by=None,
+        order_by=None,
+        order_direction="ASC",
+        chunk_size=2000,
+        batches=False,
+    ):
+        query = self._build_select_query(
+            field_names, group_by, order_by, order_direction
+        )
+        row_factory = self.model_class._get_row_factory(field_names)
+        async for _, result in self._stream_query(query, chunk_size=chunk_size):
+            model_objects = list(map(row_factory, result))
+            if batches:
+                yield model_objects
+            else:
+                for model_object in model_objects:
+                    yield model_object
+
+    stream = iterate
+
+    async def join(
+        self,
+        *tables,
+        on_conditions=None,
+        where_conditions=None,
+        select_fields=None,
+        chunk_size=2000,
+    ):
+        return [
+            model_object
+            async for model_object in self.iterate_join(
+                *tables,
+                on_conditions=on_conditions,
+                where_conditions=where_conditions,
+                select_fields=select_fields,
+                chunk_size=chunk_size,
+            )
+        ]
+
+    async def iterate_join(
+        self,
+        *tables,
+        on_conditions=None,
+        where_conditions=None,
+        select_fields=None,
+        chunk_size=2000,
+        batches=False,
+    ):
+        query = self._build_join_query(
+            tables, on_conditions, where_conditions, select_fields
+        )
+        async for column_names, result in self._stream_query(
+            query, chunk_size=chunk_size
+        ):
+            row_factory = self.model_class._get_row_factory(
+                select_fields or column_names
+            )
+            model_objects = list(map(row_factory, result))
+            if batches:
+                yield model_objects
+            else:
+                for model_object in model_objects:
+                    yield model_object
+
+    stream_join = iterate_join
+
+    async def bulk_insert(self, rows: list):
+        query, params = self._build_insert_query(rows)
+        await self._execute_query(query, params, tables=self._get_tables())
+
+    async def update(self, new_data: dict):
+        query, params = self._build_update_query(new_data)
+        await self._execute_query(query, params, tables=self._get_tables())
+
+    @asynccontextmanager
+    async def _transaction(self):
+        pool = await self._get_async_pool()
+        async with pool.connection() as connection, connection.transaction():
+            async with connection.cursor() as cursor:
+                yield cursor
+
+    async def _execute_in(self, cursor, query, params=None):
+        async with self._record_event(query, params) as event:
+            await cursor.execute(query, params)
+            rowcount = max(cursor.rowcount, 0)
+            if returns_count(query):
+                rowcount = (await cursor.fetchone())[0]
+            if event is not None:
+                event.rows = rowcount
+        return rowcount
+
+    def batch(self):
+        # async with Employee.aobjects.batch() as batch: ..., see `AsyncBatch`
+        return AsyncBatch(self)
+
+    async def _execute_batch(self, statements):
+        # libpq pipeline mode: BEGIN, the statements and COMMIT are all sent
+        # before any result is read, a single round trip. Each statement gets
+        # its own cursor to keep its result.
+        events = [
+            self._start_event(statement.query, statement.params)
+            for statement in statements
+        ]
+        results = list()
+        pool = await self._get_async_pool()
+        try:
+            async with pool.connection() as connection:
+                async with connection.pipeline():
+                    async with connection.transaction():
+                        cursors = list()
+                        for statement in statements:
+                            cursor = connection.cursor()
+                            await cursor.execute(statement.query, statement.params)
+                            cursors.append(cursor)
+                for statement, cursor, event in zip(statements, cursors, events):
+                    if statement.build is None:
+                        rows, rowcount = None, max(cursor.rowcount, 0)
+                        if returns_count(statement.query):
+                            rowcount = (await cursor.fetchone())[0]
+                    else:
+                        rows = await cursor.fetchall()
+                        rowcount = len(rows)
+                    results.append((statement, rows, rowcount))
+                    if event is not None:
+                        event.rows = rowcount
+                        await self._finish_event(event)
+        except Exception as e:
+            # The statements whose results weren't read share the error
+            for event in events[len(results) :]:
+                if event is not None:
+                    event.error = e
+                    await self._finish_event(event)
+            fail_statements(statements, e)
+            raise
+
+        tables = {
+            table
+            for statement in statements
+            if statement.build is None
+            for table in statement.tables
+        }
+        if tables:
+            self._after_write(tables)
+        for statement, rows, rowcount in results:
+            resolve_statement(statement, rows, rowcount)
+
+    async def _get_column_types(self, cursor):
+        await cursor.execute(
+            """
+            SELECT attname, format_type(atttypid, NULL)
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            """,
+            (self.model_class.table_name,),
+        )
+        return dict(await cursor.fetchall())
+
+    async def _copy_to_stage(self, cursor, field_names, values):
+        stage_name, create_query, copy_query = self._build_stage_queries(field_names)
+        await cursor.execute(create_query)
+        async with cursor.copy(copy_query) as copy:
+            for row_values in values:
+                await copy.write_row(row_values)
+        return stage_name
+
+    def _get_bulk_batches(self, values, field_names, batch_size):
+        # psycopg 3 binds the parameters server-side, keep each statement under
+        # the 65535 bind parameters of the protocol
+        batch_size = max(1, min(batch_size, 65535 // len(field_names)))
+        return super()._get_bulk_batches(values, field_names, batch_size)
+
+    async def _bulk_write(self, rows, key_fields, batch_size, method, upsert):
+        # See `BaseManager._bulk_write`
+        if method not in ("values", "copy"):
+            raise ValueError(f"Unsupported bulk method: {method}")
+        key_fields = (key_fields,) if isinstance(key_fields, str) else tuple(key_fields)
+        field_names, values = self._prepare_bulk_rows(rows, key_fields)
+        if not values:
+            return 0
+
+        rowcount = 0
+        async with self._transaction() as cursor:
+            if method == "copy":
+                stage_name = await self._copy_to_stage(cursor, field_names, values)
+                source = self._get_stage_source(field_names, stage_name, upsert)
+                query = self._build_bulk_query(field_names, key_fields, source, upsert)
+                rowcount = await self._execute_in(cursor, query)
+            else:
+                column_types = None
+                if not upsert or self._get_bulk_summaries(
+                    field_names, key_fields, upsert
+                ):
+                    column_types = await self._get_column_types(cursor)
+                for batch in self._get_bulk_batches(values, field_names, batch_size):
+                    source = self._build_bulk_source(
+                        field_names, len(batch), column_types, upsert
+                    )
+                    query = self._build_bulk_query(
+                        field_names, key_fields, source, upsert
+                    )
+                    params = list(chain.from_iterable(batch))
+                    rowcount += await self._execute_in(cursor, query, params)
+
+        self._after_write(self._get_tables())
+        return rowcount
+
+    async def bulk_update(self, rows, key="id", batch_size=1000, method="values"):
+        return await self._bulk_write(rows, key, batch_size, method, upsert=False)
+
+    async def bulk_upsert(
+        self, rows, conflict=("id",), batch_size=1000, method="values"
+    ):
+        return await self._bulk_write(rows, conflict, batch_size, method, upsert=True)
+
+    async def delete(self):
+        query = self._build_delete_query()
+        await self._execute_query(query, tables=self._get_tables())
+
+    async def aggregate(self, group_by=None, as_arrays=False, **aggregates):
+        return await AsyncQuerySet(self).aggregate(
+            group_by=group_by, as_arrays=as_arrays, **aggregates
+        )
+
+    async def aggregate_sum(self, field_name):
+        return (await self.aggregate(value=Sum(field_name)))["value"]
+
+    async def aggregate_avg(self, field_name):
+        return (await self.aggregate(value=Avg(field_name)))["value"]
+
+    async def aggregate_count(self):
+        return (await self.aggregate(value=Count()))["value"]
+
+    async def aggregate_min(self, field_name):
+        return (await self.aggregate(value=Min(field_name)))["value"]
+
+    async def aggregate_max(self, field_name):
+        return (await self.aggregate(value=Max(field_name)))["value"]
 
-        # Fetch the result
-        result = cursor.fetchone()
-        return result[0] if result else None
+    async def refresh_summaries(self, rebuild=False):
+        queries = self._get_refresh_queries(rebuild)
+        if queries:
+            async with self._transaction() as cursor:
+                for query in queries:
+                    await self._execute_in(cursor, query)
+            self._after_write(self._get_tables())
 
 
 # ----------------------- Model ----------------------- #
 class MetaModel(type):
     manager_class = BaseManager
+    async_manager_class = AsyncBaseManager
+    models = dict()  # table name (lowercase) -> model, to resolve relations
+
+    def __new__(mcs, name, bases, namespace):
+        # Columns declared on the model (and inherited from its parents)
+        columns = dict()
+        for base in reversed(bases):
+            columns.update(getattr(base, "__columns__", {}))
+        declared_columns = {
+            attr_name: attr
+            for attr_name, attr in namespace.items()
+            if isinstance(attr, Column)
+        }
+        columns.update(declared_columns)
+        for attr_name, column in declared_columns.items():
+            if column.foreign_key and column.relation is None:
+                if not attr_name.endswith("_id"):
+                    raise ValueError(
+                        f"{name}.{attr_name} needs a relation name, "
+                        "e.g. Column(..., foreign_key=..., relation=...)"
+                    )
+                column.relation = attr_name[: -len("_id")]
+
+        # Store the declared columns in `__slots__` instead of a per-instance
+        # `__dict__`. Models keep a `__dict__` slot (only allocated when used)
+        # for values that aren't declared columns, e.g. join or GROUP BY rows.
+        if "__slots__" not in namespace:
+            base_classes = [klass for base in bases for klass in base.__mro__]
+            inherited_slots = {
+                slot
+                for klass in base_classes
+                for slot in vars(klass).get("__slots__", ())
+            }
+            slots = [
+                attr_name
+                for attr_name in declared_columns
+                if attr_name not in inherited_slots
+            ]
+            if not any("__dict__" in vars(klass) for klass in base_classes):
+                slots.append("__dict__")
+            for attr_name in declared_columns:
+                del namespace[attr_name]
+            namespace["__slots__"] = tuple(slots)
+
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls.__columns__ = columns
+        cls._row_factories = dict()
+        # {name: state} of the summaries declared in `__summaries__`
+        cls._summaries = get_summary_states(
+            getattr(cls, "table_name", "").lower(),
+            getattr(cls, "__summaries__", ()),
+            {
+                attr_name.lower(): column.datatype.__name__
+                for attr_name, column in columns.items()
+            },
+        )
+        if getattr(cls, "table_name", ""):
+            mcs.models[cls.table_name.lower()] = cls
+        return cls
 
     def _get_manager(cls):
         return cls.manager_class(model_class=cls)
@@ -289,6 +1667,51 @@ class MetaModel(type):
     def objects(cls):
         return cls._get_manager()
 
+    @property
+    def aobjects(cls):
+        return cls.async_manager_class(model_class=cls)
+
+    def _get_row_factory(cls, field_names):
+        # Row factories are compiled once per model and list of fields
+        field_names = tuple(field_names)
+        row_factory = cls._row_factories.get(field_names)
+        if row_factory is None:
+            row_factory = cls._compile_row_factory(field_names)
+            cls._row_factories[field_names] = row_factory
+        return row_factory
+
+    def _compile_row_factory(cls, field_names):
+        # Build a function turning a DB row tuple straight into an instance,
+        # skipping `__init__` and the intermediate `dict(zip(keys, values))`:
+        #   def row_factory(row):
+        #       obj = new(cls)
+        #       obj.id, obj.emp_name, = row
+        #       return obj
+        is_compilable = len(set(field_names)) == len(field_names) and all(
+            field_name.isidentifier() and not keyword.iskeyword(field_name)
+            for field_name in field_names
+        )
+        if not is_compilable:
+            # Fields such as `COUNT(*)` or `employees.id` can only be setattr
+            def row_factory(row):
+                obj = cls.__new__(cls)
+                for field_name, value in zip(field_names, row):
+                    setattr(obj, field_name, value)
+                return obj
+
+            return row_factory
+
+        targets_format = "".join(f"obj.{field_name}, " for field_name in field_names)
+        source = (
+            "def row_factory(row):\n"
+            "    obj = new(cls)\n"
+            f"    {targets_format}= row\n"
+            "    return obj\n"
+        )
+        namespace = {"new": cls.__new__, "cls": cls}
+        exec(source, namespace)
+        return namespace["row_factory"]
+
 
 class BaseModel(metaclass=MetaModel):
     table_name = ""
@@ -298,9 +1721,13 @@ class BaseModel(metaclass=MetaModel):
             setattr(self, field_name, value)
 
     def __repr__(self):
-        attrs_format = ", ".join(
-            [f"{field}={value}" for field, value in self.__dict__.items()]
-        )
+        attrs = {
+            field: getattr(self, field)
+            for field in self.__columns__
+            if hasattr(self, field)
+        }
+        attrs.update(self.__dict__)
+        attrs_format = ", ".join([f"{field}={value}" for field, value in attrs.items()])
         return f"<{self.__class__.__name__}: ({attrs_format})>\n"
 
 
@@ -322,7 +1749,9 @@ class Migration:
 #     'password': ''
 # }
 
-BaseManager.set_connection(database_settings=db_settings)
+# The connection pool is opened on the first query, call
+# `BaseManager.set_connection(database_settings=DB_SETTINGS)` to use other
+# settings than the environment ones.
 
 
 # ----------------------- Usage ----------------------- #
@@ -330,10 +1759,25 @@ class Employee(BaseModel):
     manager_class = BaseManager
     table_name = "employees"
 
+    id = Column(Integer(), primary_key=True)
+    emp_name = Column(String())
+    manager = Column(
+        String(),
+        foreign_key="departments.manager",
+        relation="department",
+        related_name="employees",
+    )
+    date = Column(String())
+    salary = Column(String())
+
 
-# class Department(BaseModel):
-#     manager_class = BaseManager
-#     table_name = "departments"
+class Department(BaseModel):
+    manager_class = BaseManager
+    table_name = "departments"
+
+    id = Column(Integer(), primary_key=True)
+    dept_name = Column(String())
+    manager = Column(String())
 
 
 # SQL: SELECT first_name, last_name, salary, grade FROM employees;
@@ -341,6 +1785,9 @@ class Employee(BaseModel):
 
 # print(f"First select result:\n {employees} \n")
 
+# Columnar read, one NumPy array per column:
+# columns = Employee.objects.select_columns('id', 'salary')  # columns: Dict[str, numpy.ndarray]
+
 
 # SQL: INSERT INTO employees (first_name, last_name, salary)
 #  	VALUES ('Yan', 'KIKI', 10000), ('Yoweri', 'ALOH', 15000);
@@ -364,6 +1811,106 @@ class Employee(BaseModel):
 # print(f"Select result after update:\n {employees} \n")
 
 
+# SQL: SELECT id, emp_name, manager, date, salary FROM employees
+#   WHERE manager = 'KIKI' AND id > 10 ORDER BY id DESC LIMIT 20;
+# employees = Employee.objects.filter(manager='KIKI', id__gt=10).order_by('-id').limit(20).all()
+
+# SQL: UPDATE employees SET salary = 20000 WHERE id = ANY(ARRAY[1, 2]);
+# Employee.objects.filter(id__in=[1, 2]).update(salary=20000)
+
+
+# SQL: SELECT manager, COUNT(*) AS count, SUM(id) AS total FROM employees
+#   GROUP BY manager ORDER BY manager;
+# stats = Employee.objects.aggregate(count=Count(), total=Sum('id'), group_by=['manager'])
+
+
+# Keyset pagination, each page is read with `WHERE (manager, id) > (...)`:
+# page = Employee.objects.paginate(order_by=['manager'], page_size=100)
+# next_page = Employee.objects.paginate(order_by=['manager'], page_size=100, after=page.next_token)
+
+
+# Same queries from asyncio code, without blocking the event loop:
+# employees = await Employee.aobjects.filter(id__gt=10).all()
+# async for employee in Employee.aobjects.iterate('id', 'emp_name'):
+#     print(employee)
+
+
+# Related rows for the whole result in one query per relation:
+# SQL: SELECT id, dept_name, manager FROM departments WHERE manager = ANY(%s)
+# employees = Employee.objects.prefetch_related('department').filter(id__lt=100).all()
+# print(employees[0].department.dept_name)
+# departments = Department.objects.prefetch_related('employees').all()  # department.employees: List[Employee]
+
+
+# Different values per row, one statement per 1000 rows:
+# SQL: UPDATE employees AS t SET salary = v.salary FROM (VALUES (%s::integer, %s::character varying), ...) AS v (id, salary)
+#   WHERE t.id = v.id;
+# Employee.objects.bulk_update([{'id': 1, 'salary': '1000'}, {'id': 2, 'salary': '1500'}], key='id')
+# SQL: INSERT INTO employees (id, emp_name) VALUES (%s, %s), ... ON CONFLICT (id) DO UPDATE SET emp_name = EXCLUDED.emp_name;
+# Employee.objects.bulk_upsert(rows, conflict=['id'], method='copy')  # through COPY into a temporary table
+
+
+# Reads spread over read replicas, e.g. DB_REPLICAS="replica1:5432,replica2:5432", also the
+# ones of Employee.aobjects. A thread (or asyncio task) that wrote keeps reading the primary
+# for DB_READ_YOUR_WRITES_SECONDS, or explicitly:
+# with Employee.objects.use_primary():
+#     employee = Employee.objects.filter(id=1).first()
+
+
+# Time every query, log the ones slower than 200ms with their EXPLAIN plan:
+# instrumentation = BaseManager.enable_instrumentation(slow_query_ms=200, explain_slow_queries=True)
+# print(instrumentation.summary())  # per query shape: count, rows, p50, p95, p99, max
+
+
+# Several statements in one transaction and as few round trips as possible (a single one
+# with `Employee.aobjects.batch()`, in pipeline mode), results are futures:
+# with Employee.objects.batch() as batch:
+#     batch.update(Employee.objects.filter(id=1), salary='2000')
+#     count = batch.count(Employee.objects.filter(manager='Ana'))
+#     top = batch.aggregate(Employee.objects.all(), top=Max('salary'))
+# print(count.result(), top.result()['top'])
+
+
+# Full table reads on several cores, one id range per task, each on its own connection:
+# for employee in Employee.objects.parallel_scan(workers=8, key='id', ordered=True):
+#     print(employee)
+# rows = sum(Employee.objects.filter(salary__gt=1000).parallel_scan(workers=8, callback=backfill))
+
+
+# Dump a table to a file with COPY, without building model objects:
+# SQL: COPY (SELECT id, salary FROM employees WHERE salary > '1000') TO STDOUT WITH (FORMAT csv, HEADER TRUE)
+# Employee.objects.export('employees.csv', columns=['id', 'salary'], where={'salary__gt': '1000'})
+# Employee.objects.filter(manager='Ana').export('employees.parquet', format='parquet')  # or 'arrow', needs pyarrow
+# From the command line: python app.py --export Employee --format parquet --output employees.parquet
+
+
+# Indexes, declared on the model (see Modules/Index.py) and built with CREATE INDEX CONCURRENTLY
+# by the migrations:
+# class Employee(BaseModel):
+#     __indexes__ = [Index('manager', 'date')]  # composite index
+#     emp_name = Column(String(), index=True)  # single column index, unique=True for a unique one
+
+
+# Partitioned tables, declared on the model (see Modules/Partition.py) and created by the migrations:
+# class Event(BaseModel):
+#     __partition_by__ = PartitionBy('range', 'day', interval='month', premake=3, retention=12)
+# Upcoming partitions created, expired ones detached, e.g. daily: python app.py --partitions [--drop-expired]
+# SQL: SELECT ... FROM events WHERE day >= '2026-10-01' AND day < '2026-11-01' (only events_p202610 is read)
+# events = Event.objects.in_partition(date(2026, 10, 18)).filter(kind='login').all()
+
+
+# Aggregates per group kept up to date by the writes, declared on the model (see Modules/Summary.py)
+# and created by the migrations:
+# class Employee(BaseModel):
+#     __summaries__ = [Summary('employees_by_manager', group_by=['manager'], fields=['id'])]
+# SQL: SELECT COALESCE(SUM(row_count), 0)::BIGINT AS value FROM employees_by_manager WHERE row_count > 0
+# count = Employee.objects.aggregate_count()  # also Sum/Avg/Count('id') per manager, or filtered on it
+# Employee.objects.filter(id=1).update(manager='Ana')  # moves the row to Ana's group in the same statement
+# Materialized view summaries (refresh='concurrently'), from cron: python app.py --summaries
+# Only read on request, their rows being as of the last refresh:
+# counts = Employee.objects.allow_stale().aggregate(group_by=['date'], count=Count())
+
+
 # SQL: DELETE FROM employees;
 # Employee.objects.delete()
 
@@ -375,3 +1922,14 @@ class Employee(BaseModel):
 #                          select_fields=['employees.first_name', 'employees.last_name', 'departments.dept_name', 'managers.name'], chunk_size=500)
 # for row in join_results:
 #     print(row)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.cli import migrations
+
+    # The CLI imports `app` (its models): the module running, not a copy
+    sys.modules.setdefault("app", sys.modules[__name__])
+
+    migrations()
@@ -0,0 +1,132 @@
+import datetime
+import json
+import os
+import platform
+import sys
+
+import click
+
+from benchmarks.cases import create_fixtures, get_cases
+from benchmarks.harness import compare, run_benchmarks
+from benchmarks.postgres import TemporaryPostgres
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+DB_ENVIRONMENT = {
+    "user": "DB_USERNAME",
+    "password": "DB_PASSWORD",
+    "host": "DB_HOST",
+    "port": "DB_PORT",
+    "database": "DB_NAME",
+}
+
+
+def parse_sizes(context, parameter, value):
+    try:
+        return [int(size) for size in value.split(",") if size]
+    except ValueError:
+        raise click.BadParameter("expected comma separated integers")
+
+
+# Run from the ORM folder: python -m benchmarks --output report.json
+@click.command()
+@click.option("--scale", default=100_000, help="Rows of the employees table.")
+@click.option(
+    "--insert-sizes",
+    default="1000,100000,1000000",
+    callback=parse_sizes,
+    help="Rows of each bulk_insert case.",
+)
+@click.option(
+    "--chunk-sizes",
+    default="500,2000,10000",
+    callback=parse_sizes,
+    help="chunk_size of each select case.",
+)
+@click.option("--migration-files", default=200, help="Files applied at once.")
+@click.option("--runs", default=5, help="Timed runs per case.")
+@click.option("--warmup", default=1, help="Untimed runs per case.")
+@click.option(
+    "--only", multiple=True, help="Run the cases whose name starts with this."
+)
+@click.option("--output", type=click.Path(), help="Write the JSON report here.")
+@click.option("--baseline", type=click.Path(), default=DEFAULT_BASELINE)
+@click.option("--save-baseline", is_flag=True, help="Store the report as baseline.")
+@click.option("--tolerance", default=0.1, help="Allowed slowdown, 0.1 is 10%.")
+@click.option("--pg-bin", type=click.Path(), help="Folder of initdb and pg_ctl.")
+def benchmark(
+    scale,
+    insert_sizes,
+    chunk_sizes,
+    migration_files,
+    runs,
+    warmup,
+    only,
+    output,
+    baseline,
+    save_baseline,
+    tolerance,
+    pg_bin,
+):
+    cases = get_cases(insert_sizes, chunk_sizes, migration_files)
+    if only:
+        cases = [case for case in cases if case[0].startswith(only)]
+
+    with TemporaryPostgres(bin_dir=pg_bin) as postgres:
+        # The processes running the cases read their DB settings from here
+        for key, variable in DB_ENVIRONMENT.items():
+            os.environ[variable] = postgres.settings[key]
+        click.echo(f"Creating fixtures ({scale} employees)...", err=True)
+        server_version = create_fixtures(postgres.settings, scale)
+        results = run_benchmarks(
+            cases,
+            runs=runs,
+            warmup=warmup,
+            workspace_root=postgres.directory,
+            echo=lambda message: click.echo(message, err=True),
+        )
+
+    report = {
+        "metadata": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "postgres": server_version,
+            "scale": scale,
+            "runs": runs,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+    regressions = list()
+    if save_baseline:
+        with open(baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    elif os.path.exists(baseline):
+        with open(baseline) as f:
+            report["comparison"] = compare(results, json.load(f), tolerance)
+        regressions = [
+            name
+            for name, comparison in report["comparison"].items()
+            if comparison["regressed"]
+        ]
+
+    report_json = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(report_json)
+    else:
+        click.echo(report_json)
+
+    errors = [name for name, result in results.items() if "error" in result]
+    for name in errors:
+        click.echo(f"{name} failed:\n{results[name]['error']}", err=True)
+    if regressions:
+        click.echo(f"Regressions: {', '.join(regressions)}", err=True)
+    if errors or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,206 @@
+import os
+
+import psycopg2
+
+# Cases are built inside the process measuring them: `app` is only imported
+# there, once the environment points to the throwaway server.
+
+FIXTURES_SQL = """
+    CREATE TABLE employees
+        (id INT PRIMARY KEY, emp_name VARCHAR(255), manager VARCHAR(255),
+        date VARCHAR(255), salary VARCHAR(255));
+    INSERT INTO employees
+        SELECT n, 'employee ' || n, 'manager ' || (n %% 100), '2023-01-01', (n * 10)::text
+        FROM generate_series(1, %(scale)s) AS n;
+
+    CREATE TABLE departments
+        (id INT PRIMARY KEY, dept_name VARCHAR(255), manager VARCHAR(255));
+    INSERT INTO departments
+        SELECT n, 'department ' || n, 'manager ' || n FROM generate_series(0, 99) AS n;
+
+    CREATE TABLE benchmark_rows (id INT PRIMARY KEY, name VARCHAR(255), value INT);
+
+    CREATE TABLE migration_history
+        (name VARCHAR(255), is_applied INT, date_created TIMESTAMP, date_updated TIMESTAMP);
+
+    ANALYZE;
+"""
+
+
+def create_fixtures(database_settings, scale):
+    with psycopg2.connect(**database_settings) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(FIXTURES_SQL, {"scale": scale})
+            cursor.execute("SELECT version()")
+            (version,) = cursor.fetchone()
+    connection.close()
+    return version
+
+
+def execute(*queries):
+    from src.utils.db import db_settings
+
+    with psycopg2.connect(**db_settings) as connection:
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute(query)
+    connection.close()
+
+
+def get_benchmark_model():
+    from app import BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Integer, String
+
+    class BenchmarkRow(BaseModel):
+        table_name = "benchmark_rows"
+
+        id = Column(Integer(), primary_key=True)
+        name = Column(String())
+        value = Column(Integer())
+
+    return BenchmarkRow
+
+
+# Each case returns `(setup, run)`: `setup` (or None) runs untimed before
+# every run and `run` returns the number of rows it processed.
+
+
+def select_case(chunk_size):
+    from app import Employee
+
+    field_names = list(Employee.__columns__)
+
+    def run():
+        return len(Employee.objects.select(*field_names, chunk_size=chunk_size))
+
+    return None, run
+
+
+def bulk_insert_case(rows):
+    BenchmarkRow = get_benchmark_model()
+    data = [
+        {"id": index, "name": f"row {index}", "value": index} for index in range(rows)
+    ]
+
+    def setup():
+        execute("TRUNCATE benchmark_rows")
+
+    def run():
+        BenchmarkRow.objects.bulk_insert(rows=data)
+        return len(data)
+
+    return setup, run
+
+
+def join_case():
+    from app import Employee
+
+    def run():
+        results = Employee.objects.join(
+            "employees",
+            "departments",
+            on_conditions=["employees.manager = departments.manager"],
+            select_fields=[
+                "employees.id",
+                "employees.emp_name",
+                "departments.dept_name",
+            ],
+        )
+        return len(results)
+
+    return None, run
+
+
+def aggregate_case(function):
+    from app import Employee
+
+    aggregate = getattr(Employee.objects, f"aggregate_{function}")
+    arguments = () if function == "count" else ("id",)
+
+    def run():
+        aggregate(*arguments)
+        return 1
+
+    return None, run
+
+
+def create_migration_case():
+    from src.utils.create_migration import create_migration_file
+
+    runs = iter(range(1_000_000))
+
+    def setup():
+        # The stored model state is the last migration file's: without them
+        # every run diffs all the models, not the no-op since the previous run
+        for name in os.listdir("Migrations"):
+            os.remove(os.path.join("Migrations", name))
+        execute("DELETE FROM migration_history")
+
+    def run():
+        return len(create_migration_file(f"benchmark_{next(runs)}"))
+
+    return setup, run
+
+
+def apply_migration_case(files):
+    from src.utils.apply_migrations import apply_migration
+    from src.utils.create_migration import write_migration_file
+
+    for index in range(files):
+        write_migration_file(
+            f"CREATE TABLE IF NOT EXISTS benchmark_migration_{index} (id INT);",
+            f"benchmark_{index:05d}",
+        )
+    names = sorted(os.listdir("Migrations"))
+    execute(
+        "INSERT INTO migration_history (name, is_applied) VALUES "
+        + ", ".join(f"('{name}', 0)" for name in names)
+    )
+
+    def setup():
+        execute(
+            *(f"DROP TABLE IF EXISTS benchmark_migration_{i}" for i in range(files)),
+            "UPDATE migration_history SET is_applied = 0",
+        )
+
+    def run():
+        return len(apply_migration())
+
+    return setup, run
+
+
+CASES = {
+    "select": select_case,
+    "bulk_insert": bulk_insert_case,
+    "join": join_case,
+    "aggregate": aggregate_case,
+    "create_migration": create_migration_case,
+    "apply_migration": apply_migration_case,
+}
+
+
+def get_cases(insert_sizes, chunk_sizes, migration_files):
+    # (name, case, options) of every benchmark, names are the report keys
+    cases = [
+        (f"select[chunk_size={chunk_size}]", "select", {"chunk_size": chunk_size})
+        for chunk_size in chunk_sizes
+    ]
+    cases += [
+        (f"bulk_insert[rows={rows}]", "bulk_insert", {"rows": rows})
+        for rows in insert_sizes
+    ]
+    cases.append(("join", "join", {}))
+    cases += [
+        (f"aggregate_{function}", "aggregate", {"function": function})
+        for function in ("sum", "avg", "count", "min", "max")
+    ]
+    cases.append(("create_migration_file", "create_migration", {}))
+    cases.append(
+        (
+            f"apply_migration[files={migration_files}]",
+            "apply_migration",
+            {"files": migration_files},
+        )
+    )
+    return cases
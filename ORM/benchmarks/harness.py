@@ -0,0 +1,123 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import traceback
+
+from benchmarks.cases import CASES
+from src.utils.instrumentation import get_percentile
+
+ORM_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(run, setup=None, runs=5, warmup=1):
+    latencies = list()
+    rows = 0
+    for index in range(warmup + runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        rows = run()
+        seconds = time.perf_counter() - start
+        if index >= warmup:
+            latencies.append(seconds)
+    return latencies, rows
+
+
+def summarize(latencies, rows, peak_rss_kb):
+    sorted_latencies = sorted(latencies)
+    median = get_percentile(sorted_latencies, 50)
+    return {
+        "runs": len(latencies),
+        "rows": rows,
+        "latency_ms": {
+            "min": sorted_latencies[0] * 1000,
+            "p50": median * 1000,
+            "p95": get_percentile(sorted_latencies, 95) * 1000,
+            "p99": get_percentile(sorted_latencies, 99) * 1000,
+            "max": sorted_latencies[-1] * 1000,
+            "mean": sum(latencies) / len(latencies) * 1000,
+        },
+        "rows_per_second": rows / median if median else None,
+        "operations_per_second": 1 / median if median else None,
+        "peak_rss_kb": peak_rss_kb,
+    }
+
+
+def make_workspace(root):
+    # `create_migration_file` and `apply_migration` work on the `Models` and
+    # `Migrations` folders of the current directory, give each case its own
+    workspace = tempfile.mkdtemp(dir=root)
+    os.mkdir(os.path.join(workspace, "Migrations"))
+    os.symlink(os.path.join(ORM_DIRECTORY, "Models"), os.path.join(workspace, "Models"))
+    return workspace
+
+
+def run_case(connection, case, options, runs, warmup, workspace):
+    # Entry point of the process measuring one case
+    try:
+        sys.path.insert(0, ORM_DIRECTORY)
+        os.chdir(workspace)
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup, run = CASES[case](**options)
+            latencies, rows = measure(run, setup, runs, warmup)
+        # Peak resident set of this process, setup and imports included
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        connection.send(summarize(latencies, rows, peak_rss_kb))
+    except Exception:
+        connection.send({"error": traceback.format_exc()})
+    finally:
+        connection.close()
+
+
+def run_benchmarks(cases, runs=5, warmup=1, workspace_root=None, echo=print):
+    # Every case runs in a fresh process so its peak RSS and the manager
+    # state (pool, caches) don't leak into the next one.
+    context = multiprocessing.get_context("spawn")
+    results = dict()
+    for name, case, options in cases:
+        echo(f"Running {name}...")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=run_case,
+            args=(
+                sender,
+                case,
+                options,
+                runs,
+                warmup,
+                make_workspace(workspace_root),
+            ),
+        )
+        process.start()
+        sender.close()
+        try:
+            results[name] = receiver.recv()
+        except EOFError:
+            results[name] = {"error": f"Process exited with code {process.exitcode}"}
+        process.join()
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    # Ratios against the baseline report, above 1 means slower / bigger
+    comparison = dict()
+    for name, result in results.items():
+        reference = baseline.get("results", dict()).get(name)
+        if reference is None or "error" in result or "error" in reference:
+            continue
+
+        p50_ratio = result["latency_ms"]["p50"] / reference["latency_ms"]["p50"]
+        p95_ratio = result["latency_ms"]["p95"] / reference["latency_ms"]["p95"]
+        peak_rss_ratio = result["peak_rss_kb"] / reference["peak_rss_kb"]
+        comparison[name] = {
+            "p50_ratio": round(p50_ratio, 3),
+            "p95_ratio": round(p95_ratio, 3),
+            "peak_rss_ratio": round(peak_rss_ratio, 3),
+            "regressed": p50_ratio > 1 + tolerance or peak_rss_ratio > 1 + tolerance,
+        }
+    return comparison
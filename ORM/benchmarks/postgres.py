@@ -0,0 +1,138 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg2
+
+BENCHMARK_DATABASE = "pydbmap_benchmark"
+
+
+def find_postgres_bin_dir(bin_dir=None):
+    # `--pg-bin` / PG_BIN first, then `initdb` on the PATH, then `pg_config`
+    bin_dir = bin_dir or os.getenv("PG_BIN")
+    if bin_dir:
+        return bin_dir
+
+    initdb = shutil.which("initdb")
+    if initdb:
+        return os.path.dirname(initdb)
+
+    pg_config = shutil.which("pg_config")
+    if pg_config:
+        return subprocess.check_output([pg_config, "--bindir"], text=True).strip()
+
+    raise RuntimeError(
+        "Couldn't find the PostgreSQL binaries, set PG_BIN or pass --pg-bin."
+    )
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TemporaryPostgres:
+    """Throwaway PostgreSQL cluster living in a temporary directory.
+
+    The cluster is created with `initdb`, listens on a free local port and is
+    removed with its data once stopped, so every benchmark run starts from
+    the same empty server.
+    """
+
+    def __init__(self, bin_dir=None, port=None):
+        self.bin_dir = find_postgres_bin_dir(bin_dir)
+        self.port = port or get_free_port()
+        self.directory = None
+
+    @property
+    def data_directory(self):
+        return os.path.join(self.directory, "data")
+
+    @property
+    def settings(self):
+        # Same keys as `src.utils.db.db_settings`
+        return {
+            "user": "postgres",
+            "password": "",
+            "host": "127.0.0.1",
+            "port": str(self.port),
+            "database": BENCHMARK_DATABASE,
+        }
+
+    def _run(self, program, *arguments, check=True):
+        subprocess.run(
+            [os.path.join(self.bin_dir, program), *arguments],
+            check=check,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix="pydbmap_benchmark_")
+        try:
+            self._initialize()
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def _initialize(self):
+        self._run(
+            "initdb",
+            "-D",
+            self.data_directory,
+            "-U",
+            "postgres",
+            "-A",
+            "trust",
+            "-E",
+            "UTF8",
+            "--locale=C",
+        )
+        self._run(
+            "pg_ctl",
+            "-D",
+            self.data_directory,
+            "-l",
+            os.path.join(self.directory, "postgres.log"),
+            "-o",
+            f"-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1",
+            "-w",
+            "start",
+        )
+
+        connection = psycopg2.connect(**{**self.settings, "database": "postgres"})
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE {BENCHMARK_DATABASE}")
+        finally:
+            connection.close()
+
+    def stop(self):
+        if self.directory is None:
+            return
+        try:
+            # Not checked: the server may have failed to start
+            self._run(
+                "pg_ctl",
+                "-D",
+                self.data_directory,
+                "-m",
+                "fast",
+                "-w",
+                "stop",
+                check=False,
+            )
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
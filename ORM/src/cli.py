@@ -0,0 +1,202 @@
+import click
+
+
+# Click command for migrations
+@click.command()
+@click.option("--migrations", is_flag=True, type=str)
+@click.option("--add", type=str, is_flag=True, required=False)
+@click.option("--apply", type=str, is_flag=True, required=False)
+@click.option(
+    "--no-banner",
+    is_flag=True,
+    envvar="PYDBMAP_NO_BANNER",
+    help="Skip the PyDBmap banner.",
+)
+@click.option(
+    "--partitions",
+    is_flag=True,
+    help="Create the upcoming range partitions, detach the expired ones.",
+)
+@click.option(
+    "--drop-expired",
+    is_flag=True,
+    help="With --partitions, drop the expired partitions instead of detaching them.",
+)
+@click.option(
+    "--summaries",
+    is_flag=True,
+    help="Refresh the materialized summaries, delete the emptied groups of the others.",
+)
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="With --summaries, compute the incremental summaries again from their tables.",
+)
+@click.option("--export", "export_model", help="Model (or table) to export.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Export file.")
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["csv", "parquet", "arrow"]),
+    default="csv",
+    show_default=True,
+)
+@click.option("--columns", help="Comma separated columns to export.")
+@click.option(
+    "--where",
+    multiple=True,
+    help="Export filter as field__lookup=value, e.g. salary__gt=1000.",
+)
+@click.argument("description", type=str, required=False)
+def migrations(
+    migrations,
+    add,
+    apply,
+    no_banner,
+    partitions,
+    drop_expired,
+    summaries,
+    rebuild,
+    export_model,
+    output,
+    export_format,
+    columns,
+    where,
+    description,
+):
+    click.echo(
+        "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
+    )
+    if not no_banner:
+        import pyfiglet
+
+        font = pyfiglet.Figlet(font="slant")
+        pydbmap_text = font.renderText("PyDBmap")
+        click.echo(pydbmap_text)
+
+        click.echo(
+            "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
+        )
+
+    # The migration modules (and psycopg2) are only loaded by the commands
+    # that use them
+    if migrations:
+        if add:
+            if not description:
+                click.echo("Please provide a description for the migration.")
+            else:
+                from src.utils.create_migration import create_migration_file
+
+                if create_migration_file(description):
+                    click.echo(f"Migration '{description}' added.")
+                else:
+                    click.echo("No changes in the models, no migration added.")
+        elif apply:
+            from src.utils.apply_migrations import apply_migration
+
+            try:
+                apply_migration()
+                click.echo("Migrations done!")
+            except:
+                click.echo("Migrations couldn't apply successfully.")
+        else:
+            click.echo("Invalid command")
+    elif partitions:
+        from src.utils.partition_maintenance import maintain_all_partitions
+
+        maintain_all_partitions(drop=drop_expired)
+        click.echo("Partitions maintained!")
+    elif summaries:
+        from src.utils.summary_maintenance import refresh_all_summaries
+
+        refresh_all_summaries(rebuild=rebuild)
+        click.echo("Summaries refreshed!")
+    elif export_model:
+        export(export_model, output, export_format, columns, where)
+    else:
+        click.echo("Invalid command")
+
+    click.echo(
+        "- - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -"
+    )
+
+
+def get_value_parser(column):
+    # Python type of the values of a column: a list of strings would be sent
+    # as a text array, which Postgres doesn't compare to other types
+    import datetime
+    from decimal import Decimal
+
+    from Modules.DataType import Date, Integer, Numeric, Time, Timestamp
+
+    parsers = {
+        Integer: int,
+        Numeric: Decimal,
+        Date: datetime.date.fromisoformat,
+        Timestamp: datetime.datetime.fromisoformat,
+        Time: datetime.time.fromisoformat,
+    }
+    return parsers.get(type(column.datatype), str)
+
+
+def parse_filter(condition, columns):
+    # "field__lookup=value" to a `filter()` keyword argument on the model's
+    # `columns`, the values of `in` are comma separated and those of
+    # isnull/notnull true or false
+    key, separator, value = condition.partition("=")
+    if not separator:
+        raise ValueError("expected field__lookup=value")
+    field_name, _, lookup = key.partition("__")
+    column = columns.get(field_name)
+    if column is None:
+        raise ValueError(f"no column {field_name!r}")
+    if lookup == "in":
+        parse = get_value_parser(column)
+        try:
+            return key, [parse(item) for item in value.split(",")]
+        except ValueError:
+            raise ValueError(f"invalid {field_name} values {value!r}")
+    if lookup in ("isnull", "notnull"):
+        if value.lower() not in ("true", "false"):
+            raise ValueError(f"{lookup} takes true or false")
+        return key, value.lower() == "true"
+    return key, value
+
+
+def export(model_name, output, export_format, columns, where):
+    # python app.py --export Employee --format parquet --where salary__gt=1000
+    # (app.py registers itself as `app` before running the CLI, see there)
+    from app import MetaModel
+
+    model_class = MetaModel.models.get(model_name.lower()) or next(
+        (
+            model
+            for model in MetaModel.models.values()
+            if model.__name__.lower() == model_name.lower()
+        ),
+        None,
+    )
+    if model_class is None:
+        click.echo(f"Unknown model: {model_name}")
+        return
+
+    lookups = dict()
+    for condition in where:
+        try:
+            key, value = parse_filter(condition, model_class.__columns__)
+        except ValueError as e:
+            click.echo(f"Invalid filter: {condition}, {e}")
+            return
+        lookups[key] = value
+    output = output or f"{model_class.table_name}.{export_format}"
+    result = model_class.objects.export(
+        output,
+        format=export_format,
+        columns=columns.split(",") if columns else None,
+        where=lookups,
+    )
+    click.echo(f"Exported {result['rows']} rows to {output} ({result['seconds']:.3f}s)")
+
+
+if __name__ == "__main__":
+    migrations()
@@ -1,9 +1,12 @@
 import os
 from functools import lru_cache
 
-from dotenv import load_dotenv
+# Containers getting their settings from the environment can skip the `.env`
+# lookup with PYDBMAP_LOAD_DOTENV=0
+if os.getenv("PYDBMAP_LOAD_DOTENV", "1") == "1":
+    from dotenv import load_dotenv
 
-load_dotenv()
+    load_dotenv()
 
 
 class Config(object):
@@ -16,6 +19,32 @@ class Config(object):
     DB_ENGINE = os.getenv("DB_ENGINE", "postgresql+psycopg2")
     LOG_LEVEL = int(os.getenv("LOG_LEVEL", 20))
 
+    # Connection pool
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 32))
+    DB_POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", 1000))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(
+        os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30)
+    )
+
+    # Read replicas, "host:port" comma separated, with the credentials and
+    # database of the primary
+    DB_REPLICAS = os.getenv("DB_REPLICAS", "")
+    DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 2))
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+
+    # Query instrumentation
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 500))
+    EXPLAIN_SLOW_QUERIES = os.getenv("EXPLAIN_SLOW_QUERIES", "0") == "1"
+
+    # Online index builds (CREATE INDEX CONCURRENTLY) in migrations: how long
+    # a build waits for a lock before it's retried, and how often its
+    # progress is reported
+    MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", 5000))
+    MIGRATION_LOCK_RETRIES = int(os.getenv("MIGRATION_LOCK_RETRIES", 3))
+    MIGRATION_PROGRESS_SECONDS = float(os.getenv("MIGRATION_PROGRESS_SECONDS", 10))
+
 
 @lru_cache
 def get_config():
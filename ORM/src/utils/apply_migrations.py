@@ -1,10 +1,18 @@
 import os
 import importlib.util
+import inspect
+import time
+import threading
 import psycopg2
+import psycopg2.errors
 import datetime
-from src.utils.db import db_settings
+from contextlib import contextmanager
+from src.utils.db import db_settings, index_build_settings
 import click
 
+# Key of the advisory lock held while migrations are applied
+MIGRATIONS_LOCK_ID = 20231020153940
+
 
 def get_migration_files():
     """Retrieve sorted list of migration files."""
@@ -28,36 +36,179 @@ def load_migration_module(migration_file):
     return migration_module
 
 
-def is_migration_applied(cursor, migration_file):
-    """Check if a migration has been applied."""
-    select_query = (
-        f"SELECT is_applied FROM migration_history WHERE name = '{migration_file}'"
+def get_pending_migrations(cursor):
+    """Retrieve the names of the migrations recorded but not applied yet."""
+    cursor.execute("SELECT name FROM migration_history WHERE is_applied = '0'")
+    return {name for (name,) in cursor.fetchall()}
+
+
+def acquire_lock(cursor, interval=0.5):
+    """Wait for the migrations lock, polling outside of any statement."""
+    # A runner blocked in pg_advisory_lock keeps its statement's snapshot,
+    # which the CREATE INDEX CONCURRENTLY of the lock holder then waits for
+    cursor.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+    while not cursor.fetchone()[0]:
+        time.sleep(interval)
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+
+
+def run_migration(migration_instance, cursor):
+    """Run the migration on the runner's cursor, inside its transaction."""
+    if inspect.signature(migration_instance.apply).parameters:
+        migration_instance.apply(cursor)
+    else:
+        # Migrations generated before `apply` took a cursor open their own
+        # connection, so they run outside the runner's transaction.
+        migration_instance.apply()
+
+
+def drop_invalid_index(cursor, index_name):
+    """Drop what a failed CREATE INDEX CONCURRENTLY left behind."""
+    # IF NOT EXISTS would otherwise skip the invalid index on the next run
+    cursor.execute(
+        "SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid",
+        (index_name,),
     )
-    cursor.execute(select_query)
-    res = cursor.fetchone()
-    return False if res and res[0] == 0 else True
+    if cursor.fetchone():
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+@contextmanager
+def report_progress(backend_pid, index_name, interval):
+    """Echo the progress of the index built by `backend_pid` every `interval`."""
+    done = threading.Event()
+
+    def poll():
+        # The connection is only opened for builds outlasting the interval
+        if done.wait(interval):
+            return
+        with psycopg2.connect(**db_settings) as connection:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                while True:
+                    cursor.execute(
+                        "SELECT phase, blocks_done, blocks_total, tuples_done, "
+                        "tuples_total FROM pg_stat_progress_create_index "
+                        "WHERE pid = %s",
+                        (backend_pid,),
+                    )
+                    row = cursor.fetchone()
+                    if row:
+                        phase, blocks_done, blocks_total, tuples_done, tuples_total = (
+                            row
+                        )
+                        click.echo(
+                            f"{index_name}: {phase} (blocks {blocks_done}/"
+                            f"{blocks_total}, tuples {tuples_done}/{tuples_total})"
+                        )
+                    if done.wait(interval):
+                        return
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def build_index(cursor, index_name, query, settings=index_build_settings):
+    """Run a CREATE / DROP INDEX CONCURRENTLY query, retried on lock timeouts."""
+    backend_pid = cursor.connection.get_backend_pid()
+    for attempt in range(settings["lock_retries"] + 1):
+        drop_invalid_index(cursor, index_name)
+        try:
+            with report_progress(backend_pid, index_name, settings["progress_seconds"]):
+                cursor.execute(query)
+            return
+        except psycopg2.errors.LockNotAvailable:
+            drop_invalid_index(cursor, index_name)
+            if attempt == settings["lock_retries"]:
+                raise
+            click.echo(f"{index_name}: lock timeout, retrying ({attempt + 1})")
+            time.sleep(2**attempt)
+        except Exception:
+            drop_invalid_index(cursor, index_name)
+            raise
+
+
+def run_index_migration(migration_instance, connection, cursor):
+    """Build the indexes of the migration outside of a transaction.
+
+    Concurrent builds don't block writes to the table, but still wait for a
+    lock at their start and for the transactions using the table. The lock
+    timeout keeps them from queueing the writes behind them meanwhile.
+    """
+    connection.autocommit = True
+    try:
+        cursor.execute(
+            "SELECT set_config('lock_timeout', %s, false)",
+            (f"{index_build_settings['lock_timeout_ms']}ms",),
+        )
+        for index_name, query in migration_instance.index_queries:
+            build_index(cursor, index_name, query)
+    finally:
+        cursor.execute("RESET lock_timeout")
+        connection.autocommit = False
 
 
 def apply_migration():
-    with psycopg2.connect(**db_settings) as connection, connection.cursor() as cursor:
-        migration_files = get_migration_files()
-        for migration_file in migration_files:
+    timings = list()
+    connection = psycopg2.connect(**db_settings)
+    try:
+        with connection.cursor() as cursor:
+            # Serialize concurrent runners (e.g. several deploy pods), the
+            # lock is held by the session until it's explicitly released.
+            connection.autocommit = True
+            acquire_lock(cursor)
+            connection.autocommit = False
             try:
-                migration_module = load_migration_module(migration_file)
-                migration_class = getattr(migration_module, "Migration", None)
+                pending_migrations = get_pending_migrations(cursor)
+                connection.commit()
 
-                if migration_class and not is_migration_applied(cursor, migration_file):
-                    migration_instance = migration_class()
-                    migration_instance.apply()
-                    click.echo(f"Applied migration: {migration_file}\n")
+                for migration_file in get_migration_files():
+                    if migration_file not in pending_migrations:
+                        continue
 
-                    date_updated = datetime.datetime.now()
-                    query = f"UPDATE migration_history SET is_applied = '1', date_updated = '{date_updated}' WHERE name = '{migration_file}'"
-                    cursor.execute(query)
+                    start = time.perf_counter()
+                    try:
+                        migration_module = load_migration_module(migration_file)
+                        migration_class = getattr(migration_module, "Migration", None)
+                        if not migration_class:
+                            click.echo(
+                                f"Couldn't find the Migration class in {migration_file}\n"
+                            )
+                            continue
 
-                elif not migration_class:
+                        migration_instance = migration_class()
+                        if getattr(migration_instance, "atomic", True):
+                            # One transaction per migration, history update included
+                            run_migration(migration_instance, cursor)
+                        else:
+                            # Its queries are idempotent, they're run again if
+                            # it fails before the history update
+                            run_index_migration(migration_instance, connection, cursor)
+                        cursor.execute(
+                            "UPDATE migration_history SET is_applied = '1', date_updated = %s WHERE name = %s",
+                            (datetime.datetime.now(), migration_file),
+                        )
+                        connection.commit()
+                    except Exception as e:
+                        connection.rollback()
+                        click.echo(f"Error applying {migration_file}: {e}\n")
+                        raise
+
+                    seconds = time.perf_counter() - start
+                    timings.append((migration_file, seconds))
                     click.echo(
-                        f"Couldn't find the Migration class in {migration_file}\n"
+                        f"Applied migration: {migration_file} ({seconds:.3f}s)\n"
                     )
-            except Exception as e:
-                click.echo(f"Error importing {migration_file}: {e}\n")
+            finally:
+                connection.rollback()
+                connection.autocommit = True
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+    finally:
+        connection.close()
+
+    return timings
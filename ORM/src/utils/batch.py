@@ -0,0 +1,200 @@
+from collections import namedtuple
+from concurrent.futures import Future
+
+# A queued statement: reads have a `build` turning their rows into the
+# result, writes resolve to their row count. `column_count` is set on reads
+# returning exactly one row, which can share a SELECT with their neighbours.
+Statement = namedtuple(
+    "Statement", ["query", "params", "tables", "future", "build", "column_count"]
+)
+
+
+def get_round_trips(statements):
+    """Group `statements` in (writes, reads) sent as one query string each.
+
+    psycopg2 only returns the result of the last statement of a query string,
+    so a round trip ends at its read. Consecutive one row reads (aggregates
+    without group_by, count, exists) are joined in a single SELECT.
+    """
+    writes, reads = list(), list()
+    for statement in statements:
+        is_single_row = statement.column_count is not None
+        if reads and (
+            statement.build is None
+            or not is_single_row
+            or reads[-1].column_count is None
+        ):
+            yield writes, reads
+            writes, reads = list(), list()
+        if statement.build is None:
+            writes.append(statement)
+        else:
+            reads.append(statement)
+    if writes or reads:
+        yield writes, reads
+
+
+def split_columns(row, reads):
+    # The row of joined one row reads, back to one row per read
+    start = 0
+    for read in reads:
+        yield row[start : start + read.column_count]
+        start += read.column_count
+
+
+class Batch:
+    """Statements queued and sent together, to save network round trips.
+
+    with Employee.objects.batch() as batch:
+        batch.bulk_insert([{"id": 1, "emp_name": "Ana"}])
+        batch.update(Employee.objects.filter(id=2), salary="3000")
+        total = batch.aggregate(Employee.objects.all(), total=Sum("salary"))
+    total.result()
+
+    Every method returns a `concurrent.futures.Future`, resolved when the
+    batch is flushed: on leaving the block or calling `flush()`. The
+    statements run in order in one transaction on the primary, so reads see
+    the writes queued before them.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._statements = list()
+
+    def _queue(self, query, params=None, tables=(), build=None, column_count=None):
+        future = Future()
+        self._statements.append(
+            Statement(query, params, tuple(tables), future, build, column_count)
+        )
+        return future
+
+    def _check_queryset(self, queryset):
+        if queryset._prefetch:
+            raise ValueError(
+                "prefetch_related isn't supported in a batch, "
+                "prefetch the relations of the results instead"
+            )
+        return queryset.manager._get_tables()
+
+    def execute(self, query, params=None, tables=()):
+        # Any write, resolves to its row count (None when the driver doesn't
+        # report it, see `BaseManager._execute_batch`)
+        return self._queue(query, params, tables)
+
+    def bulk_insert(self, rows):
+        query, params = self.manager._build_insert_query(rows)
+        return self.execute(query, params, self.manager._get_tables())
+
+    def update(self, queryset, **new_data):
+        query, params = queryset._compile_update(new_data)
+        return self.execute(query, params, queryset.manager._get_tables())
+
+    def delete(self, queryset):
+        query, params = queryset._compile_delete()
+        return self.execute(query, params, queryset.manager._get_tables())
+
+    def _queue_select(self, queryset, build_objects):
+        tables = self._check_queryset(queryset)
+        fields = queryset._get_fields()
+        query, params = queryset._compile_select(fields)
+        row_factory = queryset.model_class._get_row_factory(fields)
+        return self._queue(
+            query, params, tables, lambda rows: build_objects(map(row_factory, rows))
+        )
+
+    def all(self, queryset):
+        return self._queue_select(queryset, list)
+
+    def first(self, queryset):
+        return self._queue_select(
+            queryset.limit(1), lambda model_objects: next(model_objects, None)
+        )
+
+    def count(self, queryset):
+        tables = self._check_queryset(queryset)
+        query, params = queryset._compile_count()
+        return self._queue(query, params, tables, lambda rows: rows[0][0], 1)
+
+    def exists(self, queryset):
+        tables = self._check_queryset(queryset)
+        query, params = queryset.limit(1)._compile_select(("1",))
+        return self._queue(
+            f"SELECT EXISTS ({query})", params, tables, lambda rows: rows[0][0], 1
+        )
+
+    def aggregate(self, queryset, group_by=None, as_arrays=False, **aggregates):
+        tables = self._check_queryset(queryset)
+        query, params, group_by = queryset._compile_aggregate(group_by, aggregates)
+
+        def build(rows):
+            return queryset._build_aggregate_result(
+                [rows], group_by, aggregates, as_arrays
+            )
+
+        column_count = None if group_by else len(aggregates)
+        return self._queue(query, params, tables, build, column_count)
+
+    def _take_statements(self):
+        statements, self._statements = self._statements, list()
+        return statements
+
+    def flush(self):
+        statements = self._take_statements()
+        if statements:
+            self.manager._execute_batch(statements)
+
+    def cancel(self):
+        for statement in self._take_statements():
+            statement.future.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.cancel()
+
+
+class AsyncBatch(Batch):
+    """`Batch` of an `AsyncBaseManager`, sent in libpq pipeline mode.
+
+    async with Employee.aobjects.batch() as batch:
+        ...
+    """
+
+    async def flush(self):
+        statements = self._take_statements()
+        if statements:
+            await self.manager._execute_batch(statements)
+
+    def __enter__(self):
+        raise TypeError("Use `async with` on the batch of an async manager")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.cancel()
+
+
+def resolve_statement(statement, rows=None, rowcount=None):
+    if statement.future.cancelled():
+        return
+    if statement.build is None:
+        statement.future.set_result(rowcount)
+        return
+    try:
+        statement.future.set_result(statement.build(rows))
+    except Exception as e:
+        statement.future.set_exception(e)
+
+
+def fail_statements(statements, error):
+    for statement in statements:
+        if not statement.future.done():
+            statement.future.set_exception(error)
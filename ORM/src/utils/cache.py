@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+def freeze(value):
+    # Query params as a hashable value, e.g. the list given to `id__in`
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    hash(value)
+    return value
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results with a time-to-live.
+
+    Entries are keyed on (tables, normalized SQL, params) and dropped as soon
+    as one of their tables is written through a manager.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60, max_rows=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows  # bigger results are never cached
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()  # key -> (expires_at, rows)
+        self._keys_by_table = defaultdict(set)
+        # Bumped by each write, so results read while a table was being
+        # written are never stored
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tables, query, params):
+        try:
+            params = freeze(params)
+        except TypeError:
+            return None  # not cacheable
+        tables = tuple(sorted(table.lower() for table in tables))
+        return tables, " ".join(query.split()), params
+
+    def get_generation(self, tables):
+        with self._lock:
+            return tuple(self._generations[table.lower()] for table in tables)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, rows = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, rows
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def set(self, key, rows, generation):
+        tables = key[0]
+        if len(rows) > self.max_rows:
+            return
+        with self._lock:
+            current_generation = tuple(self._generations[table] for table in tables)
+            if current_generation != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, rows)
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._keys_by_table[table].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for table in key[0]:
+            self._keys_by_table[table].discard(key)
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                table = table.lower()
+                self._generations[table] += 1
+                for key in list(self._keys_by_table.pop(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,75 @@
+import numpy as np
+
+from Modules.DataType import Date, Integer, Money, Numeric, Timestamp
+
+# NumPy dtype of the array built for each declared DataType, anything else
+# (strings, times, undeclared columns) is kept as Python objects.
+NUMPY_DTYPES = {
+    Integer: np.dtype("int64"),
+    Numeric: np.dtype("float64"),
+    Money: np.dtype("float64"),
+    Date: np.dtype("datetime64[D]"),
+    Timestamp: np.dtype("datetime64[us]"),
+}
+DECIMAL_TYPES = (Numeric, Money)
+
+
+def get_column_dtype(column, decimal="float"):
+    if column is None:
+        return np.dtype(object)
+    datatype = type(column.datatype)
+    if decimal == "object" and datatype in DECIMAL_TYPES:
+        return np.dtype(object)
+    return NUMPY_DTYPES.get(datatype, np.dtype(object))
+
+
+def get_aggregate_dtype(column, aggregate=None, decimal="float"):
+    # Group fields keep their column dtype, COUNT is always an integer and
+    # AVG a float (Postgres returns it as numeric, even for integers).
+    if aggregate is None or aggregate.function in ("SUM", "MIN", "MAX"):
+        return get_column_dtype(column, decimal)
+    if aggregate.function == "COUNT":
+        return np.dtype("int64")
+    return np.dtype("float64")
+
+
+def get_column_expression(field_name, column):
+    # psycopg2 returns `money` as a locale formatted string, read it as numeric
+    if column is not None and isinstance(column.datatype, Money):
+        return f"{field_name}::numeric AS {field_name}"
+    return field_name
+
+
+def to_array(values, dtype):
+    try:
+        return np.array(values, dtype=dtype)
+    except TypeError:
+        if dtype.kind not in "iu":
+            raise
+    # Integer column with NULLs: fall back to float64 so they can be NaN
+    return np.array(
+        [np.nan if value is None else value for value in values], dtype="float64"
+    )
+
+
+class ColumnBuffer:
+    """Growable NumPy array filled one chunk of rows at a time."""
+
+    def __init__(self, dtype, capacity=2000):
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        chunk = to_array(values, self.array.dtype)
+        if chunk.dtype != self.array.dtype:
+            self.array = self.array.astype(chunk.dtype)
+
+        size = self.size + len(chunk)
+        if size > len(self.array):
+            self.array.resize(max(size, 2 * len(self.array)), refcheck=False)
+        self.array[self.size : size] = chunk
+        self.size = size
+
+    def to_array(self):
+        self.array.resize(self.size, refcheck=False)
+        return self.array
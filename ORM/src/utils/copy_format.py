@@ -0,0 +1,116 @@
+import datetime
+import re
+import struct
+import uuid
+
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.2
+TEXT_NULL = "\\N"
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+BINARY_TRAILER = struct.pack("!h", -1)
+BINARY_NULL = struct.pack("!i", -1)
+
+PG_EPOCH_DATE = datetime.date(2000, 1, 1)
+PG_EPOCH = datetime.datetime(2000, 1, 1)
+PG_EPOCH_TZ = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _pack(fmt):
+    return struct.Struct(fmt).pack
+
+
+def _encode_text(value):
+    return str(value).encode()
+
+
+def _encode_date(value):
+    return struct.pack("!i", (value - PG_EPOCH_DATE).days)
+
+
+def _encode_timestamp(value):
+    return struct.pack("!q", (value - PG_EPOCH) // ONE_MICROSECOND)
+
+
+def _encode_timestamptz(value):
+    return struct.pack("!q", (value - PG_EPOCH_TZ) // ONE_MICROSECOND)
+
+
+# Binary wire encoders by PostgreSQL type name (as returned by `format_type`)
+BINARY_ENCODERS = {
+    "smallint": _pack("!h"),
+    "integer": _pack("!i"),
+    "bigint": _pack("!q"),
+    "real": _pack("!f"),
+    "double precision": _pack("!d"),
+    "boolean": lambda value: b"\x01" if value else b"\x00",
+    "text": _encode_text,
+    "character varying": _encode_text,
+    "character": _encode_text,
+    "bytea": bytes,
+    "date": _encode_date,
+    "timestamp without time zone": _encode_timestamp,
+    "timestamp with time zone": _encode_timestamptz,
+    "uuid": lambda value: uuid.UUID(str(value)).bytes,
+}
+
+
+def text_value(value):
+    if value is None:
+        return TEXT_NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = "\\x" + bytes(value).hex()
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    return str(value).translate(TEXT_ESCAPES)
+
+
+def encode_text_batch(rows):
+    return "".join("\t".join(map(text_value, row)) + "\n" for row in rows)
+
+
+def encode_binary_batch(rows, encoders):
+    field_count = struct.pack("!h", len(encoders))
+    pack_length = struct.Struct("!i").pack
+
+    chunks = [BINARY_HEADER]
+    for row in rows:
+        chunks.append(field_count)
+        for encode, value in zip(encoders, row):
+            if value is None:
+                chunks.append(BINARY_NULL)
+            else:
+                data = encode(value)
+                chunks.append(pack_length(len(data)))
+                chunks.append(data)
+    chunks.append(BINARY_TRAILER)
+    return b"".join(chunks)
+
+
+def get_column_types(cursor, table_name):
+    cursor.execute(
+        """
+        SELECT attname, format_type(atttypid, NULL)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """,
+        (table_name,),
+    )
+    return {column_name: column_type for column_name, column_type in cursor}
+
+
+def get_binary_encoders(column_types, field_names):
+    encoders = []
+    for field_name in field_names:
+        column_type = re.sub(r"\(.*\)", "", column_types[field_name])
+        if column_type not in BINARY_ENCODERS:
+            raise ValueError(
+                f"binary COPY doesn't support column {field_name} "
+                f"of type {column_type}, use the text format"
+            )
+        encoders.append(BINARY_ENCODERS[column_type])
+    return encoders
@@ -2,8 +2,15 @@ import psycopg2
 import os
 import inspect
 import datetime
+import pprint
 from src.utils.db import db_settings
-from src.utils.generate_sql import generate_create_table_sql
+from src.utils.model_state import (
+    MODEL_STATE_NAME,
+    diff_indexes,
+    diff_model_states,
+    get_model_state,
+    load_last_model_state,
+)
 
 
 def get_model_classes(models_folder="Models"):
@@ -20,27 +27,58 @@ def get_model_classes(models_folder="Models"):
     return classes
 
 
-def generate_sql_queries(classes):
-    return "".join(generate_create_table_sql(model_class) for model_class in classes)
+def generate_sql_queries(previous_state, current_state):
+    # Only the changes since the last migration, computed in memory
+    return "\n\t\t".join(diff_model_states(previous_state, current_state))
 
 
-def write_migration_file(sql_queries, description):
-    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    migration_file = f"Migrations/migration_{version}_{description}.py"
+def get_version():
+    return datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+
+
+def write_migration_file(sql_queries, description, model_state=None, version=None):
+    migration_name = f"migration_{version or get_version()}_{description}.py"
+    migration_file = f"Migrations/{migration_name}"
     with open(migration_file, "w") as f:
-        f.write(
-            f"""
+        f.write(f"""
 import psycopg2
 from src.utils.db import db_settings
 
+# State of the models after this migration, the next one is diffed from it
+{MODEL_STATE_NAME} = {pprint.pformat(model_state or dict(), sort_dicts=False)}
+
 class Migration:
-    def apply(self):
-        with psycopg2.connect(**db_settings) as connection, connection.cursor() as cursor:
-            cursor.execute('''
+    def apply(self, cursor=None):
+        if cursor is None:
+            with psycopg2.connect(**db_settings) as connection, connection.cursor() as cursor:
+                return self.apply(cursor)
+
+        cursor.execute('''
             {sql_queries}
             ''')
-"""
-        )
+""")
+    return migration_name
+
+
+def write_index_migration_file(
+    index_queries, description, model_state=None, version=None
+):
+    # Sorted right after the migration of the same version and description,
+    # which creates the tables and columns being indexed
+    migration_name = f"migration_{version or get_version()}_{description}_indexes.py"
+    migration_file = f"Migrations/{migration_name}"
+    with open(migration_file, "w") as f:
+        f.write(f"""
+# State of the models after this migration, the next one is diffed from it
+{MODEL_STATE_NAME} = {pprint.pformat(model_state or dict(), sort_dicts=False)}
+
+class Migration:
+    # CREATE / DROP INDEX CONCURRENTLY can't run in a transaction block, the
+    # runner executes these (index name, query) one by one in autocommit
+    atomic = False
+    index_queries = {pprint.pformat(index_queries)}
+""")
+    return migration_name
 
 
 def insert_migration_history(migration_name):
@@ -57,9 +95,26 @@ def insert_migration_history(migration_name):
 
 
 def create_migration_file(description):
-    classes = get_model_classes()
-    sql_queries = generate_sql_queries(classes)
-    write_migration_file(sql_queries, description)
-    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    migration_name = f"migration_{version}_{description}.py"
-    insert_migration_history(migration_name)
+    # Returns the names of the new migrations, none when the models didn't
+    # change. Index builds get a migration of their own, run outside of a
+    # transaction.
+    previous_state = load_last_model_state()
+    current_state = get_model_state(get_model_classes())
+    sql_queries = generate_sql_queries(previous_state, current_state)
+    index_queries = diff_indexes(previous_state, current_state)
+
+    version = get_version()
+    migration_names = list()
+    if sql_queries:
+        migration_names.append(
+            write_migration_file(sql_queries, description, current_state, version)
+        )
+    if index_queries:
+        migration_names.append(
+            write_index_migration_file(
+                index_queries, description, current_state, version
+            )
+        )
+    for migration_name in migration_names:
+        insert_migration_history(migration_name)
+    return migration_names
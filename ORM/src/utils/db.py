@@ -9,3 +9,37 @@ db_settings = {
     "port": configuration.DB_PORT,
     "database": configuration.DB_NAME,
 }
+
+pool_settings = {
+    "min_size": configuration.DB_POOL_MIN_SIZE,
+    "max_size": configuration.DB_POOL_MAX_SIZE,
+    "max_uses": configuration.DB_POOL_MAX_USES,
+    "timeout": configuration.DB_POOL_TIMEOUT,
+    "health_check_interval": configuration.DB_POOL_HEALTH_CHECK_INTERVAL,
+}
+
+
+def get_replica_settings(replicas):
+    # "replica1:5432,replica2" -> one `db_settings` per replica
+    replica_settings = list()
+    for replica in replicas.split(","):
+        host, _, port = replica.strip().partition(":")
+        if host:
+            replica_settings.append(
+                {**db_settings, "host": host, "port": port or db_settings["port"]}
+            )
+    return replica_settings
+
+
+replica_settings = get_replica_settings(configuration.DB_REPLICAS)
+
+routing_settings = {
+    "read_your_writes_seconds": configuration.DB_READ_YOUR_WRITES_SECONDS,
+    "retry_seconds": configuration.DB_REPLICA_RETRY_SECONDS,
+}
+
+index_build_settings = {
+    "lock_timeout_ms": configuration.MIGRATION_LOCK_TIMEOUT_MS,
+    "lock_retries": configuration.MIGRATION_LOCK_RETRIES,
+    "progress_seconds": configuration.MIGRATION_PROGRESS_SECONDS,
+}
@@ -0,0 +1,114 @@
+import os
+import threading
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+
+# Arrow type of the Postgres types (by OID) read from the COPY csv output,
+# anything else is exported as strings
+ARROW_TYPES = {
+    16: "bool_",  # bool
+    20: "int64",  # int8
+    21: "int16",  # int2
+    23: "int32",  # int4
+    700: "float32",  # float4
+    701: "float64",  # float8
+    1082: "date32",  # date
+}
+
+
+def get_arrow_type(column):
+    import pyarrow as pa
+
+    if column.type_code in ARROW_TYPES:
+        return getattr(pa, ARROW_TYPES[column.type_code])()
+    if column.type_code == 1700 and column.precision is not None:  # numeric(p, s)
+        return pa.decimal128(column.precision, column.scale or 0)
+    if column.type_code == 1114:  # timestamp
+        return pa.timestamp("us")
+    if column.type_code == 1184:  # timestamptz
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+def get_copy_query(query, header=True):
+    # COPY (SELECT ...) TO STDOUT, `query` with its params already bound
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER {str(header).upper()})"
+
+
+def copy_to_csv(cursor, query, path, chunk_size, header=True):
+    # The rows go from the connection to the file as COPY sends them,
+    # written `chunk_size` bytes at a time
+    with open(path, "wb", buffering=chunk_size) as f:
+        cursor.copy_expert(get_copy_query(query, header), f)
+    return max(cursor.rowcount, 0)
+
+
+def copy_to_arrow(cursor, query, path, export_format, chunk_size):
+    """Write the rows of `query` to a Parquet or Arrow IPC file.
+
+    COPY writes the csv into a pipe from a thread, while pyarrow parses it
+    back by `chunk_size` bytes blocks typed from the query's result columns,
+    so a single block is held in memory at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    cursor.execute(f"SELECT * FROM ({query}) AS export LIMIT 0")
+    column_types = {
+        column.name: get_arrow_type(column) for column in cursor.description
+    }
+    read_options = pa_csv.ReadOptions(block_size=chunk_size)
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types,
+        true_values=["t"],
+        false_values=["f"],
+        # COPY writes NULL as an unquoted empty field and empty strings as "".
+        # Only that is NULL: pyarrow's default list would also read strings
+        # like NA or null (and float NaN) as NULL.
+        null_values=[""],
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+    )
+
+    read_fd, write_fd = os.pipe()
+    errors = list()
+
+    def copy(pipe):
+        try:
+            with pipe:
+                cursor.copy_expert(get_copy_query(query), pipe)
+        except Exception as e:
+            errors.append(e)
+
+    rows = 0
+    with open(read_fd, "rb") as reader:
+        thread = threading.Thread(
+            target=copy, args=(open(write_fd, "wb", buffering=chunk_size),)
+        )
+        thread.start()
+        try:
+            batches = pa_csv.open_csv(
+                reader, read_options=read_options, convert_options=convert_options
+            )
+            if export_format == "parquet":
+                import pyarrow.parquet as pa_parquet
+
+                writer = pa_parquet.ParquetWriter(path, batches.schema)
+            else:
+                writer = pa.ipc.new_file(path, batches.schema)
+            with writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+        except Exception:
+            # Unblock the COPY thread, then report why COPY stopped if it
+            # failed first (pyarrow only sees the end of the csv)
+            reader.close()
+            thread.join()
+            if errors and not isinstance(errors[0], BrokenPipeError):
+                raise errors[0]
+            raise
+    thread.join()
+    if errors:
+        raise errors[0]
+    return rows
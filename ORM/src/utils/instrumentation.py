@@ -0,0 +1,141 @@
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+from src.config import configuration
+from src.utils.logger import get_logger
+
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def get_query_shape(query):
+    # Queries differing only by their literal values share a shape
+    query = STRING_LITERAL_PATTERN.sub("?", query)
+    query = NUMBER_LITERAL_PATTERN.sub("?", query)
+    return " ".join(query.split())
+
+
+def estimate_rows_size(rows):
+    # Approximate number of bytes fetched, psycopg doesn't expose it
+    size = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, (str, bytes, bytearray, memoryview)):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size
+
+
+def get_percentile(sorted_samples, percentile):
+    if not sorted_samples:
+        return None
+    index = max(0, int(round(percentile / 100 * len(sorted_samples))) - 1)
+    return sorted_samples[index]
+
+
+class QueryEvent:
+    """One statement run by a manager, handed to the before/after hooks."""
+
+    def __init__(self, query, params, model_class):
+        self.query = query
+        self.params = params
+        self.model_class = model_class
+        self.shape = get_query_shape(query)
+        self.started_at = time.perf_counter()
+        self.seconds = None
+        self.rows = 0
+        self.bytes = 0
+        self.plan = None
+        # The exception the statement failed with
+        self.error = None
+
+    def add_rows(self, rows):
+        self.rows += len(rows)
+        self.bytes += estimate_rows_size(rows)
+
+
+class QueryInstrumentation:
+    """Timings, slow-query log and per-shape stats of the manager queries."""
+
+    def __init__(
+        self,
+        slow_query_ms=configuration.SLOW_QUERY_MS,
+        explain_slow_queries=configuration.EXPLAIN_SLOW_QUERIES,
+        max_samples=1000,
+        logger=None,
+    ):
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow_queries = explain_slow_queries
+        self.logger = logger or get_logger(configuration.LOG_LEVEL)
+        self.before_hooks = list()
+        self.after_hooks = list()
+
+        # shape -> durations of its last `max_samples` runs
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._counts = defaultdict(int)
+        self._rows = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add_before_hook(self, hook):
+        self.before_hooks.append(hook)
+
+    def add_after_hook(self, hook):
+        self.after_hooks.append(hook)
+
+    def start(self, query, params=None, model_class=None):
+        event = QueryEvent(query, params, model_class)
+        for hook in self.before_hooks:
+            hook(event)
+        return event
+
+    def finish(self, event):
+        # Returns whether the query is slow and its plan should be captured
+        event.seconds = time.perf_counter() - event.started_at
+        with self._lock:
+            self._samples[event.shape].append(event.seconds)
+            self._counts[event.shape] += 1
+            self._rows[event.shape] += event.rows
+        for hook in self.after_hooks:
+            hook(event)
+
+        if self.slow_query_ms is None or event.seconds * 1000 < self.slow_query_ms:
+            return False
+        model_name = event.model_class.__name__ if event.model_class else "-"
+        self.logger.warning(
+            f"Slow query ({event.seconds * 1000:.1f}ms, {event.rows} rows, "
+            f"model {model_name}): {event.shape}"
+        )
+        # A failed statement has no plan worth explaining
+        return (
+            self.explain_slow_queries
+            and event.error is None
+            and event.shape.upper().startswith("SELECT")
+        )
+
+    def record_plan(self, event, plan):
+        event.plan = plan
+        self.logger.warning(f"Plan of slow query {event.shape}:\n{plan}")
+
+    def summary(self):
+        summary = dict()
+        with self._lock:
+            for shape, samples in self._samples.items():
+                sorted_samples = sorted(samples)
+                summary[shape] = {
+                    "count": self._counts[shape],
+                    "rows": self._rows[shape],
+                    "p50": get_percentile(sorted_samples, 50),
+                    "p95": get_percentile(sorted_samples, 95),
+                    "p99": get_percentile(sorted_samples, 99),
+                    "max": sorted_samples[-1],
+                }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._rows.clear()
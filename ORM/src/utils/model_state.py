@@ -0,0 +1,403 @@
+import ast
+import os
+
+from Modules.Column import Column
+from Modules.Index import Index
+from src.utils.partitions import (
+    get_partition_clause,
+    get_partition_queries,
+    get_partition_state,
+)
+from src.utils.summaries import (
+    get_create_summary_queries,
+    get_drop_summary_query,
+    get_summary_states,
+)
+
+# Each migration file stores the state of the models it brings the schema to:
+#   model_state = {
+#       "employees": {
+#           "columns": {
+#               "id": {"type": "INT", "primary_key": True, "foreign_key": None},
+#               ...
+#           },
+#           "indexes": {
+#               "employees_manager_idx": {
+#                   "columns": ["manager"], "unique": False, "where": None,
+#               },
+#           },
+#       },
+#   }
+# The next migration is the difference between that state and the models,
+# computed without querying the database.
+MODEL_STATE_NAME = "model_state"
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def get_model_columns(model_class):
+    # BaseModel subclasses move their columns to `__columns__`
+    columns = getattr(model_class, "__columns__", None)
+    if columns is None:
+        columns = {
+            attr_name: attr
+            for attr_name, attr in vars(model_class).items()
+            if isinstance(attr, Column)
+        }
+    return columns
+
+
+def get_column_state(column):
+    return {
+        "type": column.datatype.__name__,
+        "primary_key": bool(column.primary_key),
+        "foreign_key": column.foreign_key,
+    }
+
+
+def get_model_indexes(model_class):
+    # Indexes flagged on the columns, then the model level `__indexes__`
+    indexes = list()
+    for column_name, column in get_model_columns(model_class).items():
+        if column.index or column.unique:
+            indexes.append(Index(column_name, unique=column.unique))
+    indexes.extend(getattr(model_class, "__indexes__", ()))
+    return indexes
+
+
+def get_index_state(table_name, index, column_names):
+    columns = [column_name.lower() for column_name in index.columns]
+    for column_name in columns:
+        if column_name not in column_names:
+            raise ValueError(f"Index on {table_name} has no column {column_name!r}")
+    index_name = index.name or (
+        f"{table_name}_{'_'.join(columns)}_{'key' if index.unique else 'idx'}"
+    )
+    if len(index_name) > MAX_IDENTIFIER_LENGTH:
+        # Postgres would silently truncate it, the state would no longer match
+        raise ValueError(f"Index name {index_name!r} is too long, give it a name")
+    return index_name.lower(), {
+        "columns": columns,
+        "unique": bool(index.unique),
+        "where": index.where,
+    }
+
+
+def get_model_state(classes):
+    model_state = dict()
+    for model_class in classes:
+        table_name = (
+            getattr(model_class, "__tablename__", None)
+            or getattr(model_class, "table_name")
+        ).lower()
+        columns = {
+            column_name.lower(): get_column_state(column)
+            for column_name, column in get_model_columns(model_class).items()
+        }
+        indexes = dict()
+        for index in get_model_indexes(model_class):
+            index_name, index_state = get_index_state(table_name, index, columns)
+            if index_name in indexes:
+                raise ValueError(f"Index {index_name!r} is declared twice")
+            indexes[index_name] = index_state
+        model_state[table_name] = {"columns": columns, "indexes": indexes}
+        partition_by = getattr(model_class, "__partition_by__", None)
+        if partition_by is not None:
+            model_state[table_name]["partition_by"] = get_partition_state(
+                table_name, partition_by, columns
+            )
+        summaries = get_summary_states(
+            table_name,
+            getattr(model_class, "__summaries__", ()),
+            {name: column_state["type"] for name, column_state in columns.items()},
+        )
+        if summaries:
+            model_state[table_name]["summaries"] = summaries
+
+    # Summaries are tables (or views) too
+    summary_names = [
+        name
+        for table_state in model_state.values()
+        for name in table_state.get("summaries", {})
+    ]
+    for name in summary_names:
+        if name in model_state or summary_names.count(name) > 1:
+            raise ValueError(f"Summary name {name!r} is already used")
+    return model_state
+
+
+def read_model_state(migration_path):
+    # Parse the file instead of importing it: no code runs, no connection
+    with open(migration_path) as f:
+        tree = ast.parse(f.read(), filename=migration_path)
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and node.targets[0].id == MODEL_STATE_NAME
+        ):
+            return ast.literal_eval(node.value)
+    return None
+
+
+def load_last_model_state(migrations_folder="Migrations"):
+    # State stored by the latest migration, empty if none stores one (e.g.
+    # migrations written before states existed)
+    migration_files = sorted(
+        f
+        for f in os.listdir(migrations_folder)
+        if f.startswith("migration_") and f.endswith(".py")
+    )
+    for migration_file in reversed(migration_files):
+        model_state = read_model_state(os.path.join(migrations_folder, migration_file))
+        if model_state is not None:
+            return model_state
+    return dict()
+
+
+def get_primary_keys(table_state):
+    return [
+        column_name
+        for column_name, column_state in table_state["columns"].items()
+        if column_state["primary_key"]
+    ]
+
+
+def get_references(foreign_key):
+    table_name, _, column_name = foreign_key.partition(".")
+    return f"REFERENCES {table_name}({column_name or 'id'})"
+
+
+def get_create_table_query(table_name, table_state):
+    # IF NOT EXISTS: the first state based migration of a database created by
+    # older migrations describes tables that may already be there
+    definitions = list()
+    for column_name, column_state in table_state["columns"].items():
+        definition = f"{column_name} {column_state['type']}"
+        if column_state["foreign_key"]:
+            definition += f" {get_references(column_state['foreign_key'])}"
+        definitions.append(definition)
+    primary_keys = get_primary_keys(table_state)
+    if primary_keys:
+        definitions.append(f"PRIMARY KEY ({', '.join(primary_keys)})")
+    query = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(definitions)})"
+    if table_state.get("partition_by"):
+        query += f" {get_partition_clause(table_state['partition_by'])}"
+    return query + ";"
+
+
+def sort_created_tables(table_names, model_state):
+    # Referenced tables first, so inline REFERENCES find their table
+    ordered_tables = list()
+    pending_tables = list(table_names)
+    while pending_tables:
+        for table_name in pending_tables:
+            referenced_tables = {
+                column_state["foreign_key"].partition(".")[0].lower()
+                for column_state in model_state[table_name]["columns"].values()
+                if column_state["foreign_key"]
+            }
+            if not (referenced_tables - {table_name}) & set(pending_tables):
+                break
+        else:
+            table_name = pending_tables[0]  # cycle, keep the declared order
+        pending_tables.remove(table_name)
+        ordered_tables.append(table_name)
+    return ordered_tables
+
+
+def diff_table(table_name, previous_table, current_table):
+    # (drop queries, add queries) turning `previous_table` into `current_table`
+    drop_queries, add_queries = list(), list()
+    previous_columns = previous_table["columns"]
+    current_columns = current_table["columns"]
+
+    # Constraints are dropped before their columns change and added back after
+    for column_name, previous_column in previous_columns.items():
+        current_column = current_columns.get(column_name)
+        if previous_column["foreign_key"] and (
+            current_column is None
+            or current_column["foreign_key"] != previous_column["foreign_key"]
+        ):
+            drop_queries.append(
+                f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS "
+                f"{table_name}_{column_name}_fkey;"
+            )
+    previous_primary_keys = get_primary_keys(previous_table)
+    current_primary_keys = get_primary_keys(current_table)
+    if previous_primary_keys != current_primary_keys and previous_primary_keys:
+        drop_queries.append(
+            f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {table_name}_pkey;"
+        )
+
+    for column_name in previous_columns:
+        if column_name not in current_columns:
+            drop_queries.append(
+                f"ALTER TABLE {table_name} DROP COLUMN IF EXISTS {column_name};"
+            )
+
+    for column_name, current_column in current_columns.items():
+        previous_column = previous_columns.get(column_name)
+        if previous_column is None:
+            add_queries.append(
+                f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS "
+                f"{column_name} {current_column['type']};"
+            )
+        elif previous_column["type"] != current_column["type"]:
+            add_queries.append(
+                f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                f"TYPE {current_column['type']} "
+                f"USING {column_name}::{current_column['type']};"
+            )
+
+    if previous_primary_keys != current_primary_keys and current_primary_keys:
+        add_queries.append(
+            f"ALTER TABLE {table_name} ADD PRIMARY KEY "
+            f"({', '.join(current_primary_keys)});"
+        )
+    for column_name, current_column in current_columns.items():
+        previous_column = previous_columns.get(column_name)
+        if current_column["foreign_key"] and (
+            previous_column is None
+            or previous_column["foreign_key"] != current_column["foreign_key"]
+        ):
+            add_queries.append(
+                f"ALTER TABLE {table_name} ADD CONSTRAINT "
+                f"{table_name}_{column_name}_fkey FOREIGN KEY ({column_name}) "
+                f"{get_references(current_column['foreign_key'])};"
+            )
+    return drop_queries, add_queries
+
+
+def check_partitioning(table_name, previous_table, current_table):
+    # Only the range partitions upkeep (premake, retention) can change, the
+    # table must be recreated to be partitioned in another way
+    previous, current = (
+        {
+            key: value
+            for key, value in (table.get("partition_by") or {}).items()
+            if key not in ("premake", "retention")
+        }
+        for table in (previous_table, current_table)
+    )
+    if previous != current:
+        raise ValueError(
+            f"The partitioning of {table_name} can't change, create a new "
+            "partitioned table and copy the rows into it"
+        )
+
+
+def get_summaries(model_state):
+    return {
+        name: summary_state
+        for table_state in model_state.values()
+        for name, summary_state in table_state.get("summaries", {}).items()
+    }
+
+
+def diff_summaries(previous_state, current_state):
+    # (drop queries, create queries) of the summaries added, removed or
+    # changed. A changed summary (or one of the columns it reads) is dropped
+    # and created again from its table.
+    drop_queries, create_queries = list(), list()
+    previous_summaries = get_summaries(previous_state)
+    current_summaries = get_summaries(current_state)
+    for name, previous_summary in previous_summaries.items():
+        if current_summaries.get(name) != previous_summary:
+            drop_queries.append(get_drop_summary_query(name, previous_summary))
+    for name, current_summary in current_summaries.items():
+        if previous_summaries.get(name) != current_summary:
+            create_queries += get_create_summary_queries(name, current_summary)
+    return drop_queries, create_queries
+
+
+def diff_model_states(previous_state, current_state):
+    """SQL queries migrating the schema of `previous_state` to `current_state`."""
+    drop_queries, create_queries, add_queries = list(), list(), list()
+
+    created_tables = [name for name in current_state if name not in previous_state]
+    for table_name in sort_created_tables(created_tables, current_state):
+        table_state = current_state[table_name]
+        create_queries.append(get_create_table_query(table_name, table_state))
+        if table_state.get("partition_by"):
+            create_queries += get_partition_queries(
+                table_name, table_state["partition_by"]
+            )
+        if not previous_state:
+            # No state to start from: the table may exist with fewer columns
+            for column_name, column_state in table_state["columns"].items():
+                create_queries.append(
+                    f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS "
+                    f"{column_name} {column_state['type']};"
+                )
+
+    for table_name, current_table in current_state.items():
+        if table_name in previous_state:
+            check_partitioning(table_name, previous_state[table_name], current_table)
+            table_drop_queries, table_add_queries = diff_table(
+                table_name, previous_state[table_name], current_table
+            )
+            drop_queries += table_drop_queries
+            add_queries += table_add_queries
+
+    for table_name in previous_state:
+        if table_name not in current_state:
+            drop_queries.append(f"DROP TABLE IF EXISTS {table_name};")
+
+    # Summaries are dropped before the tables and columns they read, and
+    # created once the schema they read is migrated
+    summary_drop_queries, summary_create_queries = diff_summaries(
+        previous_state, current_state
+    )
+    return (
+        summary_drop_queries
+        + drop_queries
+        + create_queries
+        + add_queries
+        + summary_create_queries
+    )
+
+
+def get_create_index_query(table_name, index_name, index_state, concurrently=True):
+    # CONCURRENTLY: the table stays writable while the index is built.
+    # Partitioned tables don't support it, their index is created on every
+    # partition (and then on the new ones).
+    query = (
+        f"CREATE {'UNIQUE ' if index_state['unique'] else ''}INDEX "
+        f"{'CONCURRENTLY ' if concurrently else ''}"
+        f"IF NOT EXISTS {index_name} ON {table_name} "
+        f"({', '.join(index_state['columns'])})"
+    )
+    if index_state["where"]:
+        query += f" WHERE {index_state['where']}"
+    return query + ";"
+
+
+def diff_indexes(previous_state, current_state):
+    """(index name, query) pairs migrating the indexes of `previous_state`.
+
+    The queries use CONCURRENTLY (except on partitioned tables), so they run
+    outside of a transaction, once the tables and columns they need exist.
+    """
+    drop_queries, create_queries = list(), list()
+    for table_name, current_table in current_state.items():
+        # States written before indexes existed have none
+        previous_indexes = previous_state.get(table_name, {}).get("indexes", {})
+        current_indexes = current_table.get("indexes", {})
+        concurrently = "CONCURRENTLY " if not current_table.get("partition_by") else ""
+        for index_name, previous_index in previous_indexes.items():
+            if current_indexes.get(index_name) != previous_index:
+                drop_queries.append(
+                    (index_name, f"DROP INDEX {concurrently}IF EXISTS {index_name};")
+                )
+        for index_name, current_index in current_indexes.items():
+            if previous_indexes.get(index_name) != current_index:
+                create_queries.append(
+                    (
+                        index_name,
+                        get_create_index_query(
+                            table_name, index_name, current_index, bool(concurrently)
+                        ),
+                    )
+                )
+    return drop_queries + create_queries
@@ -0,0 +1,118 @@
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def get_key_ranges(low, high, partitions):
+    # [start, end) ranges of an integer key covering `low` to `high`, the
+    # last one is left open for the rows inserted since
+    if not isinstance(low, int) or not isinstance(high, int):
+        raise ValueError("parallel_scan needs an integer key, or key='ctid'")
+    size = max(-(-(high - low + 1) // partitions), 1)
+    starts = list(range(low, high + 1, size))
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def get_partition_count(partitions, rows, range_rows):
+    # At least `partitions` ranges, more if the table's `rows` (estimated)
+    # would make ranges of over `range_rows` rows
+    return max(partitions, -(-rows // max(range_rows, 1)), 1)
+
+
+def get_page_ranges(pages, partitions):
+    # [start, end) ranges of table pages, scanned with TID range scans
+    size = max(-(-pages // partitions), 1)
+    starts = list(range(0, max(pages, 1), size))
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def init_worker(manager_class, database_settings, replica_settings, routing):
+    # Worker processes open their own connections, to the primary only when
+    # the scan must see writes the replicas may not have yet
+    manager_class.set_connection(database_settings, min_size=1, max_size=2)
+    manager_class.set_replicas(replica_settings, **routing)
+
+
+def scan_range(model_class, query, params, fields, prefetch, chunk_size, callback):
+    """Read one range on its own connection, run in a pool worker.
+
+    Returns the range's objects, or what `callback` returns for an iterator
+    over them (then the objects never leave the worker).
+    """
+    manager = model_class.objects
+    row_factory = model_class._get_row_factory(fields)
+
+    def iterate():
+        for _, result in manager._stream_query(query, params, chunk_size):
+            model_objects = list(map(row_factory, result))
+            if prefetch:
+                manager.prefetch(model_objects, *prefetch)
+            yield from model_objects
+
+    if callback is not None:
+        return callback(iterate())
+    return list(iterate())
+
+
+def get_executor(manager, workers, executor):
+    if executor == "thread":
+        return ThreadPoolExecutor(workers)
+    if executor != "process":
+        raise ValueError(f"Unsupported executor: {executor}")
+    # Imported here, multiprocessing takes tens of milliseconds to import
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    router = manager._get_router()
+    replica_settings = list()
+    if router.get_replica_pool() is not None:
+        replica_settings = [pool.database_settings for pool in router.replica_pools]
+    routing = {
+        "read_your_writes_seconds": router.read_your_writes_seconds,
+        "retry_seconds": router.retry_seconds,
+    }
+    # Spawned: forked workers would share the parent's sockets
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(
+            type(manager),
+            manager._get_pool().database_settings,
+            replica_settings,
+            routing,
+        ),
+    )
+
+
+def run_tasks(function, tasks, executor, workers, ordered):
+    # Yield the result of each task, in order or as they complete. At most
+    # two tasks per worker are in flight so results don't pile up in memory.
+    tasks = iter(tasks)
+    pending = deque()
+
+    def submit():
+        for arguments in tasks:
+            if isinstance(executor, ThreadPoolExecutor):
+                # Thread workers keep the caller's routing state (its writes)
+                context = contextvars.copy_context()
+                pending.append(executor.submit(context.run, function, *arguments))
+            else:
+                pending.append(executor.submit(function, *arguments))
+            if len(pending) >= workers * 2:
+                return
+
+    try:
+        submit()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            result = future.result()
+            submit()
+            yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
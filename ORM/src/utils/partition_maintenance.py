@@ -0,0 +1,46 @@
+import click
+import psycopg2
+from src.utils.apply_migrations import MIGRATIONS_LOCK_ID
+from src.utils.create_migration import get_model_classes
+from src.utils.db import db_settings, index_build_settings
+from src.utils.model_state import get_model_state
+from src.utils.partitions import maintain_partitions
+
+
+def maintain_all_partitions(drop=False):
+    """Pre-create the upcoming range partitions of the models, detach the
+    expired ones (dropped with `drop`). Meant to run daily, e.g. from cron."""
+    model_state = get_model_state(get_model_classes())
+    changes = dict()
+    connection = psycopg2.connect(**db_settings)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            # Not concurrently with migrations (or another maintenance run),
+            # and without queueing the table's queries behind a lock for long
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, false)",
+                (f"{index_build_settings['lock_timeout_ms']}ms",),
+            )
+            try:
+                for table_name, table_state in model_state.items():
+                    partition_state = table_state.get("partition_by")
+                    if not partition_state or partition_state["method"] != "range":
+                        continue
+                    created, removed = maintain_partitions(
+                        cursor, table_name, partition_state, drop
+                    )
+                    for name in created:
+                        click.echo(f"Created partition {name}")
+                    for name in removed:
+                        click.echo(
+                            f"{'Dropped' if drop else 'Detached'} partition {name}"
+                        )
+                    changes[table_name] = (created, removed)
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+    finally:
+        connection.close()
+
+    return changes
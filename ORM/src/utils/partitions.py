@@ -0,0 +1,190 @@
+import datetime
+import re
+
+# Range partitions cover one period each, named after its first day
+INTERVALS = ("day", "week", "month", "year")
+NAME_FORMATS = {"day": "%Y%m%d", "week": "%Y%m%d", "month": "%Y%m", "year": "%Y"}
+UPPER_BOUND_PATTERN = re.compile(r"TO \('(\d{4}-\d{2}-\d{2})")
+
+
+def get_partition_state(table_name, partition_by, columns):
+    # What's stored in the model state of a partitioned table
+    column = partition_by.column.lower()
+    if column not in columns:
+        raise ValueError(f"{table_name} is partitioned by unknown column {column!r}")
+    primary_keys = [name for name, state in columns.items() if state["primary_key"]]
+    if primary_keys and column not in primary_keys:
+        raise ValueError(
+            f"The primary key of {table_name} must include the partition key "
+            f"{column!r}"
+        )
+    state = {"method": partition_by.method, "column": column}
+    if partition_by.method == "range":
+        if partition_by.interval not in INTERVALS:
+            raise ValueError(f"Unsupported interval: {partition_by.interval}")
+        state.update(
+            interval=partition_by.interval,
+            premake=partition_by.premake,
+            retention=partition_by.retention,
+        )
+    elif partition_by.method == "list":
+        state["values"] = {
+            name.lower(): list(values) for name, values in partition_by.values.items()
+        }
+    else:
+        state["partitions"] = partition_by.partitions
+    if partition_by.method != "hash":
+        state["default"] = bool(partition_by.default)
+    return state
+
+
+def get_period_start(day, interval):
+    if isinstance(day, datetime.datetime):
+        day = day.date()
+    if interval == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    if interval == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def add_periods(start, interval, count):
+    if interval == "day":
+        return start + datetime.timedelta(days=count)
+    if interval == "week":
+        return start + datetime.timedelta(weeks=count)
+    if interval == "month":
+        year, month = divmod(start.year * 12 + start.month - 1 + count, 12)
+        return start.replace(year=year, month=month + 1)
+    return start.replace(year=start.year + count)
+
+
+def get_range_bounds(value, interval):
+    # [start, end) of the period holding `value`, a date, datetime or an
+    # ISO formatted string (bounds are then strings too)
+    day = datetime.date.fromisoformat(value[:10]) if isinstance(value, str) else value
+    start = get_period_start(day, interval)
+    end = add_periods(start, interval, 1)
+    if isinstance(value, str):
+        return start.isoformat(), end.isoformat()
+    return start, end
+
+
+def get_partition_clause(partition_state):
+    method, column = partition_state["method"], partition_state["column"]
+    return f"PARTITION BY {method.upper()} ({column})"
+
+
+def get_range_partition_query(table_name, interval, start):
+    name = f"{table_name}_p{start.strftime(NAME_FORMATS[interval])}"
+    end = add_periods(start, interval, 1)
+    return name, (
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');"
+    )
+
+
+def get_range_partition_queries(table_name, partition_state, today=None):
+    # (name, query) of the partition of the current period and of the
+    # `premake` ones after it
+    start = get_period_start(
+        today or datetime.date.today(), partition_state["interval"]
+    )
+    return [
+        get_range_partition_query(
+            table_name,
+            partition_state["interval"],
+            add_periods(start, partition_state["interval"], index),
+        )
+        for index in range(partition_state["premake"] + 1)
+    ]
+
+
+def format_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def get_partition_queries(table_name, partition_state, today=None):
+    """Child partitions created along with the partitioned table."""
+    queries = list()
+    method = partition_state["method"]
+    if method == "range":
+        queries += [
+            query
+            for _, query in get_range_partition_queries(
+                table_name, partition_state, today
+            )
+        ]
+    elif method == "list":
+        for name, values in partition_state["values"].items():
+            queries.append(
+                f"CREATE TABLE IF NOT EXISTS {table_name}_{name} PARTITION OF "
+                f"{table_name} FOR VALUES IN "
+                f"({', '.join(map(format_literal, values))});"
+            )
+    else:
+        modulus = partition_state["partitions"]
+        for remainder in range(modulus):
+            queries.append(
+                f"CREATE TABLE IF NOT EXISTS {table_name}_p{remainder} PARTITION OF "
+                f"{table_name} FOR VALUES WITH "
+                f"(MODULUS {modulus}, REMAINDER {remainder});"
+            )
+    if partition_state.get("default"):
+        queries.append(
+            f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF "
+            f"{table_name} DEFAULT;"
+        )
+    return queries
+
+
+def get_expired_partitions(partitions, partition_state, today=None):
+    # Range partitions ending before the `retention` periods kept, from
+    # (name, bound expression) pairs as listed by `get_partitions`
+    if partition_state.get("retention") is None:
+        return []
+    interval = partition_state["interval"]
+    start = get_period_start(today or datetime.date.today(), interval)
+    cutoff = add_periods(start, interval, -partition_state["retention"])
+    expired = list()
+    for name, bound in partitions:
+        match = UPPER_BOUND_PATTERN.search(bound)
+        if match and datetime.date.fromisoformat(match.group(1)) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+def get_partitions(cursor, table_name):
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+        (table_name,),
+    )
+    return cursor.fetchall()
+
+
+def maintain_partitions(cursor, table_name, partition_state, drop=False, today=None):
+    """Create the upcoming range partitions, detach (or drop) expired ones.
+
+    Returns the (created, removed) partition names. Run on an autocommit
+    cursor: each statement locks the parent table only for its own duration.
+    """
+    existing = {name for name, _ in get_partitions(cursor, table_name)}
+    created = list()
+    for name, query in get_range_partition_queries(table_name, partition_state, today):
+        if name not in existing:
+            cursor.execute(query)
+            created.append(name)
+
+    removed = get_expired_partitions(
+        get_partitions(cursor, table_name), partition_state, today
+    )
+    for name in removed:
+        cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
+    return created, removed
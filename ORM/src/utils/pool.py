@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import PoolError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+# Errors after which a connection can't be trusted anymore
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """Thread-safe pool of autocommit psycopg2 connections."""
+
+    def __init__(
+        self,
+        database_settings,
+        min_size=1,
+        max_size=10,
+        max_uses=1000,
+        timeout=30,
+        health_check_interval=30,
+    ):
+        self.database_settings = database_settings
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (connection, time it was returned to the pool)
+        self._uses = dict()  # connection -> number of checkouts
+        self._size = 0  # connections opened by the pool, idle or checked out
+        self._closed = False
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        connection = psycopg2.connect(**self.database_settings)
+        connection.autocommit = (
+            True  # https://www.psycopg.org/docs/connection.html#connection.commit
+        )
+        self._uses[connection] = 0
+        return connection
+
+    def _close(self, connection):
+        self._uses.pop(connection, None)
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, connection, idle_since):
+        if connection.closed:
+            return False
+        # Connections that were used recently are trusted without a round trip
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while (
+                    not self._closed and not self._idle and self._size >= self.max_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError(
+                            f"no connection available after {self.timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._condition.wait(remaining)
+                if self._closed:
+                    raise PoolError("the connection pool is closed")
+
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                else:
+                    connection, idle_since = None, None
+                    self._size += 1
+
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+            elif not self._is_healthy(connection, idle_since):
+                # Reconnect: drop the broken connection and try again
+                self._discard(connection)
+                continue
+
+            self._uses[connection] += 1
+            return connection
+
+    def putconn(self, connection, discard=False):
+        if not discard and not connection.closed:
+            # Never hand out a connection with a pending transaction
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    discard = True
+        if (
+            discard
+            or self._closed
+            or connection.closed
+            or self._uses.get(connection, 0) >= self.max_uses
+        ):
+            self._discard(connection)
+            return
+
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def _discard(self, connection):
+        self._close(connection)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self, exclusive=False):
+        # Connection pinned to the current thread (see `pinned`) if any,
+        # otherwise a connection borrowed for the duration of the block.
+        # `exclusive` blocks (streams and transactions) always borrow their
+        # own: on the pinned one, the queries run meanwhile would join their
+        # transaction.
+        pinned = None if exclusive else getattr(self._local, "connection", None)
+        connection = pinned if pinned is not None else self.getconn()
+        discard = False
+        try:
+            yield connection
+        except CONNECTION_ERRORS:
+            discard = True
+            raise
+        finally:
+            if pinned is None:
+                self.putconn(connection, discard=discard)
+            elif discard:
+                self._local.connection = None
+                self.putconn(connection, discard=True)
+
+    def is_pinned(self):
+        return getattr(self._local, "connection", None) is not None
+
+    @contextmanager
+    def pinned(self):
+        # Keep one connection for every query the current thread runs inside
+        # the block, e.g. for the duration of a web request.
+        if getattr(self._local, "connection", None) is not None:
+            yield self._local.connection
+            return
+        self._local.connection = self.getconn()
+        try:
+            yield self._local.connection
+        finally:
+            connection, self._local.connection = self._local.connection, None
+            if connection is not None:
+                self.putconn(connection)
+
+    def closeall(self):
+        # Connections checked out meanwhile are closed once returned
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._close(connection)
+                self._size -= 1
+            self._condition.notify_all()
@@ -0,0 +1,751 @@
+import base64
+import copy
+import json
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from src.utils.partitions import get_range_bounds
+from src.utils.parallel import (
+    get_executor,
+    get_key_ranges,
+    get_page_ranges,
+    get_partition_count,
+    run_tasks,
+    scan_range,
+)
+from src.utils.summaries import (
+    ROW_COUNT,
+    compile_fed_update,
+    compile_fed_write,
+    get_fed_summaries,
+    route_aggregate,
+)
+
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# `field__lookup=value` keyword arguments and the SQL they compile to
+LOOKUPS = {
+    "exact": "{} = %s",
+    "ne": "{} <> %s",
+    "gt": "{} > %s",
+    "gte": "{} >= %s",
+    "lt": "{} < %s",
+    "lte": "{} <= %s",
+    "in": "{} = ANY(%s)",
+    "contains": "{} LIKE %s",
+    "icontains": "{} ILIKE %s",
+    "startswith": "{} LIKE %s",
+    "endswith": "{} LIKE %s",
+    "isnull": "{} IS NULL",
+    "notnull": "{} IS NOT NULL",
+}
+
+
+def check_identifier(name):
+    # Field and table names are interpolated in the SQL, values never are
+    if not IDENTIFIER_PATTERN.match(name):
+        raise ValueError(f"Invalid field name: {name!r}")
+    return name
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_lookup(key, value):
+    # Turn `salary__gt=1000` into the predicate shape ("salary", "gt") and
+    # its params ([1000]). Only the shape ends up in the compiled SQL.
+    field_name, _, lookup = key.partition("__")
+    lookup = lookup or "exact"
+    check_identifier(field_name)
+    if lookup not in LOOKUPS:
+        raise ValueError(f"Unsupported lookup: {key!r}")
+
+    if lookup == "exact" and value is None:
+        lookup, value = "isnull", True
+    if lookup in ("isnull", "notnull"):
+        is_null = bool(value) == (lookup == "isnull")
+        return (field_name, "isnull" if is_null else "notnull"), []
+    if lookup in ("contains", "icontains", "startswith", "endswith"):
+        if not isinstance(value, str):
+            raise ValueError(f"{key!r} needs a string, got {value!r}")
+    if lookup == "in":
+        value = list(value)
+    elif lookup in ("contains", "icontains"):
+        value = f"%{escape_like(value)}%"
+    elif lookup == "startswith":
+        value = f"{escape_like(value)}%"
+    elif lookup == "endswith":
+        value = f"%{escape_like(value)}"
+    return (field_name, lookup), [value]
+
+
+def compile_where(where):
+    # `where` is a tuple of (negated, predicates) groups, ANDed together
+    conditions = list()
+    for negated, predicates in where:
+        condition = " AND ".join(
+            LOOKUPS[lookup].format(field_name) for field_name, lookup in predicates
+        )
+        if negated:
+            condition = f"NOT ({condition})"
+        elif len(predicates) > 1:
+            condition = f"({condition})"
+        conditions.append(condition)
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def compile_order_by(order_by):
+    if not order_by:
+        return ""
+    order_by_format = ", ".join(
+        f"{field_name} {direction}" for field_name, direction in order_by
+    )
+    return f" ORDER BY {order_by_format}"
+
+
+def compile_keyset(keyset):
+    # Seek past the last row of the previous page: (salary, id) > (%s, %s)
+    fields, direction = keyset
+    fields_format = ", ".join(fields)
+    placeholders_format = ", ".join(["%s"] * len(fields))
+    operator = ">" if direction == "ASC" else "<"
+    return f"({fields_format}) {operator} ({placeholders_format})"
+
+
+@lru_cache(maxsize=1024)
+def compile_select(
+    table_name, fields, where, order_by, has_limit, has_offset, keyset=None
+):
+    fields_format = ", ".join(fields)
+    query = f"SELECT {fields_format} FROM {table_name}"
+    query += compile_where(where)
+    if keyset:
+        query += " AND " if where else " WHERE "
+        query += compile_keyset(keyset)
+    query += compile_order_by(order_by)
+    if has_limit:
+        query += " LIMIT %s"
+    if has_offset:
+        query += " OFFSET %s"
+    return query
+
+
+@lru_cache(maxsize=1024)
+def compile_update(table_name, fields, where):
+    placeholder_format = ", ".join([f"{field_name} = %s" for field_name in fields])
+    return f"UPDATE {table_name} SET {placeholder_format}" + compile_where(where)
+
+
+@lru_cache(maxsize=1024)
+def compile_delete(table_name, where):
+    return f"DELETE FROM {table_name}" + compile_where(where)
+
+
+@lru_cache(maxsize=1024)
+def compile_aggregate(table_name, expressions, group_by, where):
+    select_format = ", ".join(
+        list(group_by) + [f"{sql} AS {alias}" for alias, sql in expressions]
+    )
+    query = f"SELECT {select_format} FROM {table_name}" + compile_where(where)
+    if group_by:
+        group_by_format = ", ".join(group_by)
+        query += f" GROUP BY {group_by_format} ORDER BY {group_by_format}"
+    return query
+
+
+@lru_cache(maxsize=256)
+def get_row_class(field_names):
+    return namedtuple("Row", field_names)
+
+
+Page = namedtuple("Page", ["items", "next_token"])
+
+
+def encode_page_token(order_by, values):
+    # Opaque continuation token: the sort keys of the last row of a page
+    payload = json.dumps([order_by, values], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_page_token(token, order_by):
+    try:
+        token_order_by, values = json.loads(base64.urlsafe_b64decode(token))
+        token_order_by = [tuple(item) for item in token_order_by]
+    except (TypeError, ValueError):
+        raise ValueError("Invalid page token")
+    if token_order_by != list(order_by):
+        raise ValueError("The page token was issued for another ordering")
+    if not isinstance(values, list) or len(values) != len(order_by):
+        raise ValueError("Invalid page token")
+    return values
+
+
+class Aggregate:
+    function = None
+
+    def __init__(self, field_name):
+        self.field_name = check_identifier(field_name)
+
+    def to_sql(self):
+        return f"{self.function}({self.field_name})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.field_name!r})"
+
+
+class Sum(Aggregate):
+    function = "SUM"
+
+
+class Avg(Aggregate):
+    function = "AVG"
+
+
+class Min(Aggregate):
+    function = "MIN"
+
+
+class Max(Aggregate):
+    function = "MAX"
+
+
+class Count(Aggregate):
+    function = "COUNT"
+
+    def __init__(self, field_name="*"):
+        self.field_name = (
+            field_name if field_name == "*" else check_identifier(field_name)
+        )
+
+
+class QuerySet:
+    """Lazy, chainable query on a model, compiled to parameterized SQL.
+
+    Employee.objects.filter(salary__gt=1000).order_by("-salary").limit(10)
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.model_class = manager.model_class
+        self._where = tuple()
+        self._params = tuple()
+        self._order_by = tuple()
+        self._fields = tuple()
+        self._limit = None
+        self._offset = None
+        self._keyset = None
+        self._keyset_params = tuple()
+        self._prefetch = tuple()
+        self._use_summaries = True
+        self._allow_stale = False
+
+    def _clone(self, **changes):
+        clone = copy.copy(self)
+        clone.__dict__.update(changes)
+        return clone
+
+    def _add_where(self, lookups, negated):
+        predicates, params = list(), list()
+        for key, value in lookups.items():
+            predicate, predicate_params = parse_lookup(key, value)
+            predicates.append(predicate)
+            params += predicate_params
+        if not predicates:
+            return self
+        return self._clone(
+            _where=self._where + ((negated, tuple(predicates)),),
+            _params=self._params + tuple(params),
+        )
+
+    def filter(self, **lookups):
+        return self._add_where(lookups, negated=False)
+
+    def exclude(self, **lookups):
+        return self._add_where(lookups, negated=True)
+
+    def order_by(self, *field_names):
+        # "-field" sorts in descending order
+        order_by = tuple(
+            (
+                check_identifier(name.lstrip("-")),
+                "DESC" if name.startswith("-") else "ASC",
+            )
+            for name in field_names
+        )
+        return self._clone(_order_by=order_by)
+
+    def in_partition(self, value):
+        # Only the rows of the partition holding `value` of the partition key
+        # (for range partitions, the rows of its whole period), so Postgres
+        # prunes the others:
+        #   Event.objects.in_partition(date(2026, 10, 18)).filter(kind="login")
+        partition_by = getattr(self.model_class, "__partition_by__", None)
+        if partition_by is None:
+            raise ValueError(f"{self.model_class.__name__} isn't partitioned")
+        column = check_identifier(partition_by.column)
+        if partition_by.method != "range":
+            return self.filter(**{column: value})
+        start, end = get_range_bounds(value, partition_by.interval)
+        return self.filter(**{f"{column}__gte": start, f"{column}__lt": end})
+
+    def skip_summaries(self):
+        # Aggregate the table's rows even if a summary of the model has the
+        # result
+        return self._clone(_use_summaries=False)
+
+    def allow_stale(self):
+        # Aggregates may also be read from the model's materialized view
+        # summaries, as of their last refresh, e.g. for dashboards
+        return self._clone(_allow_stale=True)
+
+    def only(self, *field_names):
+        return self._clone(_fields=tuple(map(check_identifier, field_names)))
+
+    def limit(self, limit):
+        return self._clone(_limit=limit)
+
+    def offset(self, offset):
+        return self._clone(_offset=offset)
+
+    def prefetch_related(self, *relation_names):
+        # Load the relations of each batch of results with one query per
+        # relation, see `BaseManager.prefetch`
+        for relation_name in relation_names:
+            self.manager._get_relation(relation_name)  # fail before querying
+        return self._clone(_prefetch=self._prefetch + relation_names)
+
+    def _get_fields(self):
+        fields = self._fields or tuple(self.model_class.__columns__)
+        if not fields:
+            raise ValueError(
+                f"{self.model_class.__name__} declares no Column, "
+                "pick the fields to select with only()"
+            )
+        return fields
+
+    def _compile_select(self, fields):
+        query = compile_select(
+            self.model_class.table_name,
+            fields,
+            self._where,
+            self._order_by,
+            self._limit is not None,
+            self._offset is not None,
+            self._keyset,
+        )
+        params = list(self._params) + list(self._keyset_params)
+        if self._limit is not None:
+            params.append(self._limit)
+        if self._offset is not None:
+            params.append(self._offset)
+        return query, params
+
+    def all(self, chunk_size=2000):
+        fields = self._get_fields()
+        query, params = self._compile_select(fields)
+        row_factory = self.model_class._get_row_factory(fields)
+        model_objects = list()
+        for result in self.manager._fetch_chunks(
+            query, params, chunk_size, tables=self.manager._get_tables()
+        ):
+            model_objects.extend(map(row_factory, result))
+        if self._prefetch:
+            self.manager.prefetch(model_objects, *self._prefetch)
+        return model_objects
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def iterate(self, chunk_size=2000, batches=False):
+        # Server-side cursor streaming, see `BaseManager.iterate`
+        fields = self._get_fields()
+        query, params = self._compile_select(fields)
+        row_factory = self.model_class._get_row_factory(fields)
+        for _, result in self.manager._stream_query(query, params, chunk_size):
+            model_objects = list(map(row_factory, result))
+            if self._prefetch:
+                self.manager.prefetch(model_objects, *self._prefetch)
+            if batches:
+                yield model_objects
+            else:
+                yield from model_objects
+
+    def _estimate_rows(self):
+        # Rows of the table (and of its partitions) in the planner
+        # statistics, counted if it was never analyzed
+        (rows,) = self.manager._fetch_one(
+            "SELECT SUM(GREATEST(reltuples, 0))::BIGINT FROM pg_class "
+            "WHERE oid = %s::regclass OR oid IN "
+            "(SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+            (self.model_class.table_name,) * 2,
+        )
+        if not rows:
+            rows = self.manager.skip_summaries().count()
+        return rows
+
+    def _get_scan_querysets(self, key, partitions, range_rows):
+        # One queryset per range of `key`, or of the table pages for "ctid",
+        # of about `range_rows` rows at most
+        check_identifier(key)
+        partitions = get_partition_count(partitions, self._estimate_rows(), range_rows)
+        if key == "ctid":
+            (pages,) = self.manager._fetch_one(
+                "SELECT pg_relation_size(%s) / current_setting('block_size')::int",
+                (self.model_class.table_name,),
+            )
+            ranges = [
+                (f"({start},0)", None if end is None else f"({end},0)")
+                for start, end in get_page_ranges(pages, partitions)
+            ]
+        else:
+            bounds = self.skip_summaries().aggregate(low=Min(key), high=Max(key))
+            if bounds["low"] is None:
+                return []
+            ranges = get_key_ranges(bounds["low"], bounds["high"], partitions)
+
+        querysets = list()
+        for start, end in ranges:
+            lookups = {f"{key}__gte": start}
+            if end is not None:
+                lookups[f"{key}__lt"] = end
+            querysets.append(self.filter(**lookups))
+        return querysets
+
+    def parallel_scan(
+        self,
+        workers=4,
+        key="id",
+        partitions=None,
+        ordered=False,
+        callback=None,
+        batches=False,
+        executor="process",
+        chunk_size=2000,
+        range_rows=50000,
+    ):
+        # Split the rows in `partitions` ranges of `key` (an integer column,
+        # or "ctid" for ranges of table pages) read in parallel by `workers`
+        # processes (or threads), each range on its own connection and
+        # hydrated in its worker. Yields the objects, by range with
+        # `batches`, ranges in key order with `ordered`. Ranges are split to
+        # hold about `range_rows` rows at most (by the table statistics), a
+        # range's objects are sent back at once and two ranges per worker are
+        # in flight: at most workers * 2 * range_rows objects are held in
+        # memory, whatever the table's size. With a `callback`
+        # (a module level function in process mode), each range's objects
+        # are passed to it as an iterator in the worker and its return
+        # values are yielded instead:
+        #   def backfill(employees): ...; return count
+        #   total = sum(Employee.objects.parallel_scan(workers=16, callback=backfill))
+        if self._limit is not None or self._offset is not None:
+            raise ValueError("Can't scan a sliced QuerySet in parallel")
+        queryset = self.order_by(key) if ordered and not self._order_by else self
+        fields = queryset._get_fields()
+        tasks = [
+            (
+                self.model_class,
+                *range_queryset._compile_select(fields),
+                fields,
+                self._prefetch,
+                chunk_size,
+                callback,
+            )
+            for range_queryset in queryset._get_scan_querysets(
+                key, partitions or workers * 4, range_rows
+            )
+        ]
+        results = run_tasks(
+            scan_range,
+            tasks,
+            get_executor(self.manager, workers, executor),
+            workers,
+            ordered,
+        )
+        if callback is not None or batches:
+            yield from results
+        else:
+            for model_objects in results:
+                yield from model_objects
+
+    def export(self, path, format="csv", chunk_size=1 << 20, header=True):
+        # Write the selected rows to a "csv", "parquet" or "arrow" (IPC)
+        # file with COPY (SELECT ...) TO STDOUT: no model objects are built
+        # and the data flows to the file by `chunk_size` bytes. Parquet and
+        # Arrow need pyarrow. Returns {"rows", "seconds", "rows_per_second"}.
+        fields = self._get_fields()
+        query, params = self._compile_select(fields)
+        return self.manager._export(query, params, path, format, chunk_size, header)
+
+    def first(self):
+        model_objects = self.limit(1).all()
+        return model_objects[0] if model_objects else None
+
+    def _prepare_page(self, page_size, after, order_by):
+        # Keyset (seek) pagination: sort on `order_by` plus the primary key as
+        # a tie-breaker, then read the rows after the last one of the previous
+        # page, so every page costs the same as the first one.
+        queryset = self.order_by(*order_by) if order_by else self
+        order_by = queryset._order_by
+        primary_keys = [
+            name
+            for name, column in self.model_class.__columns__.items()
+            if column.primary_key
+        ] or ["id"]
+        direction = order_by[0][1] if order_by else "ASC"
+        order_by += tuple(
+            (name, direction)
+            for name in primary_keys
+            if name not in [field_name for field_name, _ in order_by]
+        )
+        if len({direction for _, direction in order_by}) > 1:
+            raise ValueError(
+                "Keyset pagination needs every order_by field in the same direction"
+            )
+
+        keyset_fields = tuple(field_name for field_name, _ in order_by)
+        fields = queryset._get_fields()
+        fields += tuple(name for name in keyset_fields if name not in fields)
+        queryset = queryset._clone(
+            _fields=fields,
+            _order_by=order_by,
+            _limit=page_size + 1,
+            _offset=None,
+        )
+        if after:
+            queryset = queryset._clone(
+                _keyset=(keyset_fields, direction),
+                _keyset_params=tuple(decode_page_token(after, order_by)),
+            )
+        return queryset
+
+    def _build_page(self, model_objects, page_size):
+        next_token = None
+        if len(model_objects) > page_size:
+            model_objects = model_objects[:page_size]
+            last_object = model_objects[-1]
+            next_token = encode_page_token(
+                self._order_by,
+                [getattr(last_object, field_name) for field_name, _ in self._order_by],
+            )
+        return Page(model_objects, next_token)
+
+    def paginate(self, page_size=50, after=None, order_by=None):
+        # page = Employee.objects.paginate(order_by=["-salary"], page_size=100)
+        # next_page = Employee.objects.paginate(..., after=page.next_token)
+        queryset = self._prepare_page(page_size, after, order_by)
+        return queryset._build_page(queryset.all(), page_size)
+
+    def _compile_count(self):
+        if self._limit is not None or self._offset is not None:
+            query, params = self._compile_select(("1",))
+            return f"SELECT COUNT(*) FROM ({query}) AS sliced", params
+        return self._clone(_order_by=())._compile_select(("COUNT(*)",))
+
+    def count(self):
+        query, params = self._compile_count()
+        return self.manager._fetch_one(
+            query, params, tables=self.manager._get_tables()
+        )[0]
+
+    def exists(self):
+        query, params = self.limit(1)._compile_select(("1",))
+        return (
+            self.manager._fetch_one(query, params, tables=self.manager._get_tables())
+            is not None
+        )
+
+    def _compile_aggregate(self, group_by, aggregates):
+        if not aggregates:
+            raise ValueError("aggregate() needs at least one aggregate")
+        group_by = tuple(map(check_identifier, group_by or ()))
+        expressions = tuple(
+            (check_identifier(alias), aggregate.to_sql())
+            for alias, aggregate in aggregates.items()
+        )
+        route = None
+        if self._use_summaries:
+            route = route_aggregate(
+                self.model_class._summaries,
+                group_by,
+                aggregates,
+                self._where,
+                self._allow_stale,
+            )
+        if route is not None:
+            # Roll up the precomputed groups, but the ones deletes emptied
+            summary_name, expressions = route
+            where = self._where + ((False, ((ROW_COUNT, "gt"),)),)
+            query = compile_aggregate(summary_name, expressions, group_by, where)
+            return query, list(self._params) + [0], group_by
+        query = compile_aggregate(
+            self.model_class.table_name, expressions, group_by, self._where
+        )
+        return query, list(self._params), group_by
+
+    def _build_aggregate_result(self, results, group_by, aggregates, as_arrays):
+        # `results` are the chunks of rows fetched for the aggregate query
+        if as_arrays:
+            from src.utils.columnar import ColumnBuffer, get_aggregate_dtype
+
+            columns = self.model_class.__columns__
+            dtypes = [get_aggregate_dtype(columns.get(name)) for name in group_by]
+            dtypes += [
+                get_aggregate_dtype(columns.get(aggregate.field_name), aggregate)
+                for aggregate in aggregates.values()
+            ]
+            buffers = [ColumnBuffer(dtype) for dtype in dtypes]
+            for result in results:
+                if result:
+                    for buffer, values in zip(buffers, zip(*result)):
+                        buffer.extend(values)
+            return {
+                name: buffer.to_array()
+                for name, buffer in zip(group_by + tuple(aggregates), buffers)
+            }
+
+        # Read to the end, the fetch only caches a complete result
+        rows = [row for result in results for row in result]
+        if not group_by and rows:
+            return dict(zip(aggregates, rows[0]))
+
+        row_class = get_row_class(group_by + tuple(aggregates))
+        return list(map(row_class._make, rows))
+
+    def aggregate(self, group_by=None, as_arrays=False, **aggregates):
+        # Compute every aggregate, for each group if any, in a single query:
+        #   aggregate(count=Count(), total=Sum("salary"), group_by=["manager"])
+        # returns {"count": ..., "total": ...} without `group_by`, otherwise
+        # one (manager, count, total) row per group, or with `as_arrays` a
+        # dict of NumPy arrays, one per group field and aggregate.
+        query, params, group_by = self._compile_aggregate(group_by, aggregates)
+        results = self.manager._fetch_chunks(
+            query, params, tables=self.manager._get_tables()
+        )
+        return self._build_aggregate_result(results, group_by, aggregates, as_arrays)
+
+    def _check_not_sliced(self):
+        if self._limit is not None or self._offset is not None:
+            raise ValueError("Can't update or delete a sliced QuerySet")
+
+    def _compile_update(self, new_data):
+        self._check_not_sliced()
+        if not new_data:
+            raise ValueError("update() needs at least one field to set")
+        fields = tuple(map(check_identifier, new_data))
+        summaries = get_fed_summaries(self.model_class._summaries, fields)
+        if summaries:
+            query = compile_fed_update(
+                self.model_class.table_name,
+                fields,
+                compile_where(self._where),
+                summaries,
+                self.manager._get_primary_keys(),
+            )
+        else:
+            query = compile_update(self.model_class.table_name, fields, self._where)
+        return query, list(new_data.values()) + list(self._params)
+
+    def update(self, **new_data):
+        query, params = self._compile_update(new_data)
+        return self.manager._execute_query(
+            query, params, tables=self.manager._get_tables()
+        )
+
+    def _compile_delete(self):
+        self._check_not_sliced()
+        query = compile_delete(self.model_class.table_name, self._where)
+        summaries = get_fed_summaries(self.model_class._summaries)
+        if summaries:
+            query = compile_fed_write(query, -1, summaries)
+        return query, list(self._params)
+
+    def delete(self):
+        query, params = self._compile_delete()
+        return self.manager._execute_query(
+            query, params, tables=self.manager._get_tables()
+        )
+
+
+class AsyncQuerySet(QuerySet):
+    """QuerySet of an `AsyncBaseManager`, every query method is awaitable."""
+
+    async def all(self):
+        fields = self._get_fields()
+        query, params = self._compile_select(fields)
+        row_factory = self.model_class._get_row_factory(fields)
+        rows = await self.manager._fetch_all(
+            query, params, tables=self.manager._get_tables()
+        )
+        model_objects = list(map(row_factory, rows))
+        if self._prefetch:
+            await self.manager.prefetch(model_objects, *self._prefetch)
+        return model_objects
+
+    def __iter__(self):
+        raise TypeError("Use `async for` or `await queryset.all()`")
+
+    def __aiter__(self):
+        return self.iterate()
+
+    def parallel_scan(self, *args, **kwargs):
+        raise TypeError("parallel_scan is blocking, use Model.objects.parallel_scan")
+
+    def export(self, *args, **kwargs):
+        raise TypeError("export is blocking, use Model.objects.export")
+
+    async def iterate(self, chunk_size=2000, batches=False):
+        fields = self._get_fields()
+        query, params = self._compile_select(fields)
+        row_factory = self.model_class._get_row_factory(fields)
+        async for _, result in self.manager._stream_query(query, params, chunk_size):
+            model_objects = list(map(row_factory, result))
+            if self._prefetch:
+                await self.manager.prefetch(model_objects, *self._prefetch)
+            if batches:
+                yield model_objects
+            else:
+                for model_object in model_objects:
+                    yield model_object
+
+    async def first(self):
+        model_objects = await self.limit(1).all()
+        return model_objects[0] if model_objects else None
+
+    async def paginate(self, page_size=50, after=None, order_by=None):
+        queryset = self._prepare_page(page_size, after, order_by)
+        return queryset._build_page(await queryset.all(), page_size)
+
+    async def count(self):
+        query, params = self._compile_count()
+        rows = await self.manager._fetch_all(
+            query, params, tables=self.manager._get_tables()
+        )
+        return rows[0][0]
+
+    async def exists(self):
+        query, params = self.limit(1)._compile_select(("1",))
+        rows = await self.manager._fetch_all(
+            query, params, tables=self.manager._get_tables()
+        )
+        return bool(rows)
+
+    async def aggregate(self, group_by=None, as_arrays=False, **aggregates):
+        query, params, group_by = self._compile_aggregate(group_by, aggregates)
+        rows = await self.manager._fetch_all(
+            query, params, tables=self.manager._get_tables()
+        )
+        return self._build_aggregate_result([rows], group_by, aggregates, as_arrays)
+
+    async def update(self, **new_data):
+        query, params = self._compile_update(new_data)
+        return await self.manager._execute_query(
+            query, params, tables=self.manager._get_tables()
+        )
+
+    async def delete(self):
+        query, params = self._compile_delete()
+        return await self.manager._execute_query(
+            query, params, tables=self.manager._get_tables()
+        )
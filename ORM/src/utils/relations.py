@@ -0,0 +1,74 @@
+from collections import defaultdict, namedtuple
+
+from src.utils.query import check_identifier
+
+# How to load `name` on a batch of objects: the distinct values of their
+# `field_name` are looked up in `related_field_name` of `model_class` with a
+# single `WHERE related_field_name = ANY(%s)` query. `many` relations (the
+# reverse side of a foreign key) hold a list of objects instead of one.
+Relation = namedtuple(
+    "Relation", ["name", "model_class", "field_name", "related_field_name", "many"]
+)
+
+
+def parse_foreign_key(foreign_key):
+    # "departments.id" -> ("departments", "id"), the column defaults to `id`
+    table_name, _, field_name = foreign_key.partition(".")
+    return check_identifier(table_name), check_identifier(field_name or "id")
+
+
+def get_model(models, table_name):
+    try:
+        return models[table_name.lower()]
+    except KeyError:
+        raise ValueError(f"No model is declared for the table {table_name!r}")
+
+
+def get_relation(model_class, name, models):
+    # Foreign key declared on the model itself
+    for field_name, column in model_class.__columns__.items():
+        if column.foreign_key and column.relation == name:
+            table_name, related_field_name = parse_foreign_key(column.foreign_key)
+            related_model = get_model(models, table_name)
+            return Relation(name, related_model, field_name, related_field_name, False)
+
+    # Foreign key of another model referencing this one
+    for related_model in models.values():
+        for field_name, column in related_model.__columns__.items():
+            if not column.foreign_key or column.related_name != name:
+                continue
+            table_name, target_field_name = parse_foreign_key(column.foreign_key)
+            if table_name.lower() == model_class.table_name.lower():
+                return Relation(
+                    name, related_model, target_field_name, field_name, True
+                )
+
+    raise ValueError(f"{model_class.__name__} has no relation {name!r}")
+
+
+def get_related_values(model_objects, relation):
+    # Distinct non NULL keys of the batch, in order
+    values = (
+        getattr(model_object, relation.field_name, None)
+        for model_object in model_objects
+    )
+    return list(dict.fromkeys(value for value in values if value is not None))
+
+
+def attach_related(model_objects, relation, related_objects):
+    if relation.many:
+        related_by_key = defaultdict(list)
+        for related_object in related_objects:
+            key = getattr(related_object, relation.related_field_name)
+            related_by_key[key].append(related_object)
+        for model_object in model_objects:
+            key = getattr(model_object, relation.field_name, None)
+            setattr(model_object, relation.name, list(related_by_key.get(key, ())))
+    else:
+        related_by_key = {
+            getattr(related_object, relation.related_field_name): related_object
+            for related_object in related_objects
+        }
+        for model_object in model_objects:
+            key = getattr(model_object, relation.field_name, None)
+            setattr(model_object, relation.name, related_by_key.get(key))
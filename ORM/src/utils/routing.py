@@ -0,0 +1,72 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Per thread / asyncio task: when it last wrote, and whether its reads must
+# go to the primary
+_last_write_at = ContextVar("last_write_at", default=None)
+_use_primary = ContextVar("use_primary", default=False)
+
+
+def record_write():
+    _last_write_at.set(time.monotonic())
+
+
+@contextmanager
+def use_primary():
+    # Read from the primary inside the block, e.g. right before a write
+    # depending on what's read
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    """Spreads the reads over the replica pools in turn.
+
+    Reads stay on the primary for `read_your_writes_seconds` after the same
+    thread (or asyncio task) wrote, so it sees its own writes despite the
+    replication lag. A replica that can't be reached is skipped for
+    `retry_seconds`.
+    """
+
+    def __init__(self, replica_pools, read_your_writes_seconds=2, retry_seconds=30):
+        self.replica_pools = list(replica_pools)
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.retry_seconds = retry_seconds
+
+        self._turns = itertools.count()
+        self._down_until = dict()  # replica pool index -> time it's retried
+        self._lock = threading.Lock()
+
+    def get_replica_pool(self):
+        # Pool to read from, None for the primary
+        if not self.replica_pools or _use_primary.get():
+            return None
+        last_write_at = _last_write_at.get()
+        now = time.monotonic()
+        if (
+            last_write_at is not None
+            and now - last_write_at < self.read_your_writes_seconds
+        ):
+            return None
+
+        with self._lock:
+            for _ in range(len(self.replica_pools)):
+                index = next(self._turns) % len(self.replica_pools)
+                if self._down_until.get(index, 0) <= now:
+                    return self.replica_pools[index]
+        return None
+
+    def mark_down(self, replica_pool):
+        index = self.replica_pools.index(replica_pool)
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_seconds
+
+    def closeall(self):
+        for replica_pool in self.replica_pools:
+            replica_pool.closeall()
@@ -0,0 +1,420 @@
+# Summaries keep COUNT, SUM and AVG (and, for materialized views, MIN and
+# MAX) of a table's rows per group, e.g. for employees_by_manager:
+#   manager | row_count | id_sum | id_count
+# Incremental summaries are tables the manager's writes add their rows to in
+# the same statement (see `compile_fed_write`), `concurrently` ones are
+# materialized views refreshed on a schedule, only read by the aggregates
+# allowing stale results.
+ROW_COUNT = "row_count"
+
+# The summaries are keyed on UNIQUE NULLS NOT DISTINCT, new in Postgres 15
+MIN_SERVER_VERSION = 150000
+
+# Type of the stored sums and of the read SUM and AVG, like Postgres' own
+# aggregates return, by column type. Other types are only counted.
+SUM_TYPES = {
+    "SMALLINT": ("BIGINT", "NUMERIC"),
+    "INT": ("BIGINT", "NUMERIC"),
+    "INTEGER": ("BIGINT", "NUMERIC"),
+    "BIGINT": ("NUMERIC", "NUMERIC"),
+    "NUMERIC": ("NUMERIC", "NUMERIC"),
+    "REAL": ("REAL", "DOUBLE PRECISION"),
+    "DOUBLE PRECISION": ("DOUBLE PRECISION", "DOUBLE PRECISION"),
+}
+
+
+def get_sum_types(column_type):
+    # "numeric(10, 2)" -> NUMERIC
+    return SUM_TYPES.get(column_type.split("(")[0].strip().upper())
+
+
+def get_summary_columns(state):
+    # (name, type, aggregate of the table rows, aggregate of the signed
+    # `delta` rows) of the columns after the group_by ones
+    columns = [(ROW_COUNT, "BIGINT", "COUNT(*)", "SUM(sign)")]
+    for field in state["fields"]:
+        column_type = state["columns"][field]
+        sum_types = get_sum_types(column_type)
+        if sum_types:
+            columns.append(
+                (
+                    f"{field}_sum",
+                    sum_types[0],
+                    f"COALESCE(SUM({field}), 0)",
+                    f"COALESCE(SUM(sign * {field}), 0)",
+                )
+            )
+        columns.append(
+            (
+                f"{field}_count",
+                "BIGINT",
+                f"COUNT({field})",
+                f"COALESCE(SUM(sign) FILTER (WHERE {field} IS NOT NULL), 0)",
+            )
+        )
+        if state["refresh"] != "incremental":
+            # Not maintainable from the changed rows: deleting the minimum
+            # needs the next one
+            columns.append((f"{field}_min", column_type, f"MIN({field})", None))
+            columns.append((f"{field}_max", column_type, f"MAX({field})", None))
+    return columns
+
+
+def get_summary_states(table_name, summaries, column_types):
+    """{name: state} of the summaries declared on a model (`__summaries__`)."""
+    states = dict()
+    for summary in summaries:
+        name = summary.name.lower()
+        if name in states:
+            raise ValueError(f"Summary {name!r} is declared twice")
+        group_by = [column_name.lower() for column_name in summary.group_by]
+        fields = [column_name.lower() for column_name in summary.fields]
+        for column_name in group_by + fields:
+            if column_name not in column_types:
+                raise ValueError(f"Summary {name} has no column {column_name!r}")
+        state = {
+            "table": table_name,
+            "group_by": group_by,
+            "fields": fields,
+            "refresh": summary.refresh,
+            "columns": {
+                column_name: column_types[column_name]
+                for column_name in group_by + fields
+            },
+        }
+        column_names = group_by + [column[0] for column in get_summary_columns(state)]
+        if len(set(column_names)) != len(column_names):
+            raise ValueError(f"The columns of summary {name} collide: {column_names}")
+        states[name] = state
+    return states
+
+
+def get_summary_select(state):
+    # The summary's rows, computed from the whole table
+    group_by = ", ".join(state["group_by"])
+    aggregates = ", ".join(
+        f"{sql} AS {name}" for name, _, sql, _ in get_summary_columns(state)
+    )
+    return f"SELECT {group_by}, {aggregates} FROM {state['table']} GROUP BY {group_by}"
+
+
+def get_column_names(state):
+    return ", ".join(
+        state["group_by"] + [column[0] for column in get_summary_columns(state)]
+    )
+
+
+def get_server_version_check():
+    # Fails the migration with a clear error on an older server, instead of
+    # a syntax error on NULLS NOT DISTINCT
+    return (
+        "DO $$ BEGIN IF current_setting('server_version_num')::INT < "
+        f"{MIN_SERVER_VERSION} THEN RAISE EXCEPTION 'Summaries need PostgreSQL "
+        "15 or later (UNIQUE NULLS NOT DISTINCT), the server runs %', "
+        "current_setting('server_version'); END IF; END $$;"
+    )
+
+
+def get_create_summary_queries(name, state):
+    """Queries creating and filling the summary `name`."""
+    group_by = ", ".join(state["group_by"])
+    if state["refresh"] != "incremental":
+        # REFRESH ... CONCURRENTLY needs a unique index on the view
+        return [
+            get_server_version_check(),
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS "
+            f"{get_summary_select(state)};",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} ({group_by}) "
+            "NULLS NOT DISTINCT;",
+        ]
+
+    definitions = [
+        f"{column_name} {state['columns'][column_name]}"
+        for column_name in state["group_by"]
+    ]
+    definitions += [
+        f"{column_name} {column_type} NOT NULL"
+        for column_name, column_type, _, _ in get_summary_columns(state)
+    ]
+    # NULL is a group too (Postgres 15+), the writes upsert on this key
+    definitions.append(f"UNIQUE NULLS NOT DISTINCT ({group_by})")
+    return [
+        get_server_version_check(),
+        f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(definitions)});",
+        # The table's writers wait for the migration to commit, the summary
+        # starts from all of their rows
+        f"LOCK TABLE {state['table']} IN SHARE MODE;",
+        f"INSERT INTO {name} ({get_column_names(state)}) {get_summary_select(state)} "
+        "ON CONFLICT DO NOTHING;",
+    ]
+
+
+def get_drop_summary_query(name, state):
+    kind = "TABLE" if state["refresh"] == "incremental" else "MATERIALIZED VIEW"
+    return f"DROP {kind} IF EXISTS {name};"
+
+
+def get_refresh_summary_queries(name, state, rebuild=False):
+    """Queries bringing the summary `name` up to date, run in a transaction.
+
+    Materialized views are refreshed without blocking their reads. The
+    incremental summaries are kept up to date by the writes, their emptied
+    groups are deleted, or with `rebuild` they are computed again (after
+    writes that didn't feed them).
+    """
+    if state["refresh"] != "incremental":
+        return [f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"]
+    if not rebuild:
+        return [f"DELETE FROM {name} WHERE {ROW_COUNT} = 0"]
+    return [
+        # The writers feeding the summary wait (reads don't), the new rows
+        # include every committed write
+        f"LOCK TABLE {name} IN EXCLUSIVE MODE",
+        f"DELETE FROM {name}",
+        f"INSERT INTO {name} ({get_column_names(state)}) {get_summary_select(state)}",
+    ]
+
+
+def get_fed_summaries(summaries, fields=None):
+    # The incremental summaries a write changes: all of them, or those
+    # reading one of the `fields` an update sets
+    return {
+        name: state
+        for name, state in summaries.items()
+        if state["refresh"] == "incremental"
+        and (fields is None or set(state["columns"]) & set(fields))
+    }
+
+
+def get_fed_columns(summaries):
+    # The table columns the fed summaries read, returned by the write
+    columns = list()
+    for state in summaries.values():
+        for column_name in state["columns"]:
+            if column_name not in columns:
+                columns.append(column_name)
+    return columns
+
+
+class CountedQuery(str):
+    """A write feeding summaries: its result is one row holding the write's
+    row count (`SELECT COUNT(*) FROM changed`), not a cursor row count."""
+
+
+def returns_count(query):
+    return isinstance(query, CountedQuery)
+
+
+def compile_feeds(summaries):
+    # One upsert per summary of the `delta` rows, grouped, then the write's
+    # row count as the statement's result
+    feeds = list()
+    for index, (name, state) in enumerate(summaries.items()):
+        group_by = ", ".join(state["group_by"])
+        columns = get_summary_columns(state)
+        deltas = ", ".join(delta for _, _, _, delta in columns)
+        updates = ", ".join(
+            f"{column_name} = summary.{column_name} + EXCLUDED.{column_name}"
+            for column_name, _, _, _ in columns
+        )
+        feeds.append(
+            f"feed_{index} AS (INSERT INTO {name} AS summary "
+            f"({get_column_names(state)}) "
+            f"SELECT {group_by}, {deltas} FROM delta GROUP BY {group_by} "
+            f"ON CONFLICT ({group_by}) DO UPDATE SET {updates})"
+        )
+    return ", ".join(feeds) + " SELECT COUNT(*) FROM changed"
+
+
+def compile_fed_write(query, sign, summaries):
+    """INSERT (sign 1) or DELETE (sign -1) `query` feeding `summaries`.
+
+    WITH changed AS (INSERT INTO employees ... RETURNING manager, id),
+      delta AS (SELECT 1 AS sign, manager, id FROM changed),
+      feed_0 AS (INSERT INTO employees_by_manager AS summary ...
+        SELECT manager, SUM(sign), ... FROM delta GROUP BY manager
+        ON CONFLICT (manager) DO UPDATE SET row_count = summary.row_count + ...)
+    SELECT COUNT(*) FROM changed
+    """
+    columns = ", ".join(get_fed_columns(summaries))
+    return CountedQuery(
+        f"WITH changed AS ({query} RETURNING {columns}), "
+        f"delta AS (SELECT {sign} AS sign, {columns} FROM changed), "
+        + compile_feeds(summaries)
+    )
+
+
+def compile_update_feeds(query, columns, summaries):
+    # `query` updating rows and returning their `columns` and their previous
+    # values (previous_<column>), subtracted from `summaries` as the new
+    # values are added
+    columns_format = ", ".join(columns)
+    previous_format = ", ".join(f"previous_{column_name}" for column_name in columns)
+    return CountedQuery(
+        f"WITH changed AS ({query}), "
+        f"delta AS (SELECT 1 AS sign, {columns_format} FROM changed "
+        f"UNION ALL SELECT -1, {previous_format} FROM changed), "
+        + compile_feeds(summaries)
+    )
+
+
+def compile_fed_update(table_name, fields, where_format, summaries, keys):
+    """UPDATE setting `fields` on the rows matching `where_format`, feeding
+    `summaries` with their previous values subtracted and the new ones added.
+
+    The previous values are read from the rows locked before their update,
+    joined on `keys` (the primary key, or else the row's position).
+    """
+    columns = get_fed_columns(summaries)
+    keys = list(keys) or ["tableoid", "ctid"]
+    selected = keys + [
+        column_name for column_name in columns if column_name not in keys
+    ]
+    set_format = ", ".join(f"{field_name} = %s" for field_name in fields)
+    join_format = " AND ".join(f"{table_name}.{key} = previous.{key}" for key in keys)
+    returned = [f"{table_name}.{column_name}" for column_name in columns]
+    returned += [
+        f"previous.{column_name} AS previous_{column_name}" for column_name in columns
+    ]
+    query = (
+        f"UPDATE {table_name} SET {set_format} "
+        f"FROM (SELECT {', '.join(selected)} FROM {table_name}{where_format} "
+        f"FOR UPDATE) AS previous WHERE {join_format} "
+        f"RETURNING {', '.join(returned)}"
+    )
+    return compile_update_feeds(query, columns, summaries)
+
+
+def compile_fed_bulk_update(table_name, fields, key_fields, source, summaries, keys):
+    """UPDATE setting `fields` from the `source` rows (aliased v) matched on
+    `key_fields`, feeding `summaries` like `compile_fed_update`.
+
+    UPDATE employees AS t SET salary = v.salary
+      FROM (SELECT v.*, p.id AS previous_id, p.salary AS previous_salary
+        FROM (VALUES ...) AS v (id, salary) JOIN employees AS p ON p.id = v.id
+        FOR UPDATE OF p) AS v
+      WHERE t.id = v.previous_id RETURNING t.salary, v.previous_salary
+    """
+    columns = get_fed_columns(summaries)
+    keys = list(keys) or ["tableoid", "ctid"]
+    selected = keys + [
+        column_name for column_name in columns if column_name not in keys
+    ]
+    previous_format = ", ".join(
+        f"p.{column_name} AS previous_{column_name}" for column_name in selected
+    )
+    match_format = " AND ".join(f"p.{name} = v.{name}" for name in key_fields)
+    set_format = ", ".join(f"{name} = v.{name}" for name in fields)
+    join_format = " AND ".join(f"t.{key} = v.previous_{key}" for key in keys)
+    returned = [f"t.{column_name}" for column_name in columns]
+    returned += [f"v.previous_{column_name}" for column_name in columns]
+    query = (
+        f"UPDATE {table_name} AS t SET {set_format} "
+        f"FROM (SELECT v.*, {previous_format} FROM {source} "
+        f"JOIN {table_name} AS p ON {match_format} FOR UPDATE OF p) AS v "
+        f"WHERE {join_format} RETURNING {', '.join(returned)}"
+    )
+    return compile_update_feeds(query, columns, summaries)
+
+
+def compile_fed_upsert(table_name, field_names, conflict, source, summaries):
+    """INSERT ... ON CONFLICT (`conflict`) DO UPDATE of the `source` rows (a
+    SELECT of `field_names`), feeding `summaries`: the inserted rows are
+    added, the updated ones have their previous values subtracted first.
+
+    The previous values are read from the conflicting rows, locked before
+    the insert reaches them, and the updated rows told apart from the
+    inserted ones by their xmax. A conflicting row committed by another
+    transaction after the statement started is updated without its previous
+    values subtracted, `refresh_summaries(rebuild=True)` repairs the summary.
+    """
+    columns = get_fed_columns(summaries)
+    conflict_format = ", ".join(conflict)
+    previous_format = ", ".join(
+        list(conflict)
+        + [f"{column_name} AS previous_{column_name}" for column_name in columns]
+    )
+    set_fields = [name for name in field_names if name not in conflict]
+    action = "DO NOTHING"
+    if set_fields:
+        set_format = ", ".join(f"{name} = EXCLUDED.{name}" for name in set_fields)
+        action = f"DO UPDATE SET {set_format}"
+    fields_format = ", ".join(field_names)
+    source_format = ", ".join(f"source.{name}" for name in field_names)
+    returned = list(conflict) + [
+        column_name for column_name in columns if column_name not in conflict
+    ]
+    columns_format = ", ".join(f"changed.{column_name}" for column_name in columns)
+    previous_columns = ", ".join(
+        f"previous.previous_{column_name}" for column_name in columns
+    )
+    return CountedQuery(
+        f"WITH source AS ({source}), "
+        f"previous AS (SELECT {previous_format} FROM {table_name} "
+        f"WHERE ({conflict_format}) IN (SELECT {conflict_format} FROM source) "
+        "FOR UPDATE), "
+        # Joining `previous` locks the rows before they are updated
+        f"changed AS (INSERT INTO {table_name} ({fields_format}) "
+        f"SELECT {source_format} FROM source LEFT JOIN previous "
+        f"USING ({conflict_format}) ON CONFLICT ({conflict_format}) {action} "
+        f"RETURNING {', '.join(returned)}, xmax = 0 AS inserted), "
+        f"delta AS (SELECT 1 AS sign, {columns_format} FROM changed "
+        f"UNION ALL SELECT -1, {previous_columns} FROM previous "
+        f"JOIN changed USING ({conflict_format}) WHERE NOT changed.inserted), "
+        + compile_feeds(summaries)
+    )
+
+
+def get_summary_expression(state, aggregate):
+    # SQL computing `aggregate` (Sum("id"), Count(), ...) over a summary's
+    # rows, None when the summary doesn't keep what it needs
+    columns = {column[0] for column in get_summary_columns(state)}
+    function, field_name = aggregate.function, aggregate.field_name
+    if function == "COUNT":
+        column_name = ROW_COUNT if field_name == "*" else f"{field_name}_count"
+        if column_name in columns:
+            return f"COALESCE(SUM({column_name}), 0)::BIGINT"
+    elif function in ("SUM", "AVG") and f"{field_name}_sum" in columns:
+        sum_type, avg_type = get_sum_types(state["columns"][field_name])
+        count = f"SUM({field_name}_count)"
+        if function == "SUM":
+            # NULL, like SUM, when no row has a value
+            return f"(CASE WHEN {count} > 0 THEN SUM({field_name}_sum) END)::{sum_type}"
+        return f"(SUM({field_name}_sum)::NUMERIC / NULLIF({count}, 0))::{avg_type}"
+    elif function in ("MIN", "MAX"):
+        column_name = f"{field_name}_{function.lower()}"
+        if column_name in columns:
+            return f"{function}({column_name})"
+    return None
+
+
+def route_aggregate(summaries, group_by, aggregates, where, allow_stale=False):
+    """(summary name, (alias, SQL) pairs) computing `aggregates` per
+    `group_by` from a summary, or None if no summary can.
+
+    The summary must group by every column of `group_by` and of the `where`
+    predicates (its groups are then rolled up). Materialized views, as of
+    their last refresh, are only candidates with `allow_stale`. Incremental
+    summaries are preferred, being up to date, then the one with the fewest
+    groups.
+    """
+    columns = set(group_by) | {
+        field_name for _, predicates in where for field_name, _ in predicates
+    }
+    candidates = list()
+    for name, state in summaries.items():
+        if not columns <= set(state["group_by"]):
+            continue
+        if state["refresh"] != "incremental" and not allow_stale:
+            continue
+        expressions = tuple(
+            (alias, get_summary_expression(state, aggregate))
+            for alias, aggregate in aggregates.items()
+        )
+        if all(sql is not None for _, sql in expressions):
+            rank = (state["refresh"] != "incremental", len(state["group_by"]))
+            candidates.append((rank, name, expressions))
+    if not candidates:
+        return None
+    _, name, expressions = min(candidates, key=lambda candidate: candidate[0])
+    return name, expressions
@@ -0,0 +1,43 @@
+import click
+import psycopg2
+from src.utils.apply_migrations import MIGRATIONS_LOCK_ID
+from src.utils.create_migration import get_model_classes
+from src.utils.db import db_settings, index_build_settings
+from src.utils.model_state import get_model_state, get_summaries
+from src.utils.summaries import get_refresh_summary_queries
+
+
+def refresh_all_summaries(rebuild=False):
+    """Refresh the materialized view summaries of the models, delete the
+    emptied groups of the incremental ones (computed again with `rebuild`).
+    Meant to run on a schedule, e.g. from cron."""
+    summaries = get_summaries(get_model_state(get_model_classes()))
+    refreshed = list()
+    connection = psycopg2.connect(**db_settings)
+    try:
+        with connection.cursor() as cursor:
+            # Not concurrently with migrations (or another maintenance run)
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, false)",
+                (f"{index_build_settings['lock_timeout_ms']}ms",),
+            )
+            connection.commit()
+            try:
+                for name, summary_state in summaries.items():
+                    for query in get_refresh_summary_queries(
+                        name, summary_state, rebuild
+                    ):
+                        cursor.execute(query)
+                    # One transaction per summary, its locks are held briefly
+                    connection.commit()
+                    click.echo(f"Refreshed summary {name}")
+                    refreshed.append(name)
+            finally:
+                connection.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+                connection.commit()
+    finally:
+        connection.close()
+
+    return refreshed
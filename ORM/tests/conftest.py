@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+# The ORM modules import each other from the ORM folder (`src.utils...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def database():
+    # Settings of the DB_* environment variables, the tests needing a
+    # database are skipped without one
+    import psycopg2
+    from src.utils.db import db_settings
+
+    try:
+        psycopg2.connect(**db_settings).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No database to test against: {e}")
+    return db_settings
+
+
+@pytest.fixture
+def items(database):
+    # A model on a fresh `test_items` table
+    import psycopg2
+    from app import BaseManager, BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Integer, String
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_items")
+        cursor.execute(
+            "CREATE TABLE test_items (id INT PRIMARY KEY, name VARCHAR(255), "
+            "grp VARCHAR(255), amount INT)"
+        )
+        cursor.execute(
+            "INSERT INTO test_items SELECT i, 'item' || i, 'g' || (i % 3), i "
+            "FROM generate_series(1, 100) i"
+        )
+
+    class Item(BaseModel):
+        table_name = "test_items"
+
+        id = Column(Integer(), primary_key=True)
+        name = Column(String())
+        grp = Column(String())
+        amount = Column(Integer())
+
+    BaseManager.set_connection(database, min_size=1, max_size=4)
+    yield Item
+    BaseManager.pool.closeall()
+    BaseManager.pool = None
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_items")
+    connection.close()
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+RECORD_RUN = """
+class Migration:
+    def apply(self, cursor):
+        # Which migration ran, and whether the runner held the lock meanwhile
+        cursor.execute("SELECT pg_sleep(0.2)")
+        cursor.execute(
+            "INSERT INTO migration_runs SELECT %s, EXISTS (SELECT 1 FROM pg_locks "
+            "WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted "
+            "AND (classid::bigint << 32 | objid::bigint) = 20231020153940)",
+            (__name__,),
+        )
+"""
+
+BUILD_INDEX = """
+class Migration:
+    atomic = False
+    index_queries = [
+        (
+            "migration_runs_name_idx",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS migration_runs_name_idx "
+            "ON migration_runs (name)",
+        )
+    ]
+"""
+
+
+@pytest.fixture
+def migrations(database, tmp_path, monkeypatch):
+    # Migration files in a temporary Migrations folder, applied to tables of
+    # their own schema
+    import psycopg2
+    from src.utils import apply_migrations
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS pydbmap_test CASCADE")
+        cursor.execute("CREATE SCHEMA pydbmap_test")
+        cursor.execute("SET search_path = pydbmap_test")
+        cursor.execute(
+            "CREATE TABLE migration_history (name VARCHAR(255), is_applied INT, "
+            "date_created TIMESTAMP, date_updated TIMESTAMP)"
+        )
+        cursor.execute("CREATE TABLE migration_runs (name TEXT, lock_held BOOLEAN)")
+
+    files = {
+        "migration_20240101000000_First.py": RECORD_RUN,
+        "migration_20240102000000_Index.py": BUILD_INDEX,
+        "migration_20240103000000_Second.py": RECORD_RUN,
+    }
+    (tmp_path / "Migrations").mkdir()
+    for file_name, source in files.items():
+        (tmp_path / "Migrations" / file_name).write_text(source)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO migration_history VALUES (%s, 0, now(), NULL)",
+                (file_name,),
+            )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        apply_migrations,
+        "db_settings",
+        {**database, "options": "-c search_path=pydbmap_test"},
+    )
+
+    def query(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    yield apply_migrations.apply_migration, query
+    with connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA pydbmap_test CASCADE")
+    connection.close()
+
+
+def test_pending_migrations_are_applied_once(migrations):
+    apply_migration, query = migrations
+
+    timings = apply_migration()
+    assert [file_name for file_name, _ in timings] == [
+        "migration_20240101000000_First.py",
+        "migration_20240102000000_Index.py",
+        "migration_20240103000000_Second.py",
+    ]
+    assert query("SELECT name, lock_held FROM migration_runs ORDER BY name") == [
+        ("Migrations.migration_20240101000000_First", True),
+        ("Migrations.migration_20240103000000_Second", True),
+    ]
+    assert query(
+        "SELECT count(*) FROM pg_indexes WHERE indexname = 'migration_runs_name_idx'"
+    ) == [(1,)]
+    assert query("SELECT DISTINCT is_applied FROM migration_history") == [(1,)]
+
+    # A rerun finds nothing pending
+    assert apply_migration() == []
+    assert query("SELECT count(*) FROM migration_runs") == [(2,)]
+
+
+def test_concurrent_runners_apply_each_migration_once(migrations):
+    apply_migration, query = migrations
+
+    timings = list()
+    runners = [
+        threading.Thread(target=lambda: timings.append(apply_migration()))
+        for _ in range(2)
+    ]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join()
+
+    # The runner waiting on the lock found the migrations applied
+    assert sorted(len(runner_timings) for runner_timings in timings) == [0, 3]
+    assert query("SELECT count(*) FROM migration_runs") == [(2,)]
+    assert query("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'") == [(0,)]
@@ -0,0 +1,96 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("select_columns", ("id",)),
+        ("copy_insert", ([{"id": 1}],)),
+        ("export", ("items.csv",)),
+        ("parallel_scan", ()),
+        ("session", ()),
+    ],
+)
+def test_blocking_methods_refused_on_async_manager(method, args):
+    from app import AsyncBaseManager, BaseModel
+
+    class Thing(BaseModel):
+        async_manager_class = AsyncBaseManager
+        table_name = "things"
+
+    with pytest.raises(TypeError):
+        getattr(Thing.aobjects, method)(*args)
+
+
+def test_async_reads_routed_like_sync_reads(items, database):
+    import asyncio
+    from app import AsyncBaseManager
+
+    async def run():
+        await AsyncBaseManager.set_async_connection(database, min_size=1, max_size=2)
+        # The primary doubles as the replica, reads are told apart by pool
+        await AsyncBaseManager.set_async_replicas(
+            [database], read_your_writes_seconds=60, max_size=2
+        )
+        (replica_pool,) = AsyncBaseManager.async_router.replica_pools
+        try:
+            assert len(await items.aobjects.all().all()) == 100
+            async for _ in items.aobjects.all().iterate(chunk_size=40):
+                pass
+            assert replica_pool.get_stats()["requests_num"] == 2
+
+            with AsyncBaseManager.use_primary():
+                await items.aobjects.all().all()
+            assert replica_pool.get_stats()["requests_num"] == 2
+
+            # Reads of the task that wrote go to the primary
+            await items.aobjects.filter(id=1).update(name="renamed")
+            (item,) = await items.aobjects.filter(id=1).all()
+            assert item.name == "renamed"
+            assert replica_pool.get_stats()["requests_num"] == 2
+        finally:
+            await replica_pool.close()
+            await AsyncBaseManager.async_pool.close()
+            AsyncBaseManager.async_router = None
+            AsyncBaseManager.async_pool = None
+
+    asyncio.run(run())
+
+
+def test_async_read_falls_back_to_the_primary(items, database):
+    import asyncio
+    from app import AsyncBaseManager
+
+    async def run():
+        await AsyncBaseManager.set_async_connection(database, min_size=1, max_size=2)
+        await AsyncBaseManager.set_async_replicas(
+            [{**database, "port": 1}], retry_seconds=60, timeout=0.5
+        )
+        router = AsyncBaseManager.async_router
+        try:
+            assert len(await items.aobjects.all().all()) == 100
+            assert router.get_replica_pool() is None
+        finally:
+            await router.replica_pools[0].close()
+            await AsyncBaseManager.async_pool.close()
+            AsyncBaseManager.async_router = None
+            AsyncBaseManager.async_pool = None
+
+    asyncio.run(run())
+
+
+def test_only_async_bulk_batches_are_capped_by_bind_parameters():
+    from app import AsyncBaseManager, BaseModel
+
+    class Thing(BaseModel):
+        async_manager_class = AsyncBaseManager
+        table_name = "things"
+
+    values = [(i, i, i) for i in range(50000)]
+    fields = ("id", "a", "b")
+    # psycopg2 interpolates client-side, the batch size is the caller's
+    batches = list(Thing.objects._get_bulk_batches(values, fields, 40000))
+    assert [len(batch) for batch in batches] == [40000, 10000]
+    # psycopg 3 binds at most 65535 parameters per statement
+    batches = list(Thing.aobjects._get_bulk_batches(values, fields, 40000))
+    assert [len(batch) for batch in batches] == [21845, 21845, 6310]
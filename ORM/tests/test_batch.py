@@ -0,0 +1,89 @@
+from src.utils.batch import Statement, get_round_trips, split_columns
+
+
+def statement(name, build=None, column_count=None):
+    return Statement(name, None, (), None, build, column_count)
+
+
+def write(name):
+    return statement(name)
+
+
+def read(name, column_count=None):
+    return statement(name, build=list, column_count=column_count)
+
+
+def names(round_trips):
+    return [
+        ([s.query for s in writes], [s.query for s in reads])
+        for writes, reads in round_trips
+    ]
+
+
+def test_round_trips_end_at_reads():
+    statements = [write("w1"), write("w2"), read("r1"), write("w3"), read("r2")]
+    assert names(get_round_trips(statements)) == [
+        (["w1", "w2"], ["r1"]),
+        (["w3"], ["r2"]),
+    ]
+
+
+def test_one_row_reads_share_a_round_trip():
+    statements = [
+        write("w1"),
+        read("count", 1),
+        read("totals", 2),
+        read("rows"),
+        read("exists", 1),
+        write("w2"),
+    ]
+    assert names(get_round_trips(statements)) == [
+        (["w1"], ["count", "totals"]),
+        ([], ["rows"]),
+        ([], ["exists"]),
+        (["w2"], []),
+    ]
+
+
+def test_no_statements():
+    assert list(get_round_trips([])) == []
+
+
+def test_split_columns():
+    reads = [read("count", 1), read("totals", 2)]
+    assert list(split_columns((3, 10, 2.5), reads)) == [(3,), (10, 2.5)]
+
+
+def test_batch_results(items):
+    from app import Count, Sum
+
+    manager = items.objects
+    with manager.batch() as batch:
+        inserted = batch.bulk_insert(
+            [{"id": 101, "name": "new", "grp": "g9", "amount": 5}]
+        )
+        selected = batch.all(manager.filter(id__lte=3).order_by("id"))
+        updated = batch.update(manager.filter(id__lte=3), amount=0)
+        count = batch.count(manager.filter(grp="g9"))
+        exists = batch.exists(manager.filter(id=1000))
+        totals = batch.aggregate(
+            manager.filter(id__lte=3), n=Count(), total=Sum("amount")
+        )
+        first = batch.first(manager.filter(id=101))
+        groups = batch.aggregate(manager.all(), group_by=["grp"], n=Count())
+        after = batch.count(manager.all())
+
+    assert inserted.result() is None
+    assert updated.result() is None
+    assert [item.id for item in selected.result()] == [1, 2, 3]
+    assert count.result() == 1
+    assert exists.result() is False
+    assert totals.result() == {"n": 3, "total": 0}
+    assert first.result().name == "new"
+    assert sorted((row.grp, row.n) for row in groups.result()) == [
+        ("g0", 33),
+        ("g1", 34),
+        ("g2", 33),
+        ("g9", 1),
+    ]
+    assert after.result() == 101
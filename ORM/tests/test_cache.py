@@ -0,0 +1,11 @@
+def test_scalar_aggregates_are_cached(items):
+    from app import BaseManager
+
+    BaseManager.enable_cache()
+    try:
+        counts = [items.objects.aggregate_count() for _ in range(3)]
+        assert counts == [100, 100, 100]
+        stats = BaseManager.cache.stats()
+        assert (stats["hits"], stats["misses"]) == (2, 1)
+    finally:
+        BaseManager.disable_cache()
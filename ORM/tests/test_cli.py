@@ -0,0 +1,66 @@
+import csv
+
+import pytest
+
+from src.cli import migrations, parse_filter
+
+
+@pytest.fixture
+def columns():
+    from app import Employee
+
+    return Employee.__columns__
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        ("salary__gt=1000", ("salary__gt", "1000")),
+        ("id__in=1,2", ("id__in", [1, 2])),
+        ("emp_name__in=a,b", ("emp_name__in", ["a", "b"])),
+        ("manager__isnull=false", ("manager__isnull", False)),
+        ("manager__notnull=True", ("manager__notnull", True)),
+        ("emp_name=a=b", ("emp_name", "a=b")),
+    ],
+)
+def test_parse_filter(columns, condition, expected):
+    assert parse_filter(condition, columns) == expected
+
+
+@pytest.mark.parametrize(
+    "condition", ["salary", "manager__isnull=no", "id__in=1,x", "missing=1"]
+)
+def test_parse_filter_rejects(columns, condition):
+    with pytest.raises(ValueError):
+        parse_filter(condition, columns)
+
+
+def test_export_with_in_filter(items, tmp_path):
+    from click.testing import CliRunner
+
+    output = tmp_path / "items.csv"
+    result = CliRunner().invoke(
+        migrations,
+        [
+            "--no-banner",
+            "--export",
+            "test_items",
+            "--output",
+            str(output),
+            "--columns",
+            "id,name",
+            "--where",
+            "id__in=2,5,7",
+            "--where",
+            "amount__notnull=true",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Exported 3 rows" in result.output
+    with open(output) as f:
+        assert list(csv.reader(f)) == [
+            ["id", "name"],
+            ["2", "item2"],
+            ["5", "item5"],
+            ["7", "item7"],
+        ]
@@ -0,0 +1,96 @@
+import pytest
+
+
+@pytest.fixture
+def payments(database):
+    # A model with a column of each numeric and temporal type
+    import psycopg2
+    from app import BaseManager, BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Date, Integer, Money, Numeric, Timestamp
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_payments")
+        cursor.execute(
+            "CREATE TABLE test_payments (id INT PRIMARY KEY, amount NUMERIC(10, 2), "
+            "fee MONEY, day DATE, paid_at TIMESTAMP)"
+        )
+        cursor.execute(
+            "INSERT INTO test_payments SELECT i, i * 1.25, i, "
+            "DATE '2026-01-01' + i, TIMESTAMP '2026-01-01 12:00' + i * INTERVAL '1 hour' "
+            "FROM generate_series(1, 50) i"
+        )
+
+    class Payment(BaseModel):
+        table_name = "test_payments"
+
+        id = Column(Integer(), primary_key=True)
+        amount = Column(Numeric(10, 2))
+        fee = Column(Money())
+        day = Column(Date())
+        paid_at = Column(Timestamp())
+
+    BaseManager.set_connection(database, min_size=1, max_size=2)
+    yield Payment
+    BaseManager.pool.closeall()
+    BaseManager.pool = None
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_payments")
+    connection.close()
+
+
+def test_select_columns_over_several_chunks(items):
+    columns = items.objects.select_columns(
+        "id", "name", "amount", order_by=["id"], chunk_size=30
+    )
+    assert [str(array.dtype) for array in columns.values()] == [
+        "int64",
+        "object",
+        "int64",
+    ]
+    assert [len(array) for array in columns.values()] == [100, 100, 100]
+    assert columns["id"].tolist() == list(range(1, 101))
+    assert columns["name"][-1] == "item100"
+    assert columns["amount"].sum() == 5050
+
+
+def test_select_columns_of_an_empty_table(items):
+    items.objects.delete()
+    columns = items.objects.select_columns("id", "name")
+    assert [len(array) for array in columns.values()] == [0, 0]
+    assert str(columns["id"].dtype) == "int64"
+
+
+def test_select_columns_integers_with_nulls(items):
+    items.objects.filter(id=5).update(amount=None)
+    columns = items.objects.select_columns("amount", order_by=["id"], chunk_size=30)
+    assert str(columns["amount"].dtype) == "float64"
+    assert len(columns["amount"]) == 100
+    assert columns["amount"][4] != columns["amount"][4]  # NaN
+    assert columns["amount"][99] == 100
+
+
+def test_select_columns_numeric_and_temporal_dtypes(payments):
+    import numpy as np
+    from decimal import Decimal
+
+    columns = payments.objects.select_columns(
+        "amount", "fee", "day", "paid_at", order_by=["id"], chunk_size=20
+    )
+    assert {name: str(array.dtype) for name, array in columns.items()} == {
+        "amount": "float64",
+        "fee": "float64",
+        "day": "datetime64[D]",
+        "paid_at": "datetime64[us]",
+    }
+    assert all(len(array) == 50 for array in columns.values())
+    assert columns["amount"][0] == 1.25
+    assert columns["fee"][-1] == 50.0
+    assert columns["day"][0] == np.datetime64("2026-01-02")
+    assert columns["paid_at"][1] == np.datetime64("2026-01-01T14:00")
+
+    columns = payments.objects.select_columns("amount", decimal="object")
+    assert columns["amount"].dtype == object
+    assert isinstance(columns["amount"][0], Decimal)
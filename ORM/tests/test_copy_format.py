@@ -0,0 +1,63 @@
+import datetime
+import struct
+import uuid
+
+import pytest
+
+from src.utils.copy_format import (
+    BINARY_HEADER,
+    BINARY_TRAILER,
+    encode_binary_batch,
+    encode_text_batch,
+    get_binary_encoders,
+)
+
+
+def test_text_batch():
+    rows = [
+        (1, "tab\there", None, True),
+        (2, "back\\slash\nnew line\r", b"\x00\xff", False),
+        (3, "\\N", datetime.date(2026, 10, 18), datetime.time(12, 30)),
+    ]
+    assert encode_text_batch(rows) == (
+        "1\ttab\\there\t\\N\tt\n"
+        "2\tback\\\\slash\\nnew line\\r\t\\\\x00ff\tf\n"
+        "3\t\\\\N\t2026-10-18\t12:30:00\n"
+    )
+
+
+def test_binary_batch():
+    column_types = {
+        "id": "integer",
+        "name": "character varying(255)",
+        "day": "date",
+        "at": "timestamp with time zone",
+        "key": "uuid",
+    }
+    encoders = get_binary_encoders(column_types, ["id", "name", "day", "at", "key"])
+    key = uuid.uuid4()
+    at = datetime.datetime(2000, 1, 1, 0, 0, 1, tzinfo=datetime.timezone.utc)
+    data = encode_binary_batch(
+        [(7, "é", datetime.date(2000, 1, 2), at, key), (8, None, None, None, None)],
+        encoders,
+    )
+    assert data == (
+        BINARY_HEADER
+        + struct.pack("!h", 5)
+        + struct.pack("!ii", 4, 7)
+        + struct.pack("!i", 2)
+        + "é".encode()
+        + struct.pack("!ii", 4, 1)
+        + struct.pack("!iq", 8, 1000000)
+        + struct.pack("!i", 16)
+        + key.bytes
+        + struct.pack("!h", 5)
+        + struct.pack("!ii", 4, 8)
+        + struct.pack("!i", -1) * 4
+        + BINARY_TRAILER
+    )
+
+
+def test_binary_rejects_unsupported_types():
+    with pytest.raises(ValueError):
+        get_binary_encoders({"data": "jsonb"}, ["data"])
@@ -0,0 +1,35 @@
+import math
+
+import pytest
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_export_keeps_null_like_strings(items, tmp_path, export_format):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pa_parquet
+
+    manager = items.objects
+    connection = manager._get_pool().getconn()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE test_items ADD COLUMN ratio FLOAT8")
+            cursor.execute(
+                "UPDATE test_items SET name = CASE id WHEN 1 THEN 'NA' "
+                "WHEN 2 THEN 'null' WHEN 3 THEN '' WHEN 4 THEN NULL ELSE name END, "
+                "ratio = CASE id WHEN 1 THEN 'NaN'::float8 WHEN 2 THEN NULL "
+                "ELSE 0.5 END"
+            )
+    finally:
+        manager._get_pool().putconn(connection)
+
+    path = tmp_path / f"items.{export_format}"
+    manager.filter(id__lte=4).only("id", "name", "ratio").order_by("id").export(
+        str(path), format=export_format
+    )
+    if export_format == "parquet":
+        table = pa_parquet.read_table(path)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    assert table.column("name").to_pylist() == ["NA", "null", "", None]
+    ratios = table.column("ratio").to_pylist()
+    assert math.isnan(ratios[0]) and ratios[1:] == [None, 0.5, 0.5]
@@ -0,0 +1,38 @@
+def test_stream_stopped_early_is_recorded(items):
+    from app import BaseManager
+
+    instrumentation = BaseManager.enable_instrumentation()
+    try:
+        stream = items.objects.all().iterate(chunk_size=10)
+        next(stream)
+        stream.close()
+        (stats,) = instrumentation.summary().values()
+        assert stats["count"] == 1
+        assert stats["rows"] == 10
+    finally:
+        BaseManager.disable_instrumentation()
+
+
+def test_failing_writes_are_recorded_with_their_error(items):
+    import psycopg2
+    import pytest
+    from app import BaseManager
+
+    instrumentation = BaseManager.enable_instrumentation()
+    events = list()
+    instrumentation.add_after_hook(events.append)
+    try:
+        with pytest.raises(psycopg2.errors.UniqueViolation):
+            items.objects.bulk_insert([{"id": 1, "name": "x", "grp": "g", "amount": 1}])
+        with pytest.raises(psycopg2.errors.UniqueViolation):
+            items.objects.copy_insert(
+                [(2, "x", "g", 2)], field_names=["id", "name", "grp", "amount"]
+            )
+        assert [event.shape.split()[0] for event in events] == ["INSERT", "COPY"]
+        assert all(
+            isinstance(event.error, psycopg2.errors.UniqueViolation) for event in events
+        )
+        assert all(event.seconds is not None for event in events)
+        assert sum(stats["count"] for stats in instrumentation.summary().values()) == 2
+    finally:
+        BaseManager.disable_instrumentation()
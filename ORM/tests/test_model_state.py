@@ -0,0 +1,148 @@
+import pytest
+
+from Modules.Column import Column
+from Modules.DataType import Integer, String
+from Modules.Index import Index
+from src.utils.create_migration import write_migration_file
+from src.utils.model_state import (
+    diff_indexes,
+    diff_model_states,
+    get_model_state,
+    load_last_model_state,
+)
+
+
+class Department:
+    __tablename__ = "Departments"
+
+    id = Column(Integer(), primary_key=True)
+    dept_name = Column(String())
+
+
+class Employee:
+    __tablename__ = "employees"
+    __indexes__ = [Index("manager")]
+
+    id = Column(Integer(), primary_key=True)
+    manager = Column(String())
+    department = Column(Integer(), foreign_key="departments.id")
+
+
+def column(column_type, primary_key=False, foreign_key=None):
+    return {"type": column_type, "primary_key": primary_key, "foreign_key": foreign_key}
+
+
+def test_model_state():
+    state = get_model_state([Employee, Department])
+    assert list(state) == ["employees", "departments"]
+    assert state["employees"]["columns"]["department"] == column(
+        "INT", foreign_key="departments.id"
+    )
+    assert state["employees"]["indexes"] == {
+        "employees_manager_idx": {
+            "columns": ["manager"],
+            "unique": False,
+            "where": None,
+        }
+    }
+
+
+def test_created_tables_referenced_first():
+    queries = diff_model_states({}, get_model_state([Employee, Department]))
+    assert queries[0] == (
+        "CREATE TABLE IF NOT EXISTS departments (id INT, dept_name VARCHAR(255), "
+        "PRIMARY KEY (id));"
+    )
+    # Without a previous state the tables may exist with fewer columns
+    assert (
+        "ALTER TABLE departments ADD COLUMN IF NOT EXISTS dept_name VARCHAR(255);"
+        in queries
+    )
+    assert (
+        queries.index(
+            "CREATE TABLE IF NOT EXISTS employees (id INT, manager VARCHAR(255), "
+            "department INT REFERENCES departments(id), PRIMARY KEY (id));"
+        )
+        > 0
+    )
+
+
+def test_unchanged_models_have_no_queries():
+    state = get_model_state([Employee, Department])
+    assert diff_model_states(state, state) == []
+    assert diff_indexes(state, state) == []
+
+
+def test_changed_columns():
+    previous = {
+        "employees": {
+            "columns": {
+                "id": column("INT", primary_key=True),
+                "manager": column("VARCHAR(255)"),
+                "salary": column("VARCHAR(255)"),
+                "department": column("INT", foreign_key="departments.id"),
+            },
+        },
+        "old": {"columns": {"id": column("INT")}},
+    }
+    current = {
+        "employees": {
+            "columns": {
+                "id": column("INT", primary_key=True),
+                "code": column("VARCHAR(255)", primary_key=True),
+                "salary": column("INT"),
+                "department": column("INT"),
+            },
+        },
+    }
+    assert diff_model_states(previous, current) == [
+        "ALTER TABLE employees DROP CONSTRAINT IF EXISTS employees_department_fkey;",
+        "ALTER TABLE employees DROP CONSTRAINT IF EXISTS employees_pkey;",
+        "ALTER TABLE employees DROP COLUMN IF EXISTS manager;",
+        "DROP TABLE IF EXISTS old;",
+        "ALTER TABLE employees ADD COLUMN IF NOT EXISTS code VARCHAR(255);",
+        "ALTER TABLE employees ALTER COLUMN salary TYPE INT " "USING salary::INT;",
+        "ALTER TABLE employees ADD PRIMARY KEY (id, code);",
+    ]
+
+
+def test_changed_indexes():
+    previous = get_model_state([Employee])
+    current = get_model_state([Employee])
+    current["employees"]["indexes"] = {
+        "employees_manager_idx": {"columns": ["manager"], "unique": True, "where": None}
+    }
+    assert diff_indexes(previous, current) == [
+        (
+            "employees_manager_idx",
+            "DROP INDEX CONCURRENTLY IF EXISTS employees_manager_idx;",
+        ),
+        (
+            "employees_manager_idx",
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS employees_manager_idx "
+            "ON employees (manager);",
+        ),
+    ]
+
+
+def test_stored_state_is_the_next_previous_state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Migrations").mkdir()
+    assert load_last_model_state() == {}
+    state = get_model_state([Employee, Department])
+    write_migration_file("SELECT 1;", "first", state, version="20260101000000")
+    write_migration_file("SELECT 1;", "legacy", None, version="20260102000000")
+    assert load_last_model_state() == {}
+    write_migration_file("SELECT 1;", "second", state, version="20260103000000")
+    assert load_last_model_state() == state
+
+
+def test_index_needs_known_columns():
+    class Broken:
+        __tablename__ = "broken"
+        __indexes__ = [Index("missing")]
+
+        id = Column(Integer())
+
+    with pytest.raises(ValueError):
+        get_model_state([Broken])
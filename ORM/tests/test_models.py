@@ -0,0 +1,49 @@
+import gc
+
+import pytest
+
+
+def test_columns_are_slots(items):
+    assert items.__slots__ == ("id", "name", "grp", "amount")
+    # The `__dict__` slot comes from BaseModel
+    assert "__dict__" in vars(items.__mro__[1])
+
+    class SpecialItem(items):
+        table_name = ""
+
+    # Inherited columns keep their parent's slot
+    assert SpecialItem.__slots__ == ()
+
+
+def test_hydrated_instances_have_no_dict(items):
+    (item,) = items.objects.filter(id=7).all()
+    assert (item.id, item.name, item.grp, item.amount) == (7, "item7", "g1", 7)
+    # The `__dict__` slot is only allocated once something undeclared is set
+    assert not any(isinstance(referent, dict) for referent in gc.get_referents(item))
+    assert vars(item) == {}
+
+
+def test_row_factory_maps_the_selected_fields(items):
+    items_by_id = {
+        item.id: item for item in items.objects.select("amount", "name", "id")
+    }
+    assert items_by_id[3].name == "item3"
+    assert items_by_id[3].amount == 3
+    with pytest.raises(AttributeError):
+        items_by_id[3].grp
+
+
+def test_row_factory_of_fields_that_are_not_columns(items):
+    rows = items.objects.select("grp", "COUNT(*)", group_by=["grp"], order_by=["grp"])
+    assert [(row.grp, getattr(row, "COUNT(*)")) for row in rows] == [
+        ("g0", 33),
+        ("g1", 34),
+        ("g2", 33),
+    ]
+    assert vars(rows[0]) == {"COUNT(*)": 33}
+
+
+def test_row_factories_are_compiled_once(items):
+    row_factory = items._get_row_factory(("id", "name"))
+    assert items._get_row_factory(["id", "name"]) is row_factory
+    assert items._get_row_factory(("name", "id")) is not row_factory
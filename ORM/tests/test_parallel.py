@@ -0,0 +1,37 @@
+from src.utils.parallel import get_partition_count
+
+
+def test_partition_count_bounds_range_rows():
+    assert get_partition_count(16, 1000, 50000) == 16
+    assert get_partition_count(16, 1000000, 50000) == 20
+    assert get_partition_count(4, 0, 50000) == 4
+
+
+def test_parallel_scan_splits_ranges_by_rows(items):
+    batches = list(
+        items.objects.parallel_scan(
+            workers=2, executor="thread", batches=True, range_rows=10
+        )
+    )
+    assert max(len(batch) for batch in batches) <= 10
+    assert sorted(item.id for batch in batches for item in batch) == list(range(1, 101))
+
+
+def test_process_executor_imported_on_use(items):
+    import os
+    import subprocess
+    import sys
+
+    from src.utils.parallel import get_executor
+
+    # `import app` doesn't pay for multiprocessing
+    script = "import sys, app; print('multiprocessing' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert output.stdout.strip() == "False"
+    get_executor(items.objects, 1, "process").shutdown()
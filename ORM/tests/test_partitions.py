@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+
+from src.utils.partitions import (
+    add_periods,
+    get_expired_partitions,
+    get_range_bounds,
+    get_range_partition_queries,
+)
+
+
+def bound(start, end):
+    # As listed by `get_partitions`
+    return f"FOR VALUES FROM ('{start}') TO ('{end}')"
+
+
+@pytest.mark.parametrize(
+    "start, interval, count, expected",
+    [
+        (datetime.date(2026, 11, 1), "month", 1, datetime.date(2026, 12, 1)),
+        (datetime.date(2026, 12, 1), "month", 1, datetime.date(2027, 1, 1)),
+        (datetime.date(2026, 12, 1), "month", 14, datetime.date(2028, 2, 1)),
+        (datetime.date(2026, 1, 1), "month", -1, datetime.date(2025, 12, 1)),
+        (datetime.date(2026, 3, 1), "month", -15, datetime.date(2024, 12, 1)),
+        (datetime.date(2026, 1, 1), "year", 1, datetime.date(2027, 1, 1)),
+        (datetime.date(2026, 1, 1), "year", -3, datetime.date(2023, 1, 1)),
+        (datetime.date(2026, 12, 28), "week", 1, datetime.date(2027, 1, 4)),
+        (datetime.date(2026, 12, 31), "day", 1, datetime.date(2027, 1, 1)),
+    ],
+)
+def test_add_periods(start, interval, count, expected):
+    assert add_periods(start, interval, count) == expected
+
+
+def test_range_bounds_of_strings_and_dates():
+    assert get_range_bounds("2026-12-18 10:00:00", "month") == (
+        "2026-12-01",
+        "2027-01-01",
+    )
+    assert get_range_bounds(datetime.datetime(2026, 10, 18, 9), "week") == (
+        datetime.date(2026, 10, 12),
+        datetime.date(2026, 10, 19),
+    )
+
+
+def test_premade_partitions_roll_over_the_year():
+    names = [
+        name
+        for name, _ in get_range_partition_queries(
+            "events",
+            {"interval": "month", "premake": 2},
+            today=datetime.date(2026, 11, 30),
+        )
+    ]
+    assert names == ["events_p202611", "events_p202612", "events_p202701"]
+
+
+def test_expired_monthly_partitions_across_the_year():
+    partitions = [
+        ("events_p202610", bound("2026-10-01", "2026-11-01")),
+        ("events_p202611", bound("2026-11-01", "2026-12-01")),
+        ("events_p202612", bound("2026-12-01", "2027-01-01")),
+        ("events_p202701", bound("2027-01-01", "2027-02-01")),
+        ("events_default", "DEFAULT"),
+    ]
+    state = {"interval": "month", "retention": 2}
+    # Kept: January and the 2 months before it
+    assert get_expired_partitions(
+        partitions, state, today=datetime.date(2027, 1, 15)
+    ) == ["events_p202610"]
+    assert get_expired_partitions(
+        partitions, state, today=datetime.date(2027, 3, 1)
+    ) == ["events_p202610", "events_p202611", "events_p202612"]
+
+
+def test_expired_yearly_partitions():
+    partitions = [
+        ("events_p2024", bound("2024-01-01", "2025-01-01")),
+        ("events_p2025", bound("2025-01-01", "2026-01-01")),
+        ("events_p2026", bound("2026-01-01", "2027-01-01")),
+    ]
+    state = {"interval": "year", "retention": 1}
+    assert get_expired_partitions(
+        partitions, state, today=datetime.date(2026, 12, 31)
+    ) == ["events_p2024"]
+    assert get_expired_partitions(
+        partitions, state, today=datetime.date(2027, 1, 1)
+    ) == ["events_p2024", "events_p2025"]
+
+
+def test_partitions_are_kept_without_retention():
+    partitions = [("events_p2000", bound("2000-01-01", "2001-01-01"))]
+    state = {"interval": "year", "retention": None}
+    assert get_expired_partitions(partitions, state) == []
+
+
+def test_default_partition_never_expires():
+    partitions = [("events_default", "DEFAULT")]
+    state = {"interval": "day", "retention": 0}
+    assert get_expired_partitions(partitions, state) == []
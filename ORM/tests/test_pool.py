@@ -0,0 +1,22 @@
+def test_write_during_iterate_inside_session(items):
+    manager = items.objects
+    with manager.session():
+        for index, item in enumerate(manager.all().iterate(chunk_size=10)):
+            if index == 0:
+                manager.filter(id=1).update(name="renamed")
+                manager.bulk_update([{"id": 2, "name": "bulk"}])
+        # The stream's rollback doesn't undo the writes, its cursor survived
+        assert index == 99
+    assert manager.filter(id=1).first().name == "renamed"
+    assert manager.filter(id=2).first().name == "bulk"
+
+
+def test_closeall_closes_checked_out_connections(database):
+    from src.utils.pool import ConnectionPool
+
+    pool = ConnectionPool(database, min_size=1, max_size=2)
+    connection = pool.getconn()
+    pool.closeall()
+    pool.putconn(connection)
+    assert connection.closed
+    assert pool._size == 0
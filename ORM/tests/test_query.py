@@ -0,0 +1,109 @@
+import pytest
+
+
+@pytest.fixture
+def manager():
+    from app import BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Integer, String
+
+    class Person(BaseModel):
+        table_name = "people"
+
+        id = Column(Integer(), primary_key=True)
+        name = Column(String())
+
+    return Person.objects
+
+
+def test_filters_compile_to_parameterized_sql(manager):
+    query, params = (
+        manager.filter(id__gt=1, name__startswith="A_")
+        .exclude(id__in=[5, 6])
+        .order_by("-id")
+        .limit(10)
+        ._compile_select(("id", "name"))
+    )
+    assert query == (
+        "SELECT id, name FROM people WHERE (id > %s AND name LIKE %s) "
+        "AND NOT (id = ANY(%s)) ORDER BY id DESC LIMIT %s"
+    )
+    assert params == [1, "A\\_%", [5, 6], 10]
+
+
+@pytest.mark.parametrize("name", ["", "-", "name;"])
+def test_order_by_rejects_invalid_names(manager, name):
+    with pytest.raises(ValueError):
+        manager.order_by(name)
+
+
+def test_update_without_fields_is_refused(manager):
+    with pytest.raises(ValueError):
+        manager.filter(id=1)._compile_update({})
+    with pytest.raises(ValueError):
+        manager._build_update_query({})
+
+
+@pytest.mark.parametrize("lookup", ["contains", "icontains", "startswith", "endswith"])
+def test_pattern_lookups_reject_none(manager, lookup):
+    with pytest.raises(ValueError):
+        manager.filter(**{f"name__{lookup}": None})
+
+
+def test_bulk_rows_without_key_are_refused(manager):
+    with pytest.raises(ValueError, match="missing the key fields"):
+        manager._prepare_bulk_rows([{"id": 1, "name": "a"}, {"name": "b"}], ("id",))
+
+
+def walk_pages(manager, **options):
+    pages = [manager.paginate(**options)]
+    while pages[-1].next_token is not None:
+        pages.append(manager.paginate(after=pages[-1].next_token, **options))
+    return pages
+
+
+def test_paginate_walks_ascending_pages(items):
+    pages = walk_pages(items.objects, order_by=["grp"], page_size=30)
+    assert [len(page.items) for page in pages] == [30, 30, 30, 10]
+    assert pages[-1].next_token is None
+    keys = [(item.grp, item.id) for page in pages for item in page.items]
+    assert keys == sorted((f"g{i % 3}", i) for i in range(1, 101))
+
+
+def test_paginate_walks_descending_pages(items):
+    pages = walk_pages(items.objects, order_by=["-amount"], page_size=25)
+    # 100 rows in pages of 25: the fourth page is the last, no empty page
+    assert [len(page.items) for page in pages] == [25, 25, 25, 25]
+    assert pages[-1].next_token is None
+    amounts = [item.amount for page in pages for item in page.items]
+    assert amounts == list(range(100, 0, -1))
+
+
+def test_paginate_filtered_pages(items):
+    manager = items.objects.filter(grp="g1")
+    pages = walk_pages(manager, page_size=20)
+    ids = [item.id for page in pages for item in page.items]
+    assert ids == list(range(1, 101, 3))
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "not a token",
+        "WzEsIDJd",  # [1, 2]
+        "NQ==",  # 5
+        # The ordering of the walk with one sort key dropped
+        "W1tbImFtb3VudCIsICJERVNDIl1dLCBbOTBdXQ==",
+        # The ordering of the walk with the last row's id dropped
+        "W1tbImFtb3VudCIsICJERVNDIl0sIFsiaWQiLCAiREVTQyJdXSwgWzkwXV0=",
+    ],
+)
+def test_paginate_rejects_tampered_tokens(items, token):
+    with pytest.raises(ValueError):
+        items.objects.paginate(order_by=["-amount"], after=token)
+
+
+def test_paginate_rejects_tokens_of_another_ordering(items):
+    page = items.objects.paginate(order_by=["-amount"], page_size=10)
+    with pytest.raises(ValueError, match="another ordering"):
+        items.objects.paginate(order_by=["amount"], after=page.next_token)
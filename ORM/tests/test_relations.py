@@ -0,0 +1,105 @@
+import pytest
+
+
+@pytest.fixture
+def staff(database):
+    # The app's Employee and Department models on tables of their own schema
+    import psycopg2
+    from app import BaseManager, Department, Employee
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA IF EXISTS pydbmap_test CASCADE")
+        cursor.execute("CREATE SCHEMA pydbmap_test")
+        cursor.execute(
+            "CREATE TABLE pydbmap_test.departments (id INT PRIMARY KEY, "
+            "dept_name VARCHAR(255), manager VARCHAR(255) UNIQUE)"
+        )
+        cursor.execute(
+            "CREATE TABLE pydbmap_test.employees (id INT PRIMARY KEY, "
+            "emp_name VARCHAR(255), manager VARCHAR(255), date VARCHAR(255), "
+            "salary VARCHAR(255))"
+        )
+        cursor.execute(
+            "INSERT INTO pydbmap_test.departments VALUES "
+            "(1, 'Sales', 'Ana'), (2, 'Support', 'Bo'), (3, 'Legal', 'Cy')"
+        )
+        cursor.execute(
+            "INSERT INTO pydbmap_test.employees VALUES "
+            "(1, 'Eve', 'Ana', '2024-01-01', '100'), "
+            "(2, 'Finn', 'Bo', '2024-01-02', '200'), "
+            "(3, 'Gus', 'Ana', '2024-01-03', '300'), "
+            "(4, 'Hal', NULL, '2024-01-04', '400')"
+        )
+
+    BaseManager.set_connection(
+        {**database, "options": "-c search_path=pydbmap_test"},
+        min_size=1,
+        max_size=2,
+    )
+    instrumentation = BaseManager.enable_instrumentation()
+    queries = list()
+    instrumentation.add_after_hook(lambda event: queries.append(event.query))
+    yield Employee, Department, queries
+    BaseManager.disable_instrumentation()
+    BaseManager.pool.closeall()
+    BaseManager.pool = None
+    with connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA pydbmap_test CASCADE")
+    connection.close()
+
+
+def test_prefetch_foreign_key(staff):
+    Employee, Department, queries = staff
+
+    employees = Employee.objects.order_by("id").prefetch_related("department").all()
+    assert len(queries) == 2
+    assert "FROM departments" in queries[1]
+    assert [
+        employee.department and employee.department.dept_name for employee in employees
+    ] == ["Sales", "Support", "Sales", None]
+    # The department of both Sales employees is the same object
+    assert employees[0].department is employees[2].department
+
+
+def test_prefetch_reverse_foreign_key(staff):
+    Employee, Department, queries = staff
+
+    departments = Department.objects.order_by("id").prefetch_related("employees").all()
+    assert len(queries) == 2
+    assert "FROM employees" in queries[1]
+    assert [
+        sorted(employee.emp_name for employee in department.employees)
+        for department in departments
+    ] == [["Eve", "Gus"], ["Finn"], []]
+
+
+def test_prefetch_on_fetched_objects(staff):
+    Employee, Department, queries = staff
+
+    employees = Employee.objects.filter(manager="Bo").all()
+    Employee.objects.prefetch(employees, "department")
+    assert len(queries) == 2
+    assert employees[0].department.manager == "Bo"
+
+
+def test_prefetch_unknown_relation_fails_before_querying(staff):
+    Employee, Department, queries = staff
+
+    with pytest.raises(ValueError):
+        Employee.objects.prefetch_related("company")
+    assert queries == []
+
+
+def test_prefetch_per_streamed_chunk(staff):
+    Employee, Department, queries = staff
+
+    employees = Employee.objects.order_by("id").prefetch_related("department")
+    names = [
+        employee.department and employee.department.manager
+        for employee in employees.iterate(chunk_size=2)
+    ]
+    assert names == ["Ana", "Bo", "Ana", None]
+    # The stream, then one query for each chunk of 2 employees
+    assert len(queries) == 3
@@ -0,0 +1,358 @@
+import psycopg2
+import pytest
+
+from Modules.Summary import Summary
+from src.utils.query import Count, Min, Sum
+from src.utils.summaries import (
+    compile_fed_bulk_update,
+    compile_fed_update,
+    compile_fed_upsert,
+    compile_fed_write,
+    get_create_summary_queries,
+    get_fed_summaries,
+    get_server_version_check,
+    get_summary_states,
+    route_aggregate,
+)
+
+SUMMARIES = get_summary_states(
+    "employees",
+    [
+        Summary("by_manager", group_by=["manager"], fields=["salary"]),
+        Summary(
+            "by_date",
+            group_by=["date", "manager"],
+            fields=["salary"],
+            refresh="concurrently",
+        ),
+    ],
+    {"id": "INT", "manager": "VARCHAR(255)", "salary": "INT", "date": "DATE"},
+)
+FEEDS = (
+    "feed_0 AS (INSERT INTO by_manager AS summary "
+    "(manager, row_count, salary_sum, salary_count) "
+    "SELECT manager, SUM(sign), COALESCE(SUM(sign * salary), 0), "
+    "COALESCE(SUM(sign) FILTER (WHERE salary IS NOT NULL), 0) "
+    "FROM delta GROUP BY manager "
+    "ON CONFLICT (manager) DO UPDATE SET row_count = summary.row_count + "
+    "EXCLUDED.row_count, salary_sum = summary.salary_sum + EXCLUDED.salary_sum, "
+    "salary_count = summary.salary_count + EXCLUDED.salary_count) "
+    "SELECT COUNT(*) FROM changed"
+)
+
+
+def test_fed_summaries():
+    assert list(get_fed_summaries(SUMMARIES)) == ["by_manager"]
+    assert get_fed_summaries(SUMMARIES, ["id"]) == {}
+    assert list(get_fed_summaries(SUMMARIES, ["salary"])) == ["by_manager"]
+
+
+def test_compile_fed_write():
+    query = compile_fed_write(
+        "DELETE FROM employees WHERE id = %s", -1, get_fed_summaries(SUMMARIES)
+    )
+    assert query == (
+        "WITH changed AS (DELETE FROM employees WHERE id = %s "
+        "RETURNING manager, salary), "
+        "delta AS (SELECT -1 AS sign, manager, salary FROM changed), " + FEEDS
+    )
+
+
+def test_compile_fed_update():
+    query = compile_fed_update(
+        "employees", ("salary",), " WHERE id = %s", get_fed_summaries(SUMMARIES), []
+    )
+    assert query == (
+        "WITH changed AS (UPDATE employees SET salary = %s "
+        "FROM (SELECT tableoid, ctid, manager, salary FROM employees "
+        "WHERE id = %s FOR UPDATE) AS previous "
+        "WHERE employees.tableoid = previous.tableoid "
+        "AND employees.ctid = previous.ctid "
+        "RETURNING employees.manager, employees.salary, "
+        "previous.manager AS previous_manager, previous.salary AS previous_salary), "
+        "delta AS (SELECT 1 AS sign, manager, salary FROM changed "
+        "UNION ALL SELECT -1, previous_manager, previous_salary FROM changed), " + FEEDS
+    )
+
+
+def test_compile_fed_bulk_update():
+    query = compile_fed_bulk_update(
+        "employees",
+        ["salary"],
+        ("id",),
+        "tmp_stage AS v",
+        get_fed_summaries(SUMMARIES),
+        ["id"],
+    )
+    assert query.startswith(
+        "WITH changed AS (UPDATE employees AS t SET salary = v.salary "
+        "FROM (SELECT v.*, p.id AS previous_id, p.manager AS previous_manager, "
+        "p.salary AS previous_salary FROM tmp_stage AS v "
+        "JOIN employees AS p ON p.id = v.id FOR UPDATE OF p) AS v "
+        "WHERE t.id = v.previous_id "
+        "RETURNING t.manager, t.salary, v.previous_manager, v.previous_salary), "
+    )
+    assert query.endswith(FEEDS)
+
+
+def test_compile_fed_upsert():
+    query = compile_fed_upsert(
+        "employees",
+        ("id", "salary"),
+        ("id",),
+        "SELECT id, salary FROM tmp_stage",
+        get_fed_summaries(SUMMARIES),
+    )
+    assert query == (
+        "WITH source AS (SELECT id, salary FROM tmp_stage), "
+        "previous AS (SELECT id, manager AS previous_manager, "
+        "salary AS previous_salary FROM employees "
+        "WHERE (id) IN (SELECT id FROM source) FOR UPDATE), "
+        "changed AS (INSERT INTO employees (id, salary) "
+        "SELECT source.id, source.salary FROM source LEFT JOIN previous USING (id) "
+        "ON CONFLICT (id) DO UPDATE SET salary = EXCLUDED.salary "
+        "RETURNING id, manager, salary, xmax = 0 AS inserted), "
+        "delta AS (SELECT 1 AS sign, changed.manager, changed.salary FROM changed "
+        "UNION ALL SELECT -1, previous.previous_manager, previous.previous_salary "
+        "FROM previous JOIN changed USING (id) WHERE NOT changed.inserted), " + FEEDS
+    )
+
+
+@pytest.mark.parametrize(
+    "group_by, aggregates, where, allow_stale, expected",
+    [
+        (
+            ("manager",),
+            {"n": Count(), "total": Sum("salary")},
+            (),
+            False,
+            (
+                "by_manager",
+                (
+                    ("n", "COALESCE(SUM(row_count), 0)::BIGINT"),
+                    (
+                        "total",
+                        "(CASE WHEN SUM(salary_count) > 0 "
+                        "THEN SUM(salary_sum) END)::BIGINT",
+                    ),
+                ),
+            ),
+        ),
+        # Only the materialized view keeps minimums, or groups by date
+        ((), {"low": Min("salary")}, (), False, None),
+        (
+            (),
+            {"low": Min("salary")},
+            (),
+            True,
+            ("by_date", (("low", "MIN(salary_min)"),)),
+        ),
+        ((), {"n": Count()}, ((False, (("date", "gt"),)),), False, None),
+        (
+            (),
+            {"n": Count()},
+            ((False, (("date", "gt"),)),),
+            True,
+            ("by_date", (("n", "COALESCE(SUM(row_count), 0)::BIGINT"),)),
+        ),
+        # Up to date summaries first
+        (
+            (),
+            {"n": Count()},
+            (),
+            True,
+            ("by_manager", (("n", "COALESCE(SUM(row_count), 0)::BIGINT"),)),
+        ),
+        # Not kept by any summary
+        ((), {"n": Count("id")}, (), True, None),
+    ],
+)
+def test_route_aggregate(group_by, aggregates, where, allow_stale, expected):
+    assert route_aggregate(SUMMARIES, group_by, aggregates, where, allow_stale) == (
+        expected
+    )
+
+
+@pytest.fixture
+def summarized(items, database):
+    # `items` with an incremental summary of its rows per group
+    from app import BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Integer, String
+    from src.utils.summaries import get_create_summary_queries
+
+    class SummarizedItem(BaseModel):
+        table_name = "test_items"
+        __summaries__ = [
+            Summary("test_items_by_grp", group_by=["grp"], fields=["amount"])
+        ]
+
+        id = Column(Integer(), primary_key=True)
+        name = Column(String())
+        grp = Column(String())
+        amount = Column(Integer())
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_items_by_grp")
+        for name, state in SummarizedItem._summaries.items():
+            # One transaction, the table is locked while it is summarized
+            cursor.execute(" ".join(get_create_summary_queries(name, state)))
+
+    def read():
+        # The summary, and the same aggregates computed from the table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT grp, row_count, amount_sum, amount_count "
+                "FROM test_items_by_grp WHERE row_count > 0 ORDER BY grp"
+            )
+            summary = cursor.fetchall()
+            cursor.execute(
+                "SELECT grp, COUNT(*), COALESCE(SUM(amount), 0), COUNT(amount) "
+                "FROM test_items GROUP BY grp ORDER BY grp"
+            )
+            return summary, cursor.fetchall()
+
+    yield SummarizedItem, read
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS test_items_by_grp")
+    connection.close()
+
+
+@pytest.mark.parametrize("method", ["values", "copy"])
+def test_bulk_update_feeds_summaries(summarized, method):
+    model, read = summarized
+    rows = [{"id": i, "grp": "g9", "amount": i * 2} for i in range(1, 30)]
+    assert model.objects.bulk_update(rows, batch_size=10, method=method) == 29
+    # Fields no summary reads leave them alone
+    model.objects.bulk_update([{"id": 1, "name": "renamed"}], method=method)
+    summary, expected = read()
+    assert summary == expected
+
+
+@pytest.mark.parametrize("method", ["values", "copy"])
+def test_bulk_upsert_feeds_summaries(summarized, method):
+    model, read = summarized
+    rows = [
+        {"id": i, "name": f"item{i}", "grp": f"g{i % 4}", "amount": None}
+        for i in range(90, 120)
+    ]
+    assert model.objects.bulk_upsert(rows, batch_size=7, method=method) == 30
+    summary, expected = read()
+    assert summary == expected
+
+
+@pytest.mark.parametrize("copy_format", ["text", "binary"])
+def test_copy_insert_feeds_summaries(summarized, copy_format):
+    model, read = summarized
+    rows = [
+        {"id": i, "name": f"item{i}", "grp": f"g{i % 5}", "amount": i}
+        for i in range(101, 151)
+    ]
+    result = model.objects.copy_insert(rows, batch_size=20, copy_format=copy_format)
+    assert result["rows"] == 50
+    summary, expected = read()
+    assert summary == expected
+    assert model.objects.aggregate_count() == 150
+
+
+@pytest.mark.parametrize("method", ["values", "copy"])
+def test_async_bulk_writes_feed_summaries(summarized, database, method):
+    import asyncio
+
+    pytest.importorskip("psycopg_pool")
+    model, read = summarized
+
+    async def write():
+        manager = model.aobjects
+        await manager.set_async_connection(database, min_size=1, max_size=2)
+        try:
+            await manager.bulk_update(
+                [{"id": i, "amount": None} for i in range(1, 20)], method=method
+            )
+            await manager.bulk_upsert(
+                [{"id": i, "grp": "g7", "amount": i} for i in range(95, 110)],
+                method=method,
+            )
+        finally:
+            await type(manager).async_pool.close()
+            type(manager).async_pool = None
+
+    asyncio.run(write())
+    summary, expected = read()
+    assert summary == expected
+
+
+def test_materialized_views_only_read_when_stale_allowed(items, database):
+    from app import BaseModel
+    from Modules.Column import Column
+    from Modules.DataType import Integer, String
+    from src.utils.summaries import get_create_summary_queries
+
+    class ViewedItem(BaseModel):
+        table_name = "test_items"
+        __summaries__ = [
+            Summary("test_items_view", group_by=["grp"], refresh="concurrently")
+        ]
+
+        id = Column(Integer(), primary_key=True)
+        grp = Column(String())
+
+    connection = psycopg2.connect(**database)
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP MATERIALIZED VIEW IF EXISTS test_items_view")
+            state = ViewedItem._summaries["test_items_view"]
+            for query in get_create_summary_queries("test_items_view", state):
+                cursor.execute(query)
+            # Rows the view won't see until its next refresh
+            cursor.execute("DELETE FROM test_items WHERE id > 50")
+
+        query, _, _ = ViewedItem.objects.all()._compile_aggregate((), {"n": Count()})
+        assert "test_items_view" not in query
+        assert ViewedItem.objects.aggregate_count() == 50
+        stale = ViewedItem.objects.allow_stale().aggregate(n=Count())
+        assert stale["n"] == 100
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP MATERIALIZED VIEW IF EXISTS test_items_view")
+        connection.close()
+
+
+def test_only_summary_feeding_writes_select_their_count(summarized):
+    model, read = summarized
+    manager = model.objects
+    # Rows returned by other statements aren't taken for a row count
+    query = "UPDATE test_items SET name = 'x' WHERE id > %s RETURNING id"
+    assert manager._execute_query(query, (97,)) == 3
+    with manager._transaction() as cursor:
+        assert manager._execute_in(cursor, query, (98,)) == 2
+        assert cursor.fetchall() == [(99,), (100,)]
+    assert manager.filter(id__lte=10).update(amount=1) == 10
+    assert manager.filter(id__lte=5).delete() == 5
+    summary, expected = read()
+    assert summary == expected
+
+
+@pytest.mark.parametrize("name", ["by_manager", "by_date"])
+def test_summaries_check_the_server_version_first(name):
+    queries = get_create_summary_queries(name, SUMMARIES[name])
+    assert queries[0] == get_server_version_check()
+    assert "NULLS NOT DISTINCT" in " ".join(queries[1:])
+
+
+def test_server_version_check(database, monkeypatch):
+    from src.utils import summaries
+
+    connection = psycopg2.connect(**database)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(get_server_version_check())
+            # As run on a server older than required
+            monkeypatch.setattr(summaries, "MIN_SERVER_VERSION", 10**7)
+            with pytest.raises(psycopg2.errors.RaiseException, match="PostgreSQL 15"):
+                cursor.execute(get_server_version_check())
+    finally:
+        connection.close()